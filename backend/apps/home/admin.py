@@ -1,6 +1,11 @@
 from django.contrib import admin
-from apps.home.models import RecipeModel, IngredientsModel
+from apps.home.models import (
+    RecipeModel, IngredientsModel, IngredientCatalogModel, RecipeFacetCountModel, TaskModel
+)
 # Register your models here.
 
 admin.site.register(RecipeModel)
-admin.site.register(IngredientsModel)
\ No newline at end of file
+admin.site.register(IngredientsModel)
+admin.site.register(IngredientCatalogModel)
+admin.site.register(RecipeFacetCountModel)
+admin.site.register(TaskModel)
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class HomeConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.home"
+
+    def ready(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        from apps.home import jobs, signals  # noqa: F401
+        from apps.home.instrumentation import install_sql_timer
+
+        connection_created.connect(install_sql_timer)
+        for connection in connections.all(initialized_only=True):
+            install_sql_timer(sender=None, connection=connection)
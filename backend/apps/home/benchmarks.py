@@ -0,0 +1,144 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Words the synthetic catalogue is built from; searches pick from the same lists
+DISHES = ['curry', 'biryani', 'dal', 'pasta', 'salad', 'soup', 'stew', 'tacos', 'risotto', 'noodles']
+STYLES = ['spicy', 'smoky', 'creamy', 'tangy', 'herby', 'crispy', 'rustic', 'golden']
+INGREDIENTS = [
+    'onion', 'garlic', 'ginger', 'tomato', 'chickpea', 'lentil', 'paneer', 'chicken',
+    'rice', 'basil', 'cumin', 'coriander', 'spinach', 'potato', 'lemon', 'coconut',
+]
+RECIPE_TYPES = ['VEG', 'NON_VEG', 'VEGAN']
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles in milliseconds and throughput in requests/second"""
+    return {
+        'requests': len(latencies),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3) if latencies else 0.0,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+async def run_concurrent(client, path: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Issue ``requests`` GETs against ``path`` through an ASGI test client,
+    keeping at most ``concurrency`` in flight
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result['status_codes'] = statuses
+    return result
+
+
+def rows_per_second(func: Callable[[], int], repeat: int) -> Dict[str, Any]:
+    """
+    Call ``func`` ``repeat`` times; it returns how many rows it produced.
+    Reports the best and median rate so one slow run does not skew it.
+    """
+    rates, total_rows = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = func()
+        elapsed = time.perf_counter() - started
+        total_rows += rows
+        rates.append(rows / elapsed if elapsed else 0.0)
+    return {
+        'runs': repeat,
+        'rows': total_rows,
+        'best_rows_per_second': round(max(rates), 1) if rates else 0.0,
+        'median_rows_per_second': round(statistics.median(rates), 1) if rates else 0.0,
+    }
+
+
+def synthetic_recipes(recipes: int, ingredients: int, seed: int = 0) -> Iterator[str]:
+    """
+    JSONL rows for a reproducible synthetic catalogue: the same arguments
+    always produce the same recipes, in the bulk import format
+    """
+    rng = random.Random(seed)
+    for number in range(recipes):
+        dish = rng.choice(DISHES)
+        yield json.dumps({
+            'recipe_name': f"{rng.choice(STYLES).title()} {dish.title()} {number}",
+            'recipe_description': f"A {rng.choice(STYLES)} {dish} with "
+                                  f"{rng.choice(INGREDIENTS)} and {rng.choice(INGREDIENTS)}",
+            'recipe_type': rng.choice(RECIPE_TYPES),
+            'ingredients': rng.sample(INGREDIENTS, min(ingredients, len(INGREDIENTS))),
+        })
+
+
+def measure(call: Callable[[int], Any], requests: int) -> Dict[str, Any]:
+    """
+    Run ``call(i)`` for i in range(requests), one at a time, recording
+    latency, status codes and the SQL queries each request issued
+    """
+    latencies, statuses, queries = [], {}, []
+    started = time.perf_counter()
+    for i in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = call(i)
+            latencies.append(time.perf_counter() - request_started)
+        queries.append(len(captured))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    result = summarize(latencies, time.perf_counter() - started)
+    result['status_codes'] = statuses
+    result['queries_mean'] = round(statistics.fmean(queries), 2) if queries else 0.0
+    result['queries_max'] = max(queries) if queries else 0
+    return result
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = 0.2, metric: str = 'p50_ms') -> List[Dict[str, Any]]:
+    """
+    Scenarios that regressed between two benchmark runs: ``metric`` grew
+    by more than ``threshold`` (a fraction), or requests issue more
+    queries than before. Scenarios missing from either run are skipped.
+    """
+    regressions = []
+    for name, now in current.get('results', {}).items():
+        before: Optional[Dict[str, Any]] = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        if before.get(metric) and now[metric] > before[metric] * (1 + threshold):
+            regressions.append({
+                'scenario': name, 'metric': metric,
+                'baseline': before[metric], 'current': now[metric],
+            })
+        if now['queries_max'] > before['queries_max']:
+            regressions.append({
+                'scenario': name, 'metric': 'queries_max',
+                'baseline': before['queries_max'], 'current': now['queries_max'],
+            })
+    return regressions
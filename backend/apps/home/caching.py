@@ -0,0 +1,558 @@
+import asyncio
+import hashlib
+import json
+import math
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, ContextManager, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.home.instrumentation import cache, registry
+from apps.home.routers import primary_reads
+from apps.home.tasks import enqueue
+
+LIST_GENERATION_KEY = "recipes_list_generation"
+# Present while list invalidations are being coalesced
+INVALIDATION_WINDOW_KEY = "recipes_list_invalidation_window"
+# When the deferred list invalidation is due (epoch seconds), or 0 when none is pending
+INVALIDATION_PENDING_KEY = "recipes_list_invalidation_pending"
+INVALIDATION_APPLY_LOCK_KEY = "recipes_list_invalidation_apply"
+# When the list generation was last bumped (epoch seconds)
+LIST_INVALIDATED_KEY = "recipes_list_invalidated_at"
+
+# Seconds one process may hold a key's recompute lock
+LOCK_TIMEOUT = 10
+# How long a process without the lock waits for a value that is not cached at all
+WAIT_TIMEOUT = 2.0
+POLL_INTERVAL = 0.05
+# Entries outlive their fresh TTL by this factor so they can be served stale
+STALE_FACTOR = 2
+# XFetch aggressiveness; higher refreshes earlier
+EARLY_REFRESH_BETA = 1.0
+# Suffix of the shared key holding the version stamp of a detail entry
+STAMP_SUFFIX = ":stamp"
+# Suffix of the shared key holding when a detail entry was last invalidated
+INVALIDATED_SUFFIX = ":invalidated"
+
+
+def stable_digest(*parts: Any) -> str:
+    """
+    Digest of the given values that is identical in every process.
+
+    Unlike ``hash()``, this does not depend on PYTHONHASHSEED, so every
+    worker sharing a cache backend computes the same key for the same
+    filters. Dict ordering does not matter.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def get_list_generation() -> int:
+    """
+    Current generation of the recipe list cache.
+
+    A missing counter is seeded from the clock rather than from 1, so a
+    counter evicted by the backend never comes back at a value that
+    older, still cached entries were written under. A deferred
+    invalidation that has fallen due is applied here, so it never waits
+    on the task worker.
+    """
+    values = cache.get_many([LIST_GENERATION_KEY, INVALIDATION_PENDING_KEY])
+    due = values.get(INVALIDATION_PENDING_KEY)
+    if due is None:
+        cache.add(INVALIDATION_PENDING_KEY, 0, None)
+    elif due and due <= time.time():
+        generation = apply_pending_invalidation()
+        if generation is not None:
+            return generation
+
+    generation = values.get(LIST_GENERATION_KEY)
+    if generation is None:
+        seed = int(time.time() * 1000)
+        cache.add(LIST_GENERATION_KEY, seed, None)
+        generation = cache.get(LIST_GENERATION_KEY)
+        if generation is None:
+            # A backend that stores nothing, such as DummyCache
+            return seed
+    return generation
+
+
+async def aget_list_generation() -> int:
+    """Async variant of get_list_generation()"""
+    values = await cache.aget_many([LIST_GENERATION_KEY, INVALIDATION_PENDING_KEY])
+    due = values.get(INVALIDATION_PENDING_KEY)
+    if due is None:
+        await cache.aadd(INVALIDATION_PENDING_KEY, 0, None)
+    elif due and due <= time.time():
+        generation = await aapply_pending_invalidation()
+        if generation is not None:
+            return generation
+
+    generation = values.get(LIST_GENERATION_KEY)
+    if generation is None:
+        seed = int(time.time() * 1000)
+        await cache.aadd(LIST_GENERATION_KEY, seed, None)
+        generation = await cache.aget(LIST_GENERATION_KEY)
+        if generation is None:
+            return seed
+    return generation
+
+
+def bump_list_generation() -> int:
+    """
+    Invalidate every cached recipe list in O(1).
+
+    Entries written under the previous generation are never read again
+    and simply age out of the cache.
+    """
+    mark_invalidated([LIST_INVALIDATED_KEY])
+    try:
+        return cache.incr(LIST_GENERATION_KEY)
+    except ValueError:
+        get_list_generation()
+    try:
+        return cache.incr(LIST_GENERATION_KEY)
+    except ValueError:
+        return get_list_generation()
+
+
+async def abump_list_generation() -> int:
+    """Async variant of bump_list_generation()"""
+    await amark_invalidated([LIST_INVALIDATED_KEY])
+    try:
+        return await cache.aincr(LIST_GENERATION_KEY)
+    except ValueError:
+        await aget_list_generation()
+    try:
+        return await cache.aincr(LIST_GENERATION_KEY)
+    except ValueError:
+        return await aget_list_generation()
+
+
+def mark_invalidated(markers: Iterable[str]) -> None:
+    """
+    Record that the values behind ``markers`` were just invalidated; the
+    marks expire after RECIPE_REPLICA_PIN_SECONDS, once replicas have
+    caught up with the write
+    """
+    pin_seconds = getattr(settings, 'RECIPE_REPLICA_PIN_SECONDS', 5)
+    now = time.time()
+    cache.set_many({marker: now for marker in markers}, pin_seconds)
+
+
+async def amark_invalidated(markers: Iterable[str]) -> None:
+    """Async variant of mark_invalidated()"""
+    pin_seconds = getattr(settings, 'RECIPE_REPLICA_PIN_SECONDS', 5)
+    now = time.time()
+    await cache.aset_many({marker: now for marker in markers}, pin_seconds)
+
+
+def _recently_invalidated(marked: Optional[float]) -> bool:
+    pin_seconds = getattr(settings, 'RECIPE_REPLICA_PIN_SECONDS', 5)
+    return marked is not None and time.time() - marked < pin_seconds
+
+
+def recently_invalidated(keys: Iterable[str]) -> set:
+    """Those of the detail ``keys`` invalidated within RECIPE_REPLICA_PIN_SECONDS"""
+    markers = {f"{key}{INVALIDATED_SUFFIX}": key for key in keys}
+    if not markers:
+        return set()
+    return {markers[marker] for marker, marked in cache.get_many(markers).items() if _recently_invalidated(marked)}
+
+
+def fill_reads(marker: Optional[str]) -> ContextManager:
+    """
+    Where a cache fill reads: the primary when the value was invalidated
+    within RECIPE_REPLICA_PIN_SECONDS, as a replica may not have the
+    write yet and the fill would cache the old rows as current; a
+    replica otherwise
+    """
+    if marker is not None and _recently_invalidated(cache.get(marker)):
+        return primary_reads()
+    return nullcontext()
+
+
+async def afill_reads(marker: Optional[str]) -> ContextManager:
+    """Async variant of fill_reads()"""
+    if marker is not None and _recently_invalidated(await cache.aget(marker)):
+        return primary_reads()
+    return nullcontext()
+
+
+def invalidate_recipes(recipe_ids: Iterable[Any] = (), using: Optional[str] = None) -> None:
+    """
+    Invalidate the cached details of ``recipe_ids`` and the cached list
+    pages once the current transaction commits, or right away outside
+    one. A rolled back write invalidates nothing.
+
+    Details are invalidated on every commit. List invalidations coalesce:
+    the first bumps the generation and opens a window of
+    RECIPE_INVALIDATION_WINDOW seconds; writes inside it record one
+    deferred bump, due when the window is over. Whichever comes first
+    applies it: the next list read or write after that, or the task
+    worker, which also rewarms the first page.
+    """
+    keys = [f"recipe_{recipe_id}" for recipe_id in recipe_ids]
+    transaction.on_commit(lambda: _invalidate_committed(keys), using=using)
+
+
+def _invalidate_committed(keys: List[str]) -> None:
+    if keys:
+        # New stamps first: another process that read the old value has
+        # recorded the old stamp, and its next check sees the change
+        cache.set_many({f"{key}{STAMP_SUFFIX}": uuid.uuid4().hex for key in keys}, None)
+        mark_invalidated(f"{key}{INVALIDATED_SUFFIX}" for key in keys)
+        cache.delete_many(keys)
+        local_cache.delete_many(keys)
+    window = getattr(settings, 'RECIPE_INVALIDATION_WINDOW', 2)
+    if window <= 0 or cache.add(INVALIDATION_WINDOW_KEY, 1, window):
+        # This bump covers any deferred one
+        cache.set(INVALIDATION_PENDING_KEY, 0, None)
+        bump_list_generation()
+    elif not cache.get(INVALIDATION_PENDING_KEY):
+        cache.set(INVALIDATION_PENDING_KEY, time.time() + window, None)
+        enqueue('recipes.flush_list_invalidation', dedupe=True, delay=window)
+
+
+def apply_pending_invalidation(due_only: bool = True) -> Optional[int]:
+    """
+    Apply the deferred list invalidation, if there is one (and it is
+    due); returns the new generation, or None when nothing was bumped.
+    One caller at a time, so concurrent readers bump it only once.
+    """
+    if not cache.add(INVALIDATION_APPLY_LOCK_KEY, 1, LOCK_TIMEOUT):
+        return None
+    try:
+        due = cache.get(INVALIDATION_PENDING_KEY)
+        if not due or (due_only and due > time.time()):
+            return None
+        cache.set(INVALIDATION_PENDING_KEY, 0, None)
+        return bump_list_generation()
+    finally:
+        cache.delete(INVALIDATION_APPLY_LOCK_KEY)
+
+
+async def aapply_pending_invalidation(due_only: bool = True) -> Optional[int]:
+    """Async variant of apply_pending_invalidation()"""
+    if not await cache.aadd(INVALIDATION_APPLY_LOCK_KEY, 1, LOCK_TIMEOUT):
+        return None
+    try:
+        due = await cache.aget(INVALIDATION_PENDING_KEY)
+        if not due or (due_only and due > time.time()):
+            return None
+        await cache.aset(INVALIDATION_PENDING_KEY, 0, None)
+        return await abump_list_generation()
+    finally:
+        await cache.adelete(INVALIDATION_APPLY_LOCK_KEY)
+
+
+def list_cache_key(kind: str, *parts: Any) -> str:
+    """Versioned cache key for a recipe list derived value"""
+    return f"recipes_list_{get_list_generation()}_{kind}_{stable_digest(*parts)}"
+
+
+async def alist_cache_key(kind: str, *parts: Any) -> str:
+    """Async variant of list_cache_key()"""
+    return f"recipes_list_{await aget_list_generation()}_{kind}_{stable_digest(*parts)}"
+
+
+def list_entry_key(kind: str, *parts: Any) -> str:
+    """
+    Unversioned key for a list value cached with get_or_compute(); the
+    generation is stored in the entry instead, so the value written
+    before a bump can still be served while its replacement is built
+    """
+    return f"recipes_list_{kind}_{stable_digest(*parts)}"
+
+
+def jittered(timeout: float, spread: float = 0.1) -> float:
+    """Spread expiries so entries written together do not expire together"""
+    return timeout * random.uniform(1 - spread, 1 + spread)
+
+
+class StaleResult(dict):
+    """
+    A cached service result served while another process recomputes it.
+    Renders like any dict; views must not cache it or tag it with an ETag.
+    """
+
+
+def _is_fresh(entry: Optional[dict], version: Any, now: float) -> bool:
+    return entry is not None and entry['version'] == version and entry['expires'] > now
+
+
+def _refresh_early(entry: dict, now: float) -> bool:
+    """
+    XFetch (Vattani et al.): recompute ahead of expiry with a probability
+    that grows as expiry nears and with how long the value takes to build,
+    so one caller refreshes it before everyone misses at once
+    """
+    return now - entry['delta'] * EARLY_REFRESH_BETA * math.log(1.0 - random.random()) >= entry['expires']
+
+
+def _entry(value: Any, version: Any, delta: float, timeout: float) -> Tuple[dict, float]:
+    ttl = jittered(timeout)
+    return {'value': value, 'version': version, 'delta': delta, 'expires': time.time() + ttl}, ttl * STALE_FACTOR
+
+
+def get_or_compute(key: str, compute: Callable[[], Any], timeout: float,
+                   version: Any = None, marker: Optional[str] = None) -> Tuple[Any, bool]:
+    """
+    Cached ``compute()`` with stampede protection; returns (value, fresh).
+
+    A value is fresh while it was built for ``version`` and its jittered
+    TTL has not run out. Only the caller that wins the key's lock
+    (``cache.add``) recomputes; the others get the previous value, marked
+    stale, or wait briefly when there is none, then build it themselves
+    without touching the lock. A fresh value is
+    sometimes rebuilt early by one caller (see _refresh_early).
+    ``marker`` is the key recording when the value was last invalidated
+    (mark_invalidated); see fill_reads() for where ``compute`` reads.
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if _is_fresh(entry, version, now) and not _refresh_early(entry, now):
+        registry.count_cache_tier('l2', 'hit')
+        return entry['value'], True
+
+    lock_key, token = f"{key}:lock", uuid.uuid4().hex
+    locked = cache.add(lock_key, token, LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            fresh = _is_fresh(entry, version, now)
+            registry.count_cache_tier('l2', 'hit' if fresh else 'stale')
+            return entry['value'], fresh
+        deadline = now + WAIT_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if _is_fresh(entry, version, time.time()):
+                registry.count_cache_tier('l2', 'hit')
+                return entry['value'], True
+        # The lock holder is slow or gone; build it here rather than fail
+
+    registry.count_cache_tier('l2', 'miss')
+    try:
+        started = time.perf_counter()
+        with fill_reads(marker):
+            value = compute()
+        cache.set(key, *_entry(value, version, time.perf_counter() - started, timeout))
+        return value, True
+    finally:
+        # Only our own lock: one that timed out may be another caller's by now
+        if locked and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+async def aget_or_compute(key: str, compute: Callable[[], Awaitable[Any]], timeout: float,
+                          version: Any = None, marker: Optional[str] = None) -> Tuple[Any, bool]:
+    """Async variant of get_or_compute() for an async ``compute``"""
+    entry = await cache.aget(key)
+    now = time.time()
+    if _is_fresh(entry, version, now) and not _refresh_early(entry, now):
+        registry.count_cache_tier('l2', 'hit')
+        return entry['value'], True
+
+    lock_key, token = f"{key}:lock", uuid.uuid4().hex
+    locked = await cache.aadd(lock_key, token, LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            fresh = _is_fresh(entry, version, now)
+            registry.count_cache_tier('l2', 'hit' if fresh else 'stale')
+            return entry['value'], fresh
+        deadline = now + WAIT_TIMEOUT
+        while time.time() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            entry = await cache.aget(key)
+            if _is_fresh(entry, version, time.time()):
+                registry.count_cache_tier('l2', 'hit')
+                return entry['value'], True
+
+    registry.count_cache_tier('l2', 'miss')
+    try:
+        started = time.perf_counter()
+        with await afill_reads(marker):
+            value = await compute()
+        await cache.aset(key, *_entry(value, version, time.perf_counter() - started, timeout))
+        return value, True
+    finally:
+        if locked and await cache.aget(lock_key) == token:
+            await cache.adelete(lock_key)
+
+
+def get_many_values(keys: Iterable[str], version: Any = None) -> Dict[str, Any]:
+    """Fresh values, by key, of entries written by get_or_compute() or set_many_values()"""
+    now = time.time()
+    return {
+        key: entry['value'] for key, entry in cache.get_many(keys).items()
+        if _is_fresh(entry, version, now)
+    }
+
+
+def set_many_values(values: Dict[str, Any], timeout: float, version: Any = None, delta: float = 0.0) -> None:
+    """Store several values as get_or_compute() would, in one round trip"""
+    if not values:
+        return
+    ttl = jittered(timeout)
+    expires = time.time() + ttl
+    cache.set_many(
+        {key: {'value': value, 'version': version, 'delta': delta, 'expires': expires}
+         for key, value in values.items()},
+        ttl * STALE_FACTOR
+    )
+
+
+class LocalCache:
+    """
+    Per-process LRU in front of the shared cache, bounded by the pickled
+    size of its values and by a maximum entry age.
+
+    Each entry keeps the version stamp it was read under. For
+    ``revalidate_after`` seconds after it was last confirmed it is served
+    without touching the shared cache; after that, one small read of the
+    stamp confirms it. A write elsewhere changes the stamp, so no process
+    serves a value longer than that bound after the write committed.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, revalidate_after: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+        self.size = 0
+        self._entries: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, str, bool]]:
+        """(value, stamp, confirmed) of a live entry, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stamp, size, stored, checked = entry
+            if now - stored >= self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value, stamp, now - checked < self.revalidate_after
+
+    def confirm(self, key: str) -> None:
+        """Record that the entry's stamp still matches the shared one"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[4] = time.monotonic()
+
+    def set(self, key: str, value: Any, stamp: str) -> None:
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        now = time.monotonic()
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = [value, stamp, size, now, now]
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                registry.count_cache_tier('l1', 'eviction')
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+
+local_cache = LocalCache(
+    max_bytes=getattr(settings, 'RECIPE_L1_CACHE_BYTES', 8 * 1024 * 1024),
+    ttl=getattr(settings, 'RECIPE_L1_CACHE_TTL', 60),
+    revalidate_after=getattr(settings, 'RECIPE_L1_REVALIDATE_SECONDS', 1),
+)
+registry.register_gauge('l1_cache_entries', 'Entries in the per-process recipe cache.', lambda: len(local_cache))
+registry.register_gauge('l1_cache_bytes', 'Pickled size of the per-process recipe cache.', lambda: local_cache.size)
+
+
+def current_stamp(key: str) -> str:
+    """Version stamp of ``key`` in the shared cache, creating one if there is none"""
+    stamp_key = f"{key}{STAMP_SUFFIX}"
+    stamp = cache.get(stamp_key)
+    if stamp is None:
+        stamp = uuid.uuid4().hex
+        if not cache.add(stamp_key, stamp, None):
+            stamp = cache.get(stamp_key) or stamp
+    return stamp
+
+
+async def acurrent_stamp(key: str) -> str:
+    """Async variant of current_stamp()"""
+    stamp_key = f"{key}{STAMP_SUFFIX}"
+    stamp = await cache.aget(stamp_key)
+    if stamp is None:
+        stamp = uuid.uuid4().hex
+        if not await cache.aadd(stamp_key, stamp, None):
+            stamp = await cache.aget(stamp_key) or stamp
+    return stamp
+
+
+def get_or_compute_local(key: str, compute: Callable[[], Any], timeout: float) -> Any:
+    """
+    get_or_compute() behind the per-process LocalCache, for keys whose
+    writers go through invalidate_recipes(). Returns the value.
+    """
+    if local_cache.max_bytes <= 0:
+        return get_or_compute(key, compute, timeout, marker=f"{key}{INVALIDATED_SUFFIX}")[0]
+    entry = local_cache.lookup(key)
+    if entry is not None and entry[2]:
+        registry.count_cache_tier('l1', 'hit')
+        return entry[0]
+    # The stamp is read before the value, so a write in between leaves
+    # this entry with the old stamp and the next check refetches it
+    stamp = current_stamp(key)
+    if entry is not None and entry[1] == stamp:
+        local_cache.confirm(key)
+        registry.count_cache_tier('l1', 'revalidated')
+        return entry[0]
+    registry.count_cache_tier('l1', 'miss')
+    value, fresh = get_or_compute(key, compute, timeout, marker=f"{key}{INVALIDATED_SUFFIX}")
+    if fresh:
+        local_cache.set(key, value, stamp)
+    return value
+
+
+async def aget_or_compute_local(key: str, compute: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+    """Async variant of get_or_compute_local()"""
+    if local_cache.max_bytes <= 0:
+        return (await aget_or_compute(key, compute, timeout, marker=f"{key}{INVALIDATED_SUFFIX}"))[0]
+    entry = local_cache.lookup(key)
+    if entry is not None and entry[2]:
+        registry.count_cache_tier('l1', 'hit')
+        return entry[0]
+    stamp = await acurrent_stamp(key)
+    if entry is not None and entry[1] == stamp:
+        local_cache.confirm(key)
+        registry.count_cache_tier('l1', 'revalidated')
+        return entry[0]
+    registry.count_cache_tier('l1', 'miss')
+    value, fresh = await aget_or_compute(key, compute, timeout, marker=f"{key}{INVALIDATED_SUFFIX}")
+    if fresh:
+        local_cache.set(key, value, stamp)
+    return value
@@ -0,0 +1,66 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+from apps.home.caching import aget_list_generation, get_list_generation, stable_digest
+
+
+def recipe_etag(recipe_id: Any, updated_at: datetime) -> str:
+    """Strong ETag for one recipe, changing whenever the row is saved"""
+    return quote_etag(hashlib.sha1(f"{recipe_id}:{updated_at.isoformat()}".encode()).hexdigest())
+
+
+def list_etag(*parts: Any) -> str:
+    """
+    ETag for one list page: the list cache generation plus a digest of the
+    filters, page size and cursor. Every write bumps the generation, so
+    this needs no database access at all.
+    """
+    return quote_etag(f"{get_list_generation()}-{stable_digest(*parts)}")
+
+
+async def alist_etag(*parts: Any) -> str:
+    """Async variant of list_etag()"""
+    return quote_etag(f"{await aget_list_generation()}-{stable_digest(*parts)}")
+
+
+def validator_headers(etag: Optional[str] = None, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {}
+    if etag:
+        headers['ETag'] = etag
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return headers
+
+
+def is_not_modified(request, etag: Optional[str] = None, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Whether a GET can be answered with 304 Not Modified.
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110
+    section 13.2.2) and is compared weakly, as required for GET.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        if not etag:
+            return False
+        etags = parse_etags(if_none_match)
+        if '*' in etags:
+            return True
+        strip = lambda tag: tag[2:] if tag.startswith('W/') else tag  # noqa: E731
+        return strip(etag) in {strip(tag) for tag in etags}
+
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE'))
+    if if_modified_since is not None and last_modified is not None:
+        return int(last_modified.timestamp()) <= if_modified_since
+    return False
+
+
+def not_modified(etag: Optional[str] = None, last_modified: Optional[datetime] = None) -> HttpResponseNotModified:
+    response = HttpResponseNotModified()
+    for header, value in validator_headers(etag, last_modified).items():
+        response[header] = value
+    return response
@@ -0,0 +1,135 @@
+"""
+Streaming export of the recipe catalogue, in the formats the importer
+reads (JSONL or CSV), optionally gzipped.
+
+Rows come from one values_list() query read through iterator(), so
+memory stays flat however many recipes there are. Ingredients are taken
+from the denormalized ingredients_data column, without a join.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Iterator, Optional
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.home.fast_serializers import datetime_converter, uuid_converter
+from apps.home.importers import INGREDIENT_SEPARATOR, SUPPORTED_FORMATS
+from apps.home.models import RecipeModel
+
+EXPORT_FIELDS = (
+    'recipe_id', 'recipe_slug', 'recipe_name', 'recipe_description', 'recipe_type',
+    'is_active', 'created_at', 'updated_at', 'ingredients_data'
+)
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+# Rows fetched per database round trip, and rows per chunk of output
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+
+class ExportError(ValueError):
+    """Raised for export options that cannot be honoured"""
+
+
+def parse_since(value: Optional[str]) -> Optional[datetime]:
+    """An ISO 8601 ``since`` bound; naive values are taken as UTC"""
+    if not value:
+        return None
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        since = None
+    if since is None:
+        raise ExportError(f"Invalid since timestamp: {value}")
+    return since if timezone.is_aware(since) else timezone.make_aware(since, dt_timezone.utc)
+
+
+def export_rows(since: Optional[datetime] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Recipes in (updated_at, recipe_id) order. A full export has the
+    active recipes; an incremental one (``since``) has every recipe
+    changed after it, soft deleted ones included, so a copy can drop them.
+    """
+    queryset = RecipeModel.objects.order_by('updated_at', 'recipe_id')
+    if since is None:
+        queryset = queryset.filter(is_active=True)
+    else:
+        queryset = queryset.filter(updated_at__gt=since)
+    return queryset.values_list(*EXPORT_FIELDS, named=True).iterator(chunk_size=chunk_size)
+
+
+def _records(rows: Iterator[Any]) -> Iterator[dict]:
+    to_datetime = datetime_converter()
+    for row in rows:
+        yield {
+            'recipe_id': uuid_converter(row.recipe_id),
+            'recipe_slug': row.recipe_slug,
+            'recipe_name': row.recipe_name,
+            'recipe_description': row.recipe_description,
+            'recipe_type': row.recipe_type,
+            'is_active': row.is_active,
+            'created_at': to_datetime(row.created_at),
+            'updated_at': to_datetime(row.updated_at),
+            'ingredients': [ingredient['ingredient_name'] for ingredient in row.ingredients_data],
+        }
+
+
+def _jsonl_lines(rows: Iterator[Any]) -> Iterator[str]:
+    for record in _records(rows):
+        yield json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def _csv_lines(rows: Iterator[Any]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = [field for field in EXPORT_FIELDS if field != 'ingredients_data'] + ['ingredients']
+    writer.writerow(columns)
+    for record in _records(rows):
+        record['ingredients'] = INGREDIENT_SEPARATOR.join(record['ingredients'])
+        writer.writerow([record[column] for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Only the header when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _batched(lines: Iterator[str]) -> Iterator[bytes]:
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch).encode('utf-8')
+            batch = []
+    if batch:
+        yield ''.join(batch).encode('utf-8')
+
+
+def _gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(fmt: str = 'jsonl', since: Optional[datetime] = None, gzip: bool = False,
+                chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """The export as a stream of byte chunks"""
+    if fmt not in SUPPORTED_FORMATS:
+        raise ExportError(f"Unsupported export format: {fmt}")
+    lines = (_jsonl_lines if fmt == 'jsonl' else _csv_lines)(export_rows(since, chunk_size))
+    chunks = _batched(lines)
+    return _gzipped(chunks) if gzip else chunks
+
+
+def export_filename(fmt: str, gzip: bool = False) -> str:
+    return f"recipes.{fmt}{'.gz' if gzip else ''}"
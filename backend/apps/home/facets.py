@@ -0,0 +1,173 @@
+"""
+Facet counts for the recipe list: active recipes per recipe type and
+per catalog ingredient.
+
+The unfiltered counts live in RecipeFacetCountModel and are adjusted by
+the signal handlers and the bulk importer in the same transaction as the
+write. Concurrent edits of one recipe can still make them drift (each
+applies its delta from the state it loaded), which
+``manage.py rebuild_facet_counts`` checks and repairs. Filtered counts
+are aggregated over the indexed recipe_type/is_active columns and the
+ingredient link table.
+"""
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Count, F, QuerySet
+
+from apps.home.models import RecipeFacetCountModel, RecipeIngredientIndexModel, RecipeModel
+
+RECIPE_TYPE = 'recipe_type'
+INGREDIENT = 'ingredient'
+
+
+def apply_facet_deltas(deltas: Dict[Tuple[str, str], int]) -> None:
+    """Add each (facet, value) -> change in ``deltas`` to the counter table"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    RecipeFacetCountModel.objects.bulk_create(
+        [RecipeFacetCountModel(facet=facet, value=value) for facet, value in deltas],
+        ignore_conflicts=True
+    )
+    # One UPDATE per distinct change, so a recipe's +1 on every ingredient is a single statement
+    by_change = defaultdict(list)
+    for (facet, value), delta in deltas.items():
+        by_change[(facet, delta)].append(value)
+    for (facet, delta), values in by_change.items():
+        RecipeFacetCountModel.objects.filter(facet=facet, value__in=values).update(count=F('count') + delta)
+
+
+def ingredient_names(recipe_id: Any) -> List[str]:
+    return list(
+        RecipeIngredientIndexModel.objects.filter(recipe_id=recipe_id).values_list('ingredient__name', flat=True)
+    )
+
+
+def stored_facet_state(instance: RecipeModel) -> Optional[Tuple[str, bool]]:
+    """(recipe_type, is_active) of the row as last saved, or None for a new recipe"""
+    if instance._state.adding:
+        return None
+    state = getattr(instance, '_facet_state', None)
+    if state is None or None in state:
+        state = RecipeModel.objects.filter(pk=instance.pk).values_list('recipe_type', 'is_active').first()
+    return state
+
+
+def recipe_saved(instance: RecipeModel, before: Optional[Tuple[str, bool]]) -> None:
+    """Move the recipe's contribution from its ``before`` state to its saved one"""
+    after = (instance.recipe_type, instance.is_active)
+    instance._facet_state = after
+    if before == after:
+        return
+    old_type, old_active = before or (None, False)
+    deltas = Counter()
+    if old_active:
+        deltas[(RECIPE_TYPE, old_type)] -= 1
+    if instance.is_active:
+        deltas[(RECIPE_TYPE, instance.recipe_type)] += 1
+    if before is not None and old_active != instance.is_active:
+        change = 1 if instance.is_active else -1
+        for name in ingredient_names(instance.pk):
+            deltas[(INGREDIENT, name)] += change
+    apply_facet_deltas(deltas)
+
+
+def recipe_deleted(instance: RecipeModel) -> None:
+    """Remove a recipe's contribution; called before its ingredient links are deleted"""
+    state = stored_facet_state(instance)
+    if not state or not state[1]:
+        return
+    deltas = Counter({(RECIPE_TYPE, state[0]): -1})
+    for name in ingredient_names(instance.pk):
+        deltas[(INGREDIENT, name)] -= 1
+    apply_facet_deltas(deltas)
+
+
+def recipes_created(recipes: Iterable[RecipeModel]) -> None:
+    """Count recipes inserted without signals, such as by bulk_create"""
+    apply_facet_deltas(Counter((RECIPE_TYPE, recipe.recipe_type) for recipe in recipes if recipe.is_active))
+
+
+def _format(type_counts: Dict[str, int], ingredients: List[Tuple[str, int]]) -> Dict[str, Any]:
+    return {
+        RECIPE_TYPE: [
+            {'value': value, 'label': label, 'count': type_counts.get(value, 0)}
+            for value, label in RecipeModel.RECIPE_TYPE_CHOICES
+        ],
+        'ingredients': [{'name': name, 'count': count} for name, count in ingredients],
+    }
+
+
+def counted_facets(top: int) -> Dict[str, Any]:
+    """Facets of every active recipe, read from the counter table alone"""
+    type_counts = dict(
+        RecipeFacetCountModel.objects.filter(facet=RECIPE_TYPE).values_list('value', 'count')
+    )
+    ingredients = list(
+        RecipeFacetCountModel.objects.filter(facet=INGREDIENT, count__gt=0)
+        .order_by('-count', 'value').values_list('value', 'count')[:top]
+    )
+    return _format(type_counts, ingredients)
+
+
+def queried_facets(queryset: QuerySet, top: int) -> Dict[str, Any]:
+    """Facets of the recipes in ``queryset``"""
+    queryset = queryset.order_by()
+    type_counts = dict(queryset.values_list('recipe_type').annotate(count=Count('recipe_id')))
+    ingredients = list(
+        RecipeIngredientIndexModel.objects.filter(recipe_id__in=queryset.values('recipe_id'))
+        .values_list('ingredient__name').annotate(count=Count('recipe_id'))
+        .order_by('-count', 'ingredient__name')[:top]
+    )
+    return _format(type_counts, ingredients)
+
+
+def recount_facets() -> Counter:
+    """Every counter recomputed from the recipes, to check or repair the table"""
+    counts = Counter()
+    active = RecipeModel.objects.filter(is_active=True).order_by()
+    for recipe_type, count in active.values_list('recipe_type').annotate(count=Count('recipe_id')):
+        counts[(RECIPE_TYPE, recipe_type)] = count
+    for name, count in (
+        RecipeIngredientIndexModel.objects.filter(recipe__is_active=True)
+        .values_list('ingredient__name').annotate(count=Count('recipe_id')).order_by()
+    ):
+        counts[(INGREDIENT, name)] = count
+    return counts
+
+
+def facet_drift() -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """(stored, recounted) of every counter that differs from a recount"""
+    stored = {
+        (facet, value): count
+        for facet, value, count in RecipeFacetCountModel.objects.values_list('facet', 'value', 'count')
+    }
+    counts = recount_facets()
+    return {
+        key: (stored.get(key, 0), counts.get(key, 0))
+        for key in stored.keys() | counts.keys() if stored.get(key, 0) != counts.get(key, 0)
+    }
+
+
+def rebuild_facet_counts() -> int:
+    """
+    Replace the counter table with a recount; returns how many counters
+    it holds. Writers that adjust counters wait until it commits, so none
+    of their deltas is lost or counted twice.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {connection.ops.quote_name(RecipeFacetCountModel._meta.db_table)} IN EXCLUSIVE MODE"
+                )
+        # Deleting first takes SQLite's write lock before the recount reads
+        RecipeFacetCountModel.objects.all().delete()
+        counts = recount_facets()
+        RecipeFacetCountModel.objects.bulk_create(
+            [RecipeFacetCountModel(facet=facet, value=value, count=count) for (facet, value), count in counts.items()],
+            batch_size=500
+        )
+    return len(counts)
@@ -0,0 +1,154 @@
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import DateTimeField
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+from apps.home.images import DETAIL_VARIANTS, stored_thumbnail_url, stored_variant_urls
+from apps.home.models import RecipeModel
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same bytes
+    orjson = None
+
+# Columns fetched for each shape, in the order the DRF serializers emit them
+LIST_FIELDS = (
+    'recipe_id', 'recipe_name', 'recipe_image', 'recipe_image_variants',
+    'recipe_slug', 'recipe_type', 'created_at', 'ingredients_data'
+)
+CHANGE_FIELDS = LIST_FIELDS + ('updated_at', 'is_active')
+DETAIL_FIELDS = (
+    'recipe_id', 'recipe_image_variants', 'recipe_name', 'recipe_description',
+    'recipe_image', 'recipe_slug', 'recipe_type',
+    'is_active', 'created_at', 'updated_at'
+)
+
+
+def fast_serialization_enabled() -> bool:
+    return getattr(settings, 'RECIPE_FAST_SERIALIZATION', False)
+
+
+def datetime_converter() -> Callable[[Optional[datetime]], Optional[str]]:
+    """
+    serializers.DateTimeField().to_representation with the output format
+    and timezone looked up once instead of per value
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    if output_format is None or output_format.lower() != ISO_8601:
+        return DateTimeField().to_representation
+
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def convert(value):
+        if value is None:
+            return None
+        if tz is not None:
+            value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+def image_converter() -> Callable[[Optional[str]], Optional[str]]:
+    """serializers.ImageField().to_representation for a stored file name"""
+    storage = RecipeModel._meta.get_field('recipe_image').storage
+    if not api_settings.UPLOADED_FILES_USE_URL:
+        return lambda name: name or None
+    return lambda name: storage.url(name) if name else None
+
+
+def uuid_converter(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def recipe_list_rows(queryset: QuerySet) -> QuerySet:
+    """
+    The list queryset as named tuples of just the list columns. Rows keep
+    attribute access to created_at and recipe_id, so the paginators work
+    on them unchanged.
+    """
+    return queryset.values_list(*LIST_FIELDS, named=True)
+
+
+def recipe_detail_rows(queryset: QuerySet) -> QuerySet:
+    return queryset.values_list(*DETAIL_FIELDS, named=True)
+
+
+def serialize_recipe_list(rows: List[Any]) -> List[Dict[str, Any]]:
+    """
+    RecipeListSerializer(many=True).data for rows from recipe_list_rows();
+    ingredients come already serialized from ingredients_data
+    """
+    to_datetime = datetime_converter()
+    to_image = image_converter()
+    storage = RecipeModel._meta.get_field('recipe_image').storage
+    return [
+        {
+            'recipe_id': uuid_converter(row.recipe_id),
+            'recipe_name': row.recipe_name,
+            'recipe_image': to_image(row.recipe_image),
+            'recipe_thumbnail': stored_thumbnail_url(storage, row.recipe_image_variants, row.recipe_image),
+            'recipe_slug': row.recipe_slug,
+            'recipe_type': row.recipe_type,
+            'created_at': to_datetime(row.created_at),
+            'ingredients': row.ingredients_data,
+        }
+        for row in rows
+    ]
+
+
+def serialize_recipe_detail(row: Any) -> Dict[str, Any]:
+    """RecipeDetailSerializer(recipe).data for a row from recipe_detail_rows()"""
+    to_datetime = datetime_converter()
+    storage = RecipeModel._meta.get_field('recipe_image').storage
+    return {
+        'recipe_id': uuid_converter(row.recipe_id),
+        'recipe_image_variants': stored_variant_urls(storage, row.recipe_image_variants, DETAIL_VARIANTS),
+        'recipe_name': row.recipe_name,
+        'recipe_description': row.recipe_description,
+        'recipe_image': image_converter()(row.recipe_image),
+        'recipe_slug': row.recipe_slug,
+        'recipe_type': row.recipe_type,
+        'is_active': row.is_active,
+        'created_at': to_datetime(row.created_at),
+        'updated_at': to_datetime(row.updated_at),
+    }
+
+
+def render(data: Any) -> bytes:
+    """
+    The bytes JSONRenderer().render(data) would produce, without the
+    renderer's per call setup and using orjson when it is installed.
+
+    Fast serialization results hold only strings, ints, booleans and
+    None, for which orjson's output matches the stdlib encoder exactly;
+    anything else it rejects falls back to the DRF renderer.
+    """
+    if not (api_settings.COMPACT_JSON and api_settings.UNICODE_JSON):
+        return JSONRenderer().render(data)
+
+    if orjson is not None and fast_serialization_enabled():
+        try:
+            body = orjson.dumps(
+                data, default=encoders.JSONEncoder().default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:
+            return JSONRenderer().render(data)
+    else:
+        body = json.dumps(
+            data,
+            cls=encoders.JSONEncoder,
+            ensure_ascii=False,
+            allow_nan=not api_settings.STRICT_JSON,
+            separators=(',', ':'),
+        ).encode()
+    # Like JSONRenderer, escape the two line terminators that are valid JSON but not JavaScript
+    return body.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
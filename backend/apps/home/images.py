@@ -0,0 +1,144 @@
+import hashlib
+import io
+import logging
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Longest edge, in pixels, of each derivative
+VARIANT_SIZES = getattr(settings, 'RECIPE_IMAGE_VARIANT_SIZES', {
+    'thumb': 160,
+    'small': 320,
+    'medium': 640,
+    'large': 1280,
+})
+
+# Sizes exposed by each serializer shape
+LIST_VARIANT = 'thumb'
+DETAIL_VARIANTS = ('small', 'medium', 'large')
+
+ENCODERS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'avif': {'format': 'AVIF', 'quality': 60},
+}
+VARIANT_FORMATS = [fmt for fmt in ('webp', 'avif') if features.check(fmt)]
+
+VARIANTS_DIR = 'recipes/variants'
+
+
+def content_hash(file) -> str:
+    """SHA-256 of an uploaded or stored file, read in chunks"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _variant_name(digest: str, size_name: str, fmt: str) -> str:
+    return f"{VARIANTS_DIR}/{digest[:2]}/{digest}/{size_name}.{fmt}"
+
+
+def generate_variants(file, digest: str, storage) -> Dict[str, Dict[str, str]]:
+    """
+    Resize and re-encode an image into every configured size and format.
+
+    Derivatives are stored under the content hash of the original, so a
+    re-upload of the same picture reuses the files already on disk.
+    Sizes larger than the source are capped at the source size.
+    """
+    variants = {}
+    pending = {
+        size_name: {fmt: _variant_name(digest, size_name, fmt) for fmt in VARIANT_FORMATS}
+        for size_name in VARIANT_SIZES
+    }
+    if all(storage.exists(name) for names in pending.values() for name in names.values()):
+        return pending
+
+    file.seek(0)
+    with Image.open(file) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    for size_name, edge in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        variants[size_name] = {}
+        for fmt, name in pending[size_name].items():
+            if not storage.exists(name):
+                buffer = io.BytesIO()
+                resized.save(buffer, **ENCODERS[fmt])
+                name = storage.save(name, ContentFile(buffer.getvalue()))
+            variants[size_name][fmt] = name
+    return variants
+
+
+def process_recipe_image(recipe) -> None:
+    """
+    Deduplicate a recipe's uploaded image and build its derivatives.
+
+    When another recipe already holds a byte-identical upload, this
+    recipe is pointed at that file and its own copy is deleted.
+    """
+    field = recipe.recipe_image
+    if not field:
+        if recipe.recipe_image_hash or recipe.recipe_image_variants:
+            recipe.recipe_image_hash = ''
+            recipe.recipe_image_variants = {}
+            recipe.save(update_fields=['recipe_image_hash', 'recipe_image_variants', 'updated_at'])
+        return
+
+    storage = field.storage
+    with field.open('rb') as file:
+        digest = content_hash(file)
+        if digest == recipe.recipe_image_hash and recipe.recipe_image_variants:
+            return
+
+        duplicate = type(recipe).objects.filter(
+            recipe_image_hash=digest
+        ).exclude(recipe_id=recipe.recipe_id).exclude(recipe_image='').values_list(
+            'recipe_image', flat=True
+        ).first()
+
+        variants = generate_variants(file, digest, storage)
+
+    if duplicate and duplicate != field.name and storage.exists(duplicate):
+        own_copy = field.name
+        recipe.recipe_image.name = duplicate
+        storage.delete(own_copy)
+
+    recipe.recipe_image_hash = digest
+    recipe.recipe_image_variants = variants
+    recipe.save(update_fields=['recipe_image', 'recipe_image_hash', 'recipe_image_variants', 'updated_at'])
+
+
+def variant_urls(recipe, size_names: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    return stored_variant_urls(recipe.recipe_image.storage, recipe.recipe_image_variants, size_names)
+
+
+def thumbnail_url(recipe) -> Optional[str]:
+    """Smallest derivative for cards, falling back to the original upload"""
+    return stored_thumbnail_url(recipe.recipe_image.storage, recipe.recipe_image_variants, recipe.recipe_image.name)
+
+
+def stored_variant_urls(storage, variants: Optional[dict], size_names: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """variant_urls() from raw column values, for callers that skip model instances"""
+    variants = variants or {}
+    return {
+        size_name: {fmt: storage.url(name) for fmt, name in variants[size_name].items()}
+        for size_name in size_names if size_name in variants
+    }
+
+
+def stored_thumbnail_url(storage, variants: Optional[dict], image_name: Optional[str]) -> Optional[str]:
+    formats = (variants or {}).get(LIST_VARIANT)
+    if formats:
+        return storage.url(formats.get('webp') or next(iter(formats.values())))
+    if image_name:
+        return storage.url(image_name)
+    return None
@@ -0,0 +1,127 @@
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List
+
+from django.db.models import Count, QuerySet
+from django.utils import timezone
+
+from apps.home.facets import INGREDIENT, apply_facet_deltas
+from apps.home.fast_serializers import datetime_converter, uuid_converter
+from apps.home.models import (
+    IngredientCatalogModel, IngredientsModel, RecipeIngredientIndexModel, RecipeModel
+)
+
+MATCH_MODES = ('all', 'any')
+
+
+class InvalidIngredientFilter(ValueError):
+    """Raised for an ingredients filter the list endpoint cannot apply"""
+
+
+def normalize_ingredient(name: str) -> str:
+    """Catalog form of an ingredient name: trimmed, single spaced, lower case"""
+    return ' '.join(str(name).split()).lower()
+
+
+def parse_ingredient_filter(value: str) -> List[str]:
+    """The distinct normalized names of a comma separated ?ingredients= value"""
+    names = []
+    for name in value.split(','):
+        name = normalize_ingredient(name)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def serialize_ingredients(rows: Iterable[IngredientsModel]) -> List[Dict[str, Any]]:
+    """IngredientsSerializer(many=True).data, as plain JSON values"""
+    to_datetime = datetime_converter()
+    return [
+        {
+            'ingredient_id': uuid_converter(row.ingredient_id),
+            'ingredient_name': row.ingredient_name,
+            'created_at': to_datetime(row.created_at),
+            'updated_at': to_datetime(row.updated_at),
+            'recipe': uuid_converter(row.recipe_id),
+        }
+        for row in rows
+    ]
+
+
+def catalog_ids(names: Iterable[str]) -> Dict[str, int]:
+    """Catalog ids by normalized name, adding any names not seen before"""
+    names = set(names)
+    if not names:
+        return {}
+    IngredientCatalogModel.objects.bulk_create(
+        [IngredientCatalogModel(name=name) for name in names], ignore_conflicts=True
+    )
+    return dict(IngredientCatalogModel.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def refresh_recipe_ingredients(recipe_ids: Iterable[Any]) -> None:
+    """
+    Rebuild the denormalized ingredient list and the catalog links of the
+    given recipes from their IngredientsModel rows, and move the
+    ingredient facet counts of active recipes by the links that changed.
+
+    Costs a fixed handful of queries however many recipes are passed, so
+    the bulk importer calls it once per chunk.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    by_recipe = defaultdict(list)
+    for row in IngredientsModel.objects.filter(recipe_id__in=recipe_ids).order_by('created_at', 'ingredient_id'):
+        by_recipe[row.recipe_id].append(row)
+
+    # updated_at moves too, so the change feed and validators see the new ingredients
+    now = timezone.now()
+    recipes = list(RecipeModel.objects.filter(recipe_id__in=recipe_ids).only('recipe_id', 'is_active'))
+    for recipe in recipes:
+        recipe.ingredients_data = serialize_ingredients(by_recipe.get(recipe.recipe_id, []))
+        recipe.updated_at = now
+    RecipeModel.objects.bulk_update(recipes, ['ingredients_data', 'updated_at'], batch_size=500)
+
+    ids = catalog_ids(normalize_ingredient(row.ingredient_name) for rows in by_recipe.values() for row in rows)
+    links = {
+        (ids[normalize_ingredient(row.ingredient_name)], recipe_id)
+        for recipe_id, rows in by_recipe.items() for row in rows
+    }
+    # Facets count active recipes only
+    active = {recipe.recipe_id for recipe in recipes if recipe.is_active}
+    names = {ingredient_id: name for name, ingredient_id in ids.items()}
+    old_links = set(
+        RecipeIngredientIndexModel.objects.filter(recipe_id__in=active).values_list('ingredient__name', 'recipe_id')
+    )
+    new_links = {(names[ingredient_id], recipe_id) for ingredient_id, recipe_id in links if recipe_id in active}
+    deltas = Counter()
+    for name, _ in new_links - old_links:
+        deltas[(INGREDIENT, name)] += 1
+    for name, _ in old_links - new_links:
+        deltas[(INGREDIENT, name)] -= 1
+    apply_facet_deltas(deltas)
+    
+    RecipeIngredientIndexModel.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeIngredientIndexModel.objects.bulk_create(
+        [RecipeIngredientIndexModel(ingredient_id=ingredient_id, recipe_id=recipe_id)
+         for ingredient_id, recipe_id in links],
+        batch_size=500
+    )
+
+
+def recipes_with_ingredients(names: List[str], match: str = 'all') -> QuerySet:
+    """
+    Subquery of recipe ids using all (or any) of the normalized ``names``.
+
+    Resolved on the catalog's unique name index and the (ingredient,
+    recipe) index of the link table, without touching recipe rows.
+    """
+    if match not in MATCH_MODES:
+        raise InvalidIngredientFilter(f"ingredients_match must be one of: {', '.join(MATCH_MODES)}")
+    links = RecipeIngredientIndexModel.objects.filter(ingredient__name__in=names)
+    if match == 'any':
+        return links.values('recipe_id')
+    return links.values('recipe_id').annotate(
+        matched=Count('ingredient_id')
+    ).filter(matched=len(names)).values('recipe_id')
@@ -0,0 +1,344 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware gives every request a RequestMetrics object held
+in a context variable, so it follows the request into sync_to_async
+threads and async views alike. SQL is timed by a wrapper installed on
+every database connection, cache calls by the ``cache`` proxy below, and
+serialization by ``timed('serialize')`` blocks in the service layer.
+Each response gets a Server-Timing header, and the totals are folded
+into an in-process registry exposed in Prometheus text format.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.http import HttpResponse, HttpResponseForbidden
+
+_current: ContextVar[Optional['RequestMetrics']] = ContextVar('recipe_request_metrics', default=None)
+
+# Upper bounds, in seconds, of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_MISSING = object()
+
+
+class RequestMetrics:
+    __slots__ = (
+        'sql_count', 'sql_seconds', 'cache_hits', 'cache_misses', 'cache_sets',
+        'cache_seconds', 'timings'
+    )
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_sets = 0
+        self.cache_seconds = 0.0
+        self.timings: Dict[str, float] = {}
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        entries = [
+            f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.sql_count} queries"',
+            f'cache;dur={self.cache_seconds * 1000:.2f};'
+            f'desc="{self.cache_hits} hits {self.cache_misses} misses {self.cache_sets} sets"',
+        ]
+        entries.extend(f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.timings.items())
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def timed(name: str):
+    """Add the duration of the block to the current request's ``name`` timing"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timing(name, time.perf_counter() - started)
+
+
+def sql_timer(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing the current request's queries"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_seconds += time.perf_counter() - started
+        metrics.sql_count += 1
+
+
+def install_sql_timer(sender, connection, **kwargs) -> None:
+    """connection_created receiver; wrappers survive until the connection closes"""
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+class InstrumentedCache:
+    """
+    Drop-in for django.core.cache.cache that records hits, misses, sets
+    and time spent for the current request. Outside a request it adds
+    one context variable lookup per call.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(default_cache, name)
+
+    def _timed(self, method, *args, **kwargs) -> Tuple[Any, Optional[RequestMetrics]]:
+        metrics = _current.get()
+        if metrics is None:
+            return method(*args, **kwargs), None
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs), metrics
+        finally:
+            metrics.cache_seconds += time.perf_counter() - started
+
+    async def _atimed(self, method, *args, **kwargs) -> Tuple[Any, Optional[RequestMetrics]]:
+        metrics = _current.get()
+        if metrics is None:
+            return await method(*args, **kwargs), None
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs), metrics
+        finally:
+            metrics.cache_seconds += time.perf_counter() - started
+
+    @staticmethod
+    def _count_get(metrics: Optional[RequestMetrics], value: Any, default: Any) -> Any:
+        if value is _MISSING:
+            if metrics:
+                metrics.cache_misses += 1
+            return default
+        if metrics:
+            metrics.cache_hits += 1
+        return value
+
+    @staticmethod
+    def _count_many(metrics: Optional[RequestMetrics], keys, found: Dict[str, Any]) -> Dict[str, Any]:
+        if metrics:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    @staticmethod
+    def _count_sets(metrics: Optional[RequestMetrics], result: Any, sets: int = 1) -> Any:
+        if metrics:
+            metrics.cache_sets += sets
+        return result
+
+    def get(self, key, default=None, version=None):
+        value, metrics = self._timed(default_cache.get, key, _MISSING, version=version)
+        return self._count_get(metrics, value, default)
+
+    async def aget(self, key, default=None, version=None):
+        value, metrics = await self._atimed(default_cache.aget, key, _MISSING, version=version)
+        return self._count_get(metrics, value, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found, metrics = self._timed(default_cache.get_many, keys, version=version)
+        return self._count_many(metrics, keys, found)
+
+    async def aget_many(self, keys, version=None):
+        keys = list(keys)
+        found, metrics = await self._atimed(default_cache.aget_many, keys, version=version)
+        return self._count_many(metrics, keys, found)
+
+    def set(self, *args, **kwargs):
+        result, metrics = self._timed(default_cache.set, *args, **kwargs)
+        return self._count_sets(metrics, result)
+
+    async def aset(self, *args, **kwargs):
+        result, metrics = await self._atimed(default_cache.aset, *args, **kwargs)
+        return self._count_sets(metrics, result)
+
+    def set_many(self, data, *args, **kwargs):
+        result, metrics = self._timed(default_cache.set_many, data, *args, **kwargs)
+        return self._count_sets(metrics, result, len(data))
+
+    async def aset_many(self, data, *args, **kwargs):
+        result, metrics = await self._atimed(default_cache.aset_many, data, *args, **kwargs)
+        return self._count_sets(metrics, result, len(data))
+
+
+cache = InstrumentedCache()
+
+
+class Histogram:
+    """Fixed bucket histogram; counts are per bucket and cumulated on export"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Process-wide aggregates per (view, method, status). Each worker
+    process keeps its own; Prometheus sums them across scrape targets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self.reset()
+
+    def register_gauge(self, name: str, description: str, read: Callable[[], float]) -> None:
+        """Export ``read()`` as the gauge recipe_<name>, sampled on each scrape"""
+        self.gauges[name] = (description, read)
+
+    def reset(self) -> None:
+        self.durations: Dict[Tuple[str, str, str], Histogram] = defaultdict(Histogram)
+        self.totals: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.cache_tiers: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def count_cache_tier(self, tier: str, result: str) -> None:
+        """Count one lookup in a cache tier ('l1' or 'l2') by its outcome"""
+        with self._lock:
+            self.cache_tiers[(tier, result)] += 1
+
+    def record(self, view: str, method: str, status: int, seconds: float, metrics: RequestMetrics) -> None:
+        with self._lock:
+            self.durations[(view, method, str(status))].observe(seconds)
+            self.totals[('sql_queries', view)] += metrics.sql_count
+            self.totals[('sql_seconds', view)] += metrics.sql_seconds
+            self.totals[('cache_hits', view)] += metrics.cache_hits
+            self.totals[('cache_misses', view)] += metrics.cache_misses
+            self.totals[('cache_sets', view)] += metrics.cache_sets
+            self.totals[('cache_seconds', view)] += metrics.cache_seconds
+            for name, value in metrics.timings.items():
+                self.totals[(f'{name}_seconds', view)] += value
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4"""
+        with self._lock:
+            durations = {labels: (list(h.counts), h.sum, h.buckets) for labels, h in self.durations.items()}
+            totals = dict(self.totals)
+            cache_tiers = dict(self.cache_tiers)
+
+        lines = [
+            '# HELP recipe_request_duration_seconds Time spent handling requests.',
+            '# TYPE recipe_request_duration_seconds histogram',
+        ]
+        for (view, method, status), (counts, total, buckets) in sorted(durations.items()):
+            labels = f'view="{view}",method="{method}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'recipe_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'recipe_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'recipe_request_duration_seconds_sum{{{labels}}} {total}')
+            lines.append(f'recipe_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+        for name in sorted({name for name, _ in totals}):
+            metric = f'recipe_{name}_total'
+            lines.append(f'# HELP {metric} Summed over requests.')
+            lines.append(f'# TYPE {metric} counter')
+            for (other, view), value in sorted(totals.items()):
+                if other == name:
+                    lines.append(f'{metric}{{view="{view}"}} {value:g}')
+
+        if cache_tiers:
+            lines.append('# HELP recipe_cache_tier_lookups_total Cache lookups by tier and outcome.')
+            lines.append('# TYPE recipe_cache_tier_lookups_total counter')
+            for (tier, result), value in sorted(cache_tiers.items()):
+                lines.append(f'recipe_cache_tier_lookups_total{{tier="{tier}",result="{result}"}} {value}')
+
+        for name, (description, read) in sorted(self.gauges.items()):
+            lines.append(f'# HELP recipe_{name} {description}')
+            lines.append(f'# TYPE recipe_{name} gauge')
+            lines.append(f'recipe_{name} {read():g}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class PerformanceMiddleware:
+    """
+    Collects RequestMetrics for each request, adds the Server-Timing
+    header and records the totals in the registry
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'RECIPE_SERVER_TIMING', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, metrics: RequestMetrics, seconds: float):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        if view != 'metrics':
+            registry.record(view, request.method, response.status_code, seconds, metrics)
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing(seconds)
+        return response
+
+
+def metrics_allowed(request) -> bool:
+    """Staff users, and scrapers connecting from RECIPE_METRICS_ALLOWED_IPS"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'RECIPE_METRICS_ALLOWED_IPS', ())
+
+
+def metrics_view(request):
+    """Aggregated request metrics of this process, for Prometheus to scrape"""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
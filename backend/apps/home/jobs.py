@@ -0,0 +1,41 @@
+"""
+Background task handlers for the recipe app, run by the task worker
+"""
+from apps.home.caching import apply_pending_invalidation
+from apps.home.images import process_recipe_image
+from apps.home.models import RecipeModel
+from apps.home.services import RecipeService
+from apps.home.similarity import refresh_index
+from apps.home.tasks import register_task
+
+
+@register_task('recipes.process_image')
+def process_image(recipe_id: str) -> None:
+    try:
+        recipe = RecipeModel.objects.get(recipe_id=recipe_id)
+    except RecipeModel.DoesNotExist:
+        return
+    # Saving the derivatives invalidates the cached payloads (see signals)
+    process_recipe_image(recipe)
+
+
+@register_task('recipes.warm_list_cache')
+def warm_list_cache(page_size: int = 20) -> None:
+    """Rebuild the first, most requested, list page after a write"""
+    RecipeService.get_all_recipes({}, page_size=page_size)
+
+
+@register_task('recipes.flush_list_invalidation')
+def flush_list_invalidation(page_size: int = 20) -> None:
+    """
+    Apply a list invalidation coalesced by invalidate_recipes(), unless a
+    request got to it first, then rewarm
+    """
+    apply_pending_invalidation(due_only=False)
+    warm_list_cache(page_size)
+
+
+@register_task('recipes.refresh_similarity')
+def refresh_similarity() -> None:
+    """Fold the recipes changed since the last refresh into the similarity index"""
+    refresh_index()
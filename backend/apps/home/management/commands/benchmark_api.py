@@ -0,0 +1,142 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.home.benchmarks import DISHES, RECIPE_TYPES, compare_results, measure, synthetic_recipes
+from apps.home.caching import local_cache
+from apps.home.importers import RecipeImporter
+from apps.home.models import RecipeModel
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with a synthetic catalogue and benchmark "
+        "list, search, filter, detail, create, update and delete through the URLconf"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000, help="Recipes in the synthetic catalogue")
+        parser.add_argument('--ingredients', type=int, default=5, help="Ingredients per recipe")
+        parser.add_argument('--requests', type=int, default=100, help="Requests per scenario")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-cache', action='store_true', help="Run with the dummy cache backend")
+        parser.add_argument('--shared-cache', action='store_true',
+                            help="Run against the configured cache instead of a private in-memory one; "
+                                 "CLEARS IT first")
+        parser.add_argument('--output', help="Also write the JSON results to this file")
+        parser.add_argument('--compare', help="Results file of an earlier run to check for regressions")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed relative p50 latency increase when comparing")
+
+    def handle(self, *args, **options):
+        if options['requests'] > options['recipes']:
+            raise CommandError("--requests cannot exceed --recipes; every delete needs its own recipe")
+        if options['no_cache'] and options['shared_cache']:
+            raise CommandError("--no-cache and --shared-cache cannot be combined")
+
+        overrides = {
+            # The test client sends 'testserver' as its host, like the test runner allows
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+            # Only the primary is replaced by the test database: every read goes
+            # there, rather than to the real replicas, and is counted per request
+            'DATABASE_ROUTERS': [],
+        }
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        elif not options['shared_cache']:
+            overrides['CACHES'] = {'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'recipe-benchmark',
+            }}
+
+        vendor = connection.vendor
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(**overrides):
+                cache.clear()
+                local_cache.clear()
+                try:
+                    results = self.run_scenarios(options)
+                finally:
+                    cache.clear()
+                    local_cache.clear()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'commit': current_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': vendor,
+            'recipes': options['recipes'],
+            'ingredients': options['ingredients'],
+            'requests': options['requests'],
+            'seed': options['seed'],
+            'cache': not options['no_cache'],
+            'shared_cache': options['shared_cache'],
+            'results': results,
+        }
+
+        regressions = []
+        if options['compare']:
+            with open(options['compare']) as f:
+                regressions = compare_results(json.load(f), report, options['threshold'])
+            report['regressions'] = regressions
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+
+    def run_scenarios(self, options):
+        RecipeImporter().run(synthetic_recipes(options['recipes'], options['ingredients'], options['seed']), 'jsonl')
+        recipe_ids = list(
+            RecipeModel.objects.order_by('created_at', 'recipe_id').values_list('recipe_id', flat=True)
+        )
+
+        client = Client()
+        list_url = reverse('recipe-list-create')
+        detail_url = lambda i: reverse('recipe-detail', args=[recipe_ids[i % len(recipe_ids)]])  # noqa: E731
+        next_cursor = client.get(list_url).json()['next']
+
+        # Reads run before writes, and deletes run last on recipes nothing else touches
+        scenarios = {
+            'list': lambda i: client.get(list_url),
+            'list_next_page': lambda i: client.get(list_url, {'cursor': next_cursor}),
+            'filter': lambda i: client.get(list_url, {'recipe_type': RECIPE_TYPES[i % len(RECIPE_TYPES)]}),
+            'search': lambda i: client.get(list_url, {'search': DISHES[i % len(DISHES)]}),
+            'detail': lambda i: client.get(detail_url(i)),
+            'create': lambda i: client.post(list_url, {
+                'recipe_name': f"Benchmark Recipe {i}",
+                'recipe_description': "Created by the API benchmark",
+                'recipe_type': 'VEG',
+            }, content_type='application/json'),
+            'update': lambda i: client.patch(detail_url(i), {
+                'recipe_description': f"Updated by the API benchmark ({i})",
+            }, content_type='application/json'),
+            'delete': lambda i: client.delete(detail_url(-(i + 1))),
+        }
+        return {name: measure(call, options['requests']) for name, call in scenarios.items()}
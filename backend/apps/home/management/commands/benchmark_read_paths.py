@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+from apps.home.benchmarks import run_concurrent
+from apps.home.models import RecipeModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (DRF under the ASGI adapter) and async read paths "
+        "for the recipe list and detail endpoints against the configured database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--no-cache', action='store_true', help="Run with the dummy cache backend")
+
+    def handle(self, *args, **options):
+        recipe_id = RecipeModel.objects.filter(is_active=True).values_list('recipe_id', flat=True).first()
+        if recipe_id is None:
+            raise CommandError("No active recipes to read; import some first")
+
+        paths = {
+            'list_sync': reverse('recipe-list-create'),
+            'list_async': reverse('async-recipe-list'),
+            'detail_sync': reverse('recipe-detail', args=[recipe_id]),
+            'detail_async': reverse('async-recipe-detail', args=[recipe_id]),
+        }
+
+        async def run_all():
+            client = AsyncClient()
+            results = {}
+            for name, path in paths.items():
+                # One warm-up request so both paths start from the same cache state
+                await client.get(path)
+                results[name] = await run_concurrent(
+                    client, path, options['requests'], options['concurrency']
+                )
+            return results
+
+        # The test client sends 'testserver' as its host, like the test runner allows
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(**overrides):
+            results = asyncio.run(run_all())
+
+        self.stdout.write(json.dumps({
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'cache': not options['no_cache'],
+            'results': results,
+        }, indent=2))
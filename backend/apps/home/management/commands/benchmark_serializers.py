@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from apps.home.benchmarks import rows_per_second
+from apps.home.fast_serializers import (
+    recipe_detail_rows, recipe_list_rows, render, serialize_recipe_detail, serialize_recipe_list
+)
+from apps.home.models import RecipeModel
+from apps.home.serializers import RecipeDetailSerializer, RecipeListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/second of the DRF serializers and the fast serialization "
+        "path, from query to rendered JSON, against the configured database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help="Recipes serialized per run")
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        queryset = RecipeModel.objects.filter(is_active=True).order_by('-created_at', '-recipe_id')[:options['rows']]
+        if not queryset.exists():
+            raise CommandError("No active recipes to serialize; import some first")
+
+        def drf_list():
+            recipes = list(queryset)
+            JSONRenderer().render(RecipeListSerializer(recipes, many=True).data)
+            return len(recipes)
+
+        def fast_list():
+            rows = list(recipe_list_rows(queryset))
+            render(serialize_recipe_list(rows))
+            return len(rows)
+
+        def drf_detail():
+            recipes = list(queryset)
+            for recipe in recipes:
+                JSONRenderer().render(RecipeDetailSerializer(recipe).data)
+            return len(recipes)
+
+        def fast_detail():
+            rows = list(recipe_detail_rows(queryset))
+            for row in rows:
+                render(serialize_recipe_detail(row))
+            return len(rows)
+
+        repeat = options['repeat']
+        results = {
+            'list_drf': rows_per_second(drf_list, repeat),
+            'list_fast': rows_per_second(fast_list, repeat),
+            'detail_drf': rows_per_second(drf_detail, repeat),
+            'detail_fast': rows_per_second(fast_detail, repeat),
+        }
+        for shape in ('list', 'detail'):
+            drf = results[f'{shape}_drf']['median_rows_per_second']
+            fast = results[f'{shape}_fast']['median_rows_per_second']
+            results[f'{shape}_speedup'] = round(fast / drf, 2) if drf else None
+
+        self.stdout.write(json.dumps({'rows': options['rows'], 'repeat': repeat, 'results': results}, indent=2))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.home.similarity import index_directory, read_current_version, refresh_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the similar recipes index up to date: only recipes changed since the last "
+        "build are read again, unless --full is given"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Rebuild from every active recipe, dropping hard deleted ones")
+        parser.add_argument('--if-missing', action='store_true',
+                            help="Only build when no index has been saved yet, as on a first deploy")
+
+    def handle(self, *args, **options):
+        if options['if_missing'] and read_current_version(index_directory()) is not None:
+            self.stderr.write(f"An index is already saved in {index_directory()}")
+            return
+        started = time.perf_counter()
+        index = refresh_index(full=options['full'])
+        self.stderr.write(self.style.SUCCESS(
+            f"Indexed {len(index)} recipes over {index.width} ingredient columns in "
+            f"{time.perf_counter() - started:.2f}s (version {index.version} in {index_directory()})"
+        ))
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.home.exports import CHUNK_SIZE, ExportError, iter_export, parse_since
+from apps.home.importers import SUPPORTED_FORMATS, detect_format
+
+
+class Command(BaseCommand):
+    help = "Export the recipe catalogue as JSONL or CSV ('-' writes stdout), with constant memory use"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, or '-' for stdout")
+        parser.add_argument('--format', choices=SUPPORTED_FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--since', help="Only recipes updated after this ISO 8601 timestamp, "
+                                            "soft deleted ones included")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path.removesuffix('.gz'))
+        try:
+            chunks = iter_export(fmt, parse_since(options['since']), gzip=options['gzip'],
+                                 chunk_size=options['chunk_size'])
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        written = 0
+        if path == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+                written += len(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        try:
+            with open(path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {path}"))
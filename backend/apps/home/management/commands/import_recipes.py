@@ -0,0 +1,42 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.home.importers import SUPPORTED_FORMATS, detect_format
+from apps.home.services import RecipeService
+
+
+class Command(BaseCommand):
+    help = "Bulk import recipes from a JSONL or CSV file ('-' reads stdin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=SUPPORTED_FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+
+        if path == '-':
+            lines = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+            result = RecipeService.bulk_import(lines, fmt, chunk_size=options['chunk_size'])
+        else:
+            try:
+                with open(path, encoding='utf-8', newline='') as lines:
+                    result = RecipeService.bulk_import(lines, fmt, chunk_size=options['chunk_size'])
+            except OSError as e:
+                raise CommandError(str(e))
+
+        if result['status'] != 'success':
+            raise CommandError(result.get('error', result['message']))
+
+        for error in result['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        if result['errors_truncated']:
+            self.stderr.write("... further row errors omitted")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} recipes, {result['failed']} failed "
+            f"in {result['elapsed_seconds']}s ({result['rows_per_second']} rows/s)"
+        ))
@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from apps.home.tasks import TaskWorker
+
+
+class Command(BaseCommand):
+    help = "Run the local background task worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Worker threads")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between polls when idle")
+        parser.add_argument('--visibility-timeout', type=float, default=300,
+                            help="Seconds before an unfinished task may be claimed again")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is drained")
+
+    def handle(self, *args, **options):
+        worker = TaskWorker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            visibility_timeout=options['visibility_timeout'],
+        )
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        try:
+            worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+        self.stdout.write(self.style.SUCCESS("Task worker stopped"))
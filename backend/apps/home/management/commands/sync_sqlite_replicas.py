@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary into every configured read replica file, "
+        "standing in for replication when trying replicas out locally"
+    )
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError("Only SQLite replicas can be synced; use the database's own replication")
+        if not settings.RECIPE_READ_REPLICAS:
+            raise CommandError("No replicas configured; set RECIPE_DB_REPLICAS")
+
+        primary.ensure_connection()
+        for alias in settings.RECIPE_READ_REPLICAS:
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                # The online backup API takes a consistent snapshot while writers keep going
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            connections[alias].close()
+            self.stdout.write(f"Synced {alias}")
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:11
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ingredientsmodel",
+            name="ingredient_id",
+            field=models.UUIDField(
+                default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+    ]
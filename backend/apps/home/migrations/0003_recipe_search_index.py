@@ -0,0 +1,48 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    from apps.home.search import FTS_TABLE, create_fts_table
+
+    create_fts_table(schema_editor)
+
+    RecipeModel = apps.get_model("home", "RecipeModel")
+    IngredientsModel = apps.get_model("home", "IngredientsModel")
+    ingredients = {}
+    for recipe_id, name in IngredientsModel.objects.values_list(
+        "recipe_id", "ingredient_name"
+    ):
+        ingredients.setdefault(recipe_id, []).append(name)
+    rows = [
+        (recipe_id.hex, name, description, " ".join(ingredients.get(recipe_id, [])))
+        for recipe_id, name, description in RecipeModel.objects.filter(
+            is_active=True
+        ).values_list("recipe_id", "recipe_name", "recipe_description")
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (recipe_id, recipe_name, recipe_description, ingredients) "
+            "VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    from apps.home.search import drop_fts_table
+
+    drop_fts_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0002_ingredient_id_default"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
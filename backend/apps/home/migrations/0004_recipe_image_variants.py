@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0003_recipe_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipemodel",
+            name="recipe_image_hash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipemodel",
+            name="recipe_image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_ingredients(apps, schema_editor):
+    from apps.home.ingredients import normalize_ingredient, serialize_ingredients
+
+    RecipeModel = apps.get_model("home", "RecipeModel")
+    IngredientsModel = apps.get_model("home", "IngredientsModel")
+    IngredientCatalogModel = apps.get_model("home", "IngredientCatalogModel")
+    RecipeIngredientIndexModel = apps.get_model("home", "RecipeIngredientIndexModel")
+
+    by_recipe = {}
+    for row in IngredientsModel.objects.order_by("created_at", "ingredient_id"):
+        by_recipe.setdefault(row.recipe_id, []).append(row)
+
+    recipes = list(
+        RecipeModel.objects.filter(recipe_id__in=by_recipe).only("recipe_id")
+    )
+    for recipe in recipes:
+        recipe.ingredients_data = serialize_ingredients(by_recipe[recipe.recipe_id])
+    RecipeModel.objects.bulk_update(recipes, ["ingredients_data"], batch_size=500)
+
+    names = {
+        normalize_ingredient(row.ingredient_name)
+        for rows in by_recipe.values()
+        for row in rows
+    }
+    IngredientCatalogModel.objects.bulk_create(
+        [IngredientCatalogModel(name=name) for name in names], ignore_conflicts=True
+    )
+    ids = dict(IngredientCatalogModel.objects.values_list("name", "id"))
+    links = {
+        (ids[normalize_ingredient(row.ingredient_name)], recipe_id)
+        for recipe_id, rows in by_recipe.items()
+        for row in rows
+    }
+    RecipeIngredientIndexModel.objects.bulk_create(
+        [
+            RecipeIngredientIndexModel(ingredient_id=ingredient_id, recipe_id=recipe_id)
+            for ingredient_id, recipe_id in links
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0005_background_tasks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngredientCatalogModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "ingredient_catalog",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="recipemodel",
+            name="ingredients_data",
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.CreateModel(
+            name="RecipeIngredientIndexModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="home.ingredientcatalogmodel",
+                    ),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="home.recipemodel",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "recipe_ingredient_index",
+            },
+        ),
+        migrations.AddField(
+            model_name="recipemodel",
+            name="ingredient_catalog",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="recipes",
+                through="home.RecipeIngredientIndexModel",
+                to="home.ingredientcatalogmodel",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="recipeingredientindexmodel",
+            constraint=models.UniqueConstraint(
+                fields=("ingredient", "recipe"), name="recipe_ingredient_index_unique"
+            ),
+        ),
+        migrations.RunPython(backfill_ingredients, migrations.RunPython.noop),
+    ]
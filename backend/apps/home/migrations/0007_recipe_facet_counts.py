@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:42
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_facet_counts(apps, schema_editor):
+    RecipeModel = apps.get_model("home", "RecipeModel")
+    RecipeIngredientIndexModel = apps.get_model("home", "RecipeIngredientIndexModel")
+    RecipeFacetCountModel = apps.get_model("home", "RecipeFacetCountModel")
+
+    rows = [
+        RecipeFacetCountModel(facet="recipe_type", value=recipe_type, count=count)
+        for recipe_type, count in RecipeModel.objects.filter(is_active=True)
+        .order_by()
+        .values_list("recipe_type")
+        .annotate(count=Count("recipe_id"))
+    ]
+    rows.extend(
+        RecipeFacetCountModel(facet="ingredient", value=name, count=count)
+        for name, count in RecipeIngredientIndexModel.objects.filter(
+            recipe__is_active=True
+        )
+        .order_by()
+        .values_list("ingredient__name")
+        .annotate(count=Count("recipe_id"))
+    )
+    RecipeFacetCountModel.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0006_recipe_ingredient_catalog"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeFacetCountModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "facet",
+                    models.CharField(
+                        choices=[
+                            ("recipe_type", "Recipe type"),
+                            ("ingredient", "Ingredient"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("value", models.CharField(max_length=100)),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "db_table": "recipe_facet_counts",
+                "indexes": [
+                    models.Index(
+                        fields=["facet", "-count"], name="recipe_facet_top_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("facet", "value"), name="recipe_facet_counts_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0007_recipe_facet_counts"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipemodel",
+            index=models.Index(
+                fields=["updated_at", "recipe_id"], name="recipe_updated_idx"
+            ),
+        ),
+    ]
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.db import models
 import uuid
 from django.core.validators import MinLengthValidator
-from django.utils.text import slugify
+from django.utils import timezone
+from apps.home.slugs import SlugAllocator, SlugIndex
 
 # class RecipeModel(models.Model):
 #   recipe_id = models.UUIDField(primary_key=True, default=uuid.uuid4(), unique=True)
@@ -41,6 +43,17 @@ class RecipeModel(models.Model):
         null=True,
         blank=True
     )
+    recipe_image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False
+    )
+    recipe_image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False
+    )
     recipe_slug = models.SlugField(
         unique=True,
         max_length=120,
@@ -51,6 +64,19 @@ class RecipeModel(models.Model):
         choices=RECIPE_TYPE_CHOICES,
         db_index=True
     )
+    # The serialized ingredient list, kept in step with IngredientsModel
+    # by apps.home.ingredients so list pages render without a join
+    ingredients_data = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False
+    )
+    ingredient_catalog = models.ManyToManyField(
+        'IngredientCatalogModel',
+        through='RecipeIngredientIndexModel',
+        related_name='recipes',
+        blank=True
+    )
     is_active = models.BooleanField(default=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -61,19 +87,30 @@ class RecipeModel(models.Model):
         indexes = [
             models.Index(fields=['recipe_type', 'is_active']),
             models.Index(fields=['created_at', 'is_active']),
+            # Keyset order of the change feed
+            models.Index(fields=['updated_at', 'recipe_id'], name='recipe_updated_idx'),
         ]
         
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the facet counters currently hold for this row (see apps.home.facets)
+        instance._facet_state = (instance.__dict__.get('recipe_type'), instance.__dict__.get('is_active'))
+        return instance
+        
     def save(self, *args, **kwargs):
-        if not self.recipe_slug:
-            self.recipe_slug = slugify(self.recipe_name)
-        super().save(*args, **kwargs)
+        if self.recipe_slug:
+            super().save(*args, **kwargs)
+        else:
+            # A blank slug asks for a fresh unique one derived from the name
+            recipe_slugs.save(self, self.recipe_name, super().save, *args, **kwargs)
         
     def __str__(self):
         return self.recipe_name
   
   
 class IngredientsModel(models.Model):
-  ingredient_id = models.UUIDField(primary_key=True, default=uuid.uuid4(), editable=False)
+  ingredient_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
   recipe = models.ForeignKey(RecipeModel, on_delete=models.CASCADE, related_name='recipe_ingredients')
   ingredient_name = models.CharField(max_length=100)
   created_at = models.DateTimeField(auto_now_add=True)
@@ -84,4 +121,109 @@ class IngredientsModel(models.Model):
     
   def __str__(self):
         return f"{self.recipe.recipe_name} - {self.ingredient_name}"
-  
\ No newline at end of file
+
+
+class IngredientCatalogModel(models.Model):
+    """
+    One row per distinct normalized ingredient name
+    """
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'ingredient_catalog'
+        ordering = ['name']
+        
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredientIndexModel(models.Model):
+    """
+    Which recipes use which catalog ingredient. The unique
+    (ingredient, recipe) index answers ingredient lookups on its own.
+    """
+    ingredient = models.ForeignKey(IngredientCatalogModel, on_delete=models.CASCADE, db_index=False)
+    recipe = models.ForeignKey(RecipeModel, on_delete=models.CASCADE)
+    
+    class Meta:
+        db_table = 'recipe_ingredient_index'
+        constraints = [
+            models.UniqueConstraint(fields=['ingredient', 'recipe'], name='recipe_ingredient_index_unique'),
+        ]
+        
+    def __str__(self):
+        return f"{self.ingredient_id} - {self.recipe_id}"
+
+
+class RecipeFacetCountModel(models.Model):
+    """
+    Number of active recipes per facet value: a recipe type, or a
+    catalog ingredient name. Kept up to date by apps.home.facets.
+    """
+    FACET_CHOICES = [
+        ('recipe_type', 'Recipe type'),
+        ('ingredient', 'Ingredient'),
+    ]
+    
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'recipe_facet_counts'
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='recipe_facet_counts_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['facet', '-count'], name='recipe_facet_top_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+
+recipe_slugs = SlugAllocator(RecipeModel, field='recipe_slug')
+recipe_slug_index = SlugIndex(
+    RecipeModel, field='recipe_slug', max_size=getattr(settings, 'RECIPE_SLUG_INDEX_SIZE', 10000), is_active=True
+)
+
+
+class TaskModel(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    task_id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    name = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='PENDING'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'background_tasks'
+        ordering = ['run_after']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+        
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -0,0 +1,228 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client supplies a cursor token we did not issue"""
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    raw = json.dumps(position, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Invalid pagination cursor')
+    if not isinstance(position, dict):
+        raise InvalidCursor('Invalid pagination cursor')
+    return position
+
+
+class KeysetPaginator:
+    """
+    Cursor based pagination over (created_at, recipe_id).
+
+    Pages are fetched with a range condition on the
+    (created_at, is_active) index instead of an OFFSET, so the cost of
+    a page does not depend on how deep the client has paged. Cursor
+    tokens are opaque to clients: a url-safe base64 encoded JSON object
+    holding the boundary row and the paging direction.
+    """
+
+    ordering = ('-created_at', '-recipe_id')
+
+    def __init__(self, page_size: int = 20, max_page_size: int = 100):
+        self.page_size = max(1, min(int(page_size), max_page_size))
+
+    @staticmethod
+    def decode_cursor(token: str) -> Dict[str, Any]:
+        position = decode_cursor(token)
+        try:
+            created_at = parse_datetime(position['c'])
+            recipe_id = uuid.UUID(position['id'])
+            reverse = bool(position.get('r', False))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise InvalidCursor('Invalid pagination cursor')
+        if created_at is None:
+            raise InvalidCursor('Invalid pagination cursor')
+        return {'created_at': created_at, 'recipe_id': recipe_id, 'reverse': reverse}
+
+    def _cursor_for(self, row, reverse: bool) -> str:
+        return encode_cursor({
+            'c': row.created_at.isoformat(),
+            'id': str(row.recipe_id),
+            'r': reverse,
+        })
+
+    def page_queryset(self, queryset: QuerySet, cursor: Optional[str] = None) -> Tuple[QuerySet, Optional[Dict[str, Any]]]:
+        """
+        The sliced queryset for one page, plus the decoded cursor position
+        """
+        position = self.decode_cursor(cursor) if cursor else None
+        reverse = bool(position and position['reverse'])
+
+        if position:
+            created_at, recipe_id = position['created_at'], position['recipe_id']
+            if reverse:
+                boundary = Q(created_at__gt=created_at) | Q(
+                    created_at=created_at, recipe_id__gt=recipe_id
+                )
+            else:
+                boundary = Q(created_at__lt=created_at) | Q(
+                    created_at=created_at, recipe_id__lt=recipe_id
+                )
+            queryset = queryset.filter(boundary)
+
+        if reverse:
+            queryset = queryset.order_by('created_at', 'recipe_id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        # Fetch one extra row to learn whether another page exists
+        return queryset[:self.page_size + 1], position
+
+    def finish_page(self, rows: List[Any], position: Optional[Dict[str, Any]]) -> Tuple[List[Any], Optional[str], Optional[str]]:
+        """
+        Trim the fetched rows to a page and build its cursors
+        """
+        reverse = bool(position and position['reverse'])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = bool(position), has_more
+        else:
+            has_next, has_previous = has_more, bool(position)
+
+        next_cursor = self._cursor_for(rows[-1], reverse=False) if rows and has_next else None
+        previous_cursor = self._cursor_for(rows[0], reverse=True) if rows and has_previous else None
+        return rows, next_cursor, previous_cursor
+
+    def paginate(self, queryset: QuerySet, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str], Optional[str]]:
+        """
+        Return (rows, next_cursor, previous_cursor) for one page
+        """
+        page, position = self.page_queryset(queryset, cursor)
+        return self.finish_page(list(page), position)
+
+    async def apaginate(self, queryset: QuerySet, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str], Optional[str]]:
+        """
+        Async variant of paginate() using async queryset iteration
+        """
+        page, position = self.page_queryset(queryset, cursor)
+        return self.finish_page([row async for row in page], position)
+
+
+class RankedPaginator:
+    """
+    Pagination over an already ranked list of ids, such as search hits.
+
+    Relevance order has no stable column to key on, so the cursor holds
+    an offset into the ranked list. The list is bounded by the search
+    backend, which keeps deep pages cheap.
+    """
+
+    def __init__(self, page_size: int = 20, max_page_size: int = 100):
+        self.page_size = max(1, min(int(page_size), max_page_size))
+
+    def paginate(self, ranked_ids: List[Any], cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str], Optional[str]]:
+        offset = 0
+        if cursor:
+            offset = decode_cursor(cursor).get('o')
+            if not isinstance(offset, int) or offset < 0:
+                raise InvalidCursor('Invalid pagination cursor')
+
+        page = ranked_ids[offset:offset + self.page_size]
+        end = offset + self.page_size
+        next_cursor = encode_cursor({'o': end}) if end < len(ranked_ids) else None
+        previous_cursor = encode_cursor({'o': max(0, offset - self.page_size)}) if offset > 0 else None
+        return page, next_cursor, previous_cursor
+
+
+class WatermarkPaginator:
+    """
+    Forward-only keyset pagination over (updated_at, recipe_id) for
+    change feeds.
+
+    Each page is a range read on the (updated_at, recipe_id) index that
+    starts after a watermark: the ``since`` timestamp of a first sync, or
+    the cursor returned by the previous page. The last page also returns
+    a cursor, which the client keeps and polls with later, so sync
+    traffic follows the rate of change rather than the catalogue size.
+    """
+
+    # Sorts after every other id, so a bare timestamp excludes its own rows
+    MAX_ID = uuid.UUID(int=(1 << 128) - 1)
+
+    def __init__(self, page_size: int = 100, max_page_size: int = 500):
+        self.page_size = max(1, min(int(page_size), max_page_size))
+
+    @staticmethod
+    def decode_cursor(token: str) -> Tuple[datetime, uuid.UUID]:
+        position = decode_cursor(token)
+        try:
+            updated_at = parse_datetime(position['u'])
+            recipe_id = uuid.UUID(position['id'])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise InvalidCursor('Invalid pagination cursor')
+        if updated_at is None:
+            raise InvalidCursor('Invalid pagination cursor')
+        return updated_at, recipe_id
+
+    @staticmethod
+    def encode_cursor(updated_at: datetime, recipe_id: Any) -> str:
+        return encode_cursor({'u': updated_at.isoformat(), 'id': str(recipe_id)})
+
+    @staticmethod
+    def parse_since(value: str) -> datetime:
+        try:
+            since = parse_datetime(value)
+        except ValueError:
+            since = None
+        if since is None:
+            raise InvalidCursor(f"Invalid since timestamp: {value}")
+        return since if timezone.is_aware(since) else timezone.make_aware(since, dt_timezone.utc)
+
+    def watermark(self, since: Optional[str] = None, cursor: Optional[str] = None) -> Optional[Tuple[datetime, uuid.UUID]]:
+        """The position a page starts after, from a cursor or a ``since`` timestamp"""
+        if cursor:
+            return self.decode_cursor(cursor)
+        if since:
+            return self.parse_since(since), self.MAX_ID
+        return None
+
+    def paginate(self, queryset: QuerySet,
+                 watermark: Optional[Tuple[datetime, uuid.UUID]]) -> Tuple[List[Any], Optional[str], bool]:
+        """
+        Return (rows, next_cursor, has_more) for the page after the
+        watermark; without one, the feed starts at the oldest change
+        """
+        if watermark:
+            updated_at, recipe_id = watermark
+            queryset = queryset.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, recipe_id__gt=recipe_id)
+            )
+        rows = list(queryset.order_by('updated_at', 'recipe_id')[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if rows:
+            next_cursor = self.encode_cursor(rows[-1].updated_at, rows[-1].recipe_id)
+        elif watermark:
+            next_cursor = self.encode_cursor(*watermark)
+        else:
+            next_cursor = None
+        return rows, next_cursor, has_more
@@ -0,0 +1,113 @@
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from apps.home.caching import alist_cache_key, list_cache_key, local_cache
+from apps.home.fast_serializers import render
+from apps.home.instrumentation import cache, registry, timed
+
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'RECIPE_RESPONSE_CACHE_TIMEOUT', 300)
+
+CONTENT_TYPE = 'application/json'
+
+
+def list_response_key(*parts: Any) -> str:
+    """Per page key; versioned by the list generation like the other list caches"""
+    return list_cache_key('response', *parts)
+
+
+async def alist_response_key(*parts: Any) -> str:
+    """Async variant of list_response_key()"""
+    return await alist_cache_key('response', *parts)
+
+
+def detail_response_key(etag: str) -> str:
+    """
+    Per recipe key derived from its ETag, so any save of the recipe moves
+    it to a new key and no explicit invalidation is needed, not even of
+    the copies in each process's L1 cache
+    """
+    return "recipe_response_" + etag.strip('"')
+
+
+def render_json(result: Dict[str, Any], status_code: int, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+    """Render a service result exactly as DRF's JSONRenderer would"""
+    with timed('render'):
+        body = render(result)
+    return HttpResponse(
+        body,
+        status=status_code,
+        content_type=CONTENT_TYPE,
+        headers=headers
+    )
+
+
+def _to_response(entry: Dict[str, Any]) -> HttpResponse:
+    return HttpResponse(entry['body'], content_type=entry['content_type'], headers=entry['headers'])
+
+
+def _entry(result: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+    with timed('render'):
+        body = render(result)
+    return {
+        'body': body,
+        'content_type': CONTENT_TYPE,
+        'headers': headers,
+    }
+
+
+def _get_local(key: str) -> Optional[Dict[str, Any]]:
+    # Only for keys naming one version (detail_response_key), so an
+    # entry is never out of date and needs no revalidation
+    if local_cache.max_bytes <= 0:
+        return None
+    entry = local_cache.lookup(key)
+    registry.count_cache_tier('l1', 'miss' if entry is None else 'hit')
+    return entry[0] if entry is not None else None
+
+
+def _set_local(key: str, entry: Dict[str, Any]) -> None:
+    if local_cache.max_bytes > 0:
+        local_cache.set(key, entry, key)
+
+
+def get_cached_response(key: str, local: bool = False) -> Optional[HttpResponse]:
+    """
+    A previously rendered 200 response, served as-is: a hit unpickles
+    one bytes object and skips the serializers and the renderer. With
+    ``local``, this process's L1 cache is looked up first.
+    """
+    entry = _get_local(key) if local else None
+    if entry is None:
+        entry = cache.get(key)
+        if entry and local:
+            _set_local(key, entry)
+    return _to_response(entry) if entry else None
+
+
+def store_response(key: str, result: Dict[str, Any], headers: Dict[str, str],
+                   local: bool = False) -> HttpResponse:
+    entry = _entry(result, headers)
+    cache.set(key, entry, RESPONSE_CACHE_TIMEOUT)
+    if local:
+        _set_local(key, entry)
+    return _to_response(entry)
+
+
+async def aget_cached_response(key: str, local: bool = False) -> Optional[HttpResponse]:
+    entry = _get_local(key) if local else None
+    if entry is None:
+        entry = await cache.aget(key)
+        if entry and local:
+            _set_local(key, entry)
+    return _to_response(entry) if entry else None
+
+
+async def astore_response(key: str, result: Dict[str, Any], headers: Dict[str, str],
+                          local: bool = False) -> HttpResponse:
+    entry = _entry(result, headers)
+    await cache.aset(key, entry, RESPONSE_CACHE_TIMEOUT)
+    if local:
+        _set_local(key, entry)
+    return _to_response(entry)
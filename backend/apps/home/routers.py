@@ -0,0 +1,118 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set once the current request (or worker thread) has written, so its
+# later reads see that write instead of a replica that may lag behind
+_pinned: ContextVar[bool] = ContextVar('recipe_pinned_to_primary', default=False)
+
+PIN_COOKIE = 'recipe_primary_pin'
+
+
+def pin_to_primary() -> None:
+    _pinned.set(True)
+
+
+def is_pinned() -> bool:
+    return _pinned.get()
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary inside this block: in task handlers, and in
+    cache fills that follow a write closely enough that a replica may
+    not have it yet (caching.fill_reads), which would otherwise keep
+    serving the old rows under keys and ETags that look current.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends recipe reads to a random read replica and everything else to
+    the primary.
+
+    Reads stay on the primary while it is inside a transaction or once
+    the current request has written; ReplicaPinningMiddleware extends
+    that to the same client's next requests for a few seconds, so a
+    client always reads its own writes. Only the recipe catalogue is
+    replicated for reads: the task queue needs its claims to be exact.
+    Task handlers, and cache fills right after a write, read the primary
+    (see primary_reads).
+    """
+
+    replicated_models = {'recipemodel', 'ingredientsmodel'}
+
+    def __init__(self, replicas: Optional[List[str]] = None):
+        self.replicas = list(settings.RECIPE_READ_REPLICAS if replicas is None else replicas)
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or model._meta.model_name not in self.replicated_models:
+            return DEFAULT_DB_ALIAS
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        # Related lookups (prefetches) follow the instance they start from
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in self.replicas:
+            return instance._state.db
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in self.replicas
+
+
+class ReplicaPinningMiddleware:
+    """
+    Scopes the primary pin to one request, and carries it over to the
+    client's requests for RECIPE_REPLICA_PIN_SECONDS after a write
+    through a short-lived cookie
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'RECIPE_REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _pinned.set(PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response)
+        finally:
+            _pinned.reset(token)
+
+    async def __acall__(self, request):
+        token = _pinned.set(PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+            return self.finish(request, response)
+        finally:
+            _pinned.reset(token)
+
+    def finish(self, request, response):
+        if _pinned.get() and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
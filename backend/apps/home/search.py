@@ -0,0 +1,173 @@
+import re
+import uuid
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+
+from apps.home.models import RecipeModel, IngredientsModel
+
+FTS_TABLE = 'recipes_fts'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Upper bound on ranked matches pulled from the index for one query; the
+# other list filters are applied inside the search, before this cap
+MAX_RESULTS = getattr(settings, 'RECIPE_SEARCH_MAX_RESULTS', 1000)
+
+
+def create_fts_table(schema_editor) -> None:
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "recipe_id UNINDEXED, recipe_name, recipe_description, ingredients, "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_fts_table(schema_editor) -> None:
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class SqliteFTSBackend:
+    """
+    Inverted index kept in an SQLite FTS5 virtual table.
+
+    One row per active recipe holds its name, description and the
+    concatenated ingredient names. Matches are ranked with bm25, with the
+    name weighted above ingredients and ingredients above the description.
+    """
+
+    RANK = f"bm25({FTS_TABLE}, 0.0, 10.0, 1.0, 4.0)"
+
+    @staticmethod
+    def build_match_expression(term: str) -> str:
+        # Every word must match, as a prefix so "panee" finds "paneer"
+        tokens = TOKEN_RE.findall(term)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def index_recipes(self, recipe_ids: Iterable) -> None:
+        recipe_ids = [str(pk).replace('-', '') for pk in recipe_ids]
+        if not recipe_ids:
+            return
+        recipes = RecipeModel.objects.filter(
+            recipe_id__in=recipe_ids, is_active=True
+        ).values_list('recipe_id', 'recipe_name', 'recipe_description')
+        ingredients = {}
+        for recipe_id, name in IngredientsModel.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_name'):
+            ingredients.setdefault(recipe_id, []).append(name)
+
+        with connection.cursor() as cursor:
+            self._delete(cursor, recipe_ids)
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (recipe_id, recipe_name, recipe_description, ingredients) "
+                "VALUES (%s, %s, %s, %s)",
+                [
+                    (recipe_id.hex, name, description, ' '.join(ingredients.get(recipe_id, [])))
+                    for recipe_id, name, description in recipes
+                ],
+            )
+
+    def remove_recipes(self, recipe_ids: Iterable) -> None:
+        recipe_ids = [str(pk).replace('-', '') for pk in recipe_ids]
+        if recipe_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, recipe_ids)
+
+    @staticmethod
+    def _delete(cursor, recipe_ids: List[str]) -> None:
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE recipe_id IN ({placeholders})", recipe_ids)
+
+    def search(self, term: str, limit: Optional[int] = MAX_RESULTS,
+               within: Optional[QuerySet] = None) -> List[uuid.UUID]:
+        """
+        Ids of the recipes matching ``term``, best first. ``within`` is a
+        recipe queryset the matches must belong to, joined in the same
+        query so filtered matches are not lost to ``limit``; None is no limit.
+        """
+        expression = self.build_match_expression(term)
+        if not expression:
+            return []
+        sql = f"SELECT recipe_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        params = [expression]
+        if within is not None:
+            # Both tables hold the id as 32 hex digits on SQLite
+            subquery, subquery_params = within.values_list('recipe_id', flat=True).query.sql_with_params()
+            sql += f" AND recipe_id IN ({subquery})"
+            params.extend(subquery_params)
+        sql += f" ORDER BY {self.RANK} LIMIT %s"
+        params.append(-1 if limit is None else limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+
+class DatabaseSearchBackend:
+    """
+    Search for database backends without FTS5.
+
+    PostgreSQL uses its native full-text search; anything else falls back
+    to case-insensitive matching ranked by which field matched. The index
+    hooks are no-ops because both read the base tables directly.
+    """
+
+    def index_recipes(self, recipe_ids: Iterable) -> None:
+        pass
+
+    def remove_recipes(self, recipe_ids: Iterable) -> None:
+        pass
+
+    def search(self, term: str, limit: Optional[int] = MAX_RESULTS,
+               within: Optional[QuerySet] = None) -> List[uuid.UUID]:
+        term = term.strip()
+        if not term:
+            return []
+        queryset = RecipeModel.objects.filter(is_active=True)
+        if within is not None:
+            queryset = queryset.filter(recipe_id__in=within.values_list('recipe_id', flat=True))
+
+        if connection.vendor == 'postgresql':
+            from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+            vector = (
+                SearchVector('recipe_name', weight='A')
+                + SearchVector('recipe_ingredients__ingredient_name', weight='B')
+                + SearchVector('recipe_description', weight='C')
+            )
+            query = SearchQuery(term, search_type='websearch')
+            ranked = (
+                queryset.annotate(rank=SearchRank(vector, query))
+                .filter(rank__gt=0)
+                .order_by('-rank', '-created_at')
+            )
+        else:
+            ranked = queryset.filter(
+                Q(recipe_name__icontains=term)
+                | Q(recipe_description__icontains=term)
+                | Q(recipe_ingredients__ingredient_name__icontains=term)
+            ).annotate(
+                rank=Case(
+                    When(recipe_name__icontains=term, then=Value(0)),
+                    When(recipe_ingredients__ingredient_name__icontains=term, then=Value(1)),
+                    default=Value(2),
+                    output_field=IntegerField(),
+                )
+            ).order_by('rank', '-created_at')
+
+        # Ingredient joins repeat a recipe once per matching ingredient
+        ids, seen = [], set()
+        for recipe_id in ranked.values_list('recipe_id', flat=True).iterator():
+            if recipe_id not in seen:
+                seen.add(recipe_id)
+                ids.append(recipe_id)
+                if limit is not None and len(ids) >= limit:
+                    break
+        return ids
+
+
+def get_search_backend():
+    if connection.vendor == 'sqlite':
+        return SqliteFTSBackend()
+    return DatabaseSearchBackend()
@@ -1,6 +1,6 @@
+from apps.home.images import DETAIL_VARIANTS, thumbnail_url, variant_urls
 from apps.home.models import RecipeModel, IngredientsModel
 from rest_framework import serializers
-from django.utils.text import slugify
 
 # class RecipeSerializer(serializers.ModelSerializer):
 #   class Meta:
@@ -26,18 +26,23 @@ class RecipeSerializer(serializers.ModelSerializer):
                 "Recipe name must be at least 3 characters long."
             )
         return value.strip().title()
-        
-    def validate(self, attrs):
-        """Cross-field validation"""
-        recipe_name = attrs.get('recipe_name')
-        if recipe_name:
-            slug = slugify(recipe_name)
-            # Check for duplicate slug during creation
-            if not self.instance and RecipeModel.objects.filter(recipe_slug=slug).exists():
-                raise serializers.ValidationError({
-                    'recipe_name': 'A recipe with this name already exists.'
-                })
-        return attrs
+
+class RecipeImportSerializer(RecipeSerializer):
+    """
+    Validates one row of a bulk import
+    """
+    ingredients = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        default=list
+    )
+    
+    class Meta(RecipeSerializer.Meta):
+        fields = [
+            'recipe_name', 'recipe_description', 'recipe_type',
+            'is_active', 'ingredients'
+        ]
+
 
 class IngredientsSerializer(serializers.ModelSerializer):
   class Meta:
@@ -47,15 +52,21 @@ class IngredientsSerializer(serializers.ModelSerializer):
 
 class RecipeListSerializer(serializers.ModelSerializer):
     """Optimized serializer for list views"""
+    recipe_thumbnail = serializers.SerializerMethodField()
+    
     class Meta:
         model = RecipeModel
         fields = [
-            'recipe_id', 'recipe_name', 'recipe_image',
+            'recipe_id', 'recipe_name', 'recipe_image', 'recipe_thumbnail',
             'recipe_slug', 'recipe_type', 'created_at'
         ]
+        
+    def get_recipe_thumbnail(self, instance):
+        return thumbnail_url(instance)
+        
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['ingredients'] = IngredientsSerializer(instance.recipe_ingredients.all(), many=True).data
+        data['ingredients'] = instance.ingredients_data
         
         return data
         
@@ -64,6 +75,12 @@ class RecipeListSerializer(serializers.ModelSerializer):
 
 class RecipeDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for retrieve views"""
+    recipe_image_variants = serializers.SerializerMethodField()
+    
     class Meta:
         model = RecipeModel
-        fields = '__all__'
\ No newline at end of file
+        # The content hash only addresses stored files; clients get the variant URLs
+        exclude = ['ingredients_data', 'ingredient_catalog', 'recipe_image_hash']
+        
+    def get_recipe_image_variants(self, instance):
+        return variant_urls(instance, DETAIL_VARIANTS)
\ No newline at end of file
@@ -16,12 +16,36 @@
 #       print(f"error in creating recipe {e}")
 
 import logging
-from typing import Dict, Any, Optional, List
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
+from typing import Dict, Any, Iterable, Optional, List, Tuple
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.core.cache import cache
-from django.utils.text import slugify
-from apps.home.models import RecipeModel
+from django.db.models import Q
+from django.utils import timezone
+from apps.home.caching import (
+    INVALIDATED_SUFFIX, LIST_INVALIDATED_KEY, StaleResult, aget_list_generation, aget_or_compute,
+    aget_or_compute_local, get_list_generation, get_many_values, get_or_compute, get_or_compute_local,
+    list_entry_key, local_cache, recently_invalidated, set_many_values
+)
+from apps.home.facets import counted_facets, queried_facets
+from apps.home.fast_serializers import (
+    CHANGE_FIELDS, datetime_converter, fast_serialization_enabled, recipe_detail_rows, recipe_list_rows,
+    serialize_recipe_detail, serialize_recipe_list
+)
+from apps.home.importers import RecipeImporter, ImportFormatError
+from apps.home.ingredients import InvalidIngredientFilter, parse_ingredient_filter, recipes_with_ingredients
+from apps.home.instrumentation import timed
+from apps.home.models import RecipeIngredientIndexModel, RecipeModel, recipe_slug_index, recipe_slugs
+from apps.home.pagination import KeysetPaginator, RankedPaginator, InvalidCursor, WatermarkPaginator
+from apps.home.routers import primary_reads
+from apps.home.search import MAX_RESULTS, get_search_backend
+from apps.home.similarity import METRICS, get_index
+from apps.home.tasks import enqueue
 from apps.home.serializers import (
     RecipeSerializer, 
     RecipeListSerializer, 
@@ -30,84 +54,577 @@ from apps.home.serializers import (
 
 logger = logging.getLogger(__name__)
 
+SIMILARITY_UNAVAILABLE = 'Similar recipes are not available yet, try again shortly'
+
 
 class RecipeService:
     """Service layer for Recipe business logic"""
     
     CACHE_TIMEOUT = 300  # 5 minutes
+    BATCH_LIMIT = 100
+    
+    @staticmethod
+    def get_all_recipes(filters: Dict[str, Any] = None, page_size: int = 20,
+                        cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one page of recipes with optional filtering.
+
+        Pages are keyset paginated on (created_at, recipe_id), or ranked
+        by relevance when searching; ``cursor`` is the opaque
+        ``next``/``previous`` token from an earlier page.
+
+        After a write, the page cached before it is returned as a
+        StaleResult while one caller rebuilds it.
+        """
+        try:
+            version = get_list_generation()
+            result, fresh = get_or_compute(
+                list_entry_key('page', filters or {}, page_size, cursor),
+                lambda: RecipeService._build_list_page(filters, page_size, cursor, version),
+                RecipeService.CACHE_TIMEOUT, version, LIST_INVALIDATED_KEY
+            )
+            return result if fresh else StaleResult(result)
+            
+        except (InvalidCursor, InvalidIngredientFilter) as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+        except Exception as e:
+            logger.error(f"Error fetching recipes: {str(e)}")
+            return {
+                'status': 'error',
+                'message': 'Failed to fetch recipes',
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def _build_list_page(filters: Optional[Dict[str, Any]], page_size: int,
+                         cursor: Optional[str], version: int) -> Dict[str, Any]:
+        """Query and serialize one list page for get_all_recipes"""
+        fast = fast_serialization_enabled()
+        queryset = RecipeService._list_queryset(filters)
+        if fast:
+            queryset = recipe_list_rows(queryset)
+        
+        if filters and filters.get('search'):
+            recipes, count, approximate, next_cursor, previous_cursor = RecipeService._search_page(
+                queryset, filters['search'], page_size, cursor
+            )
+        else:
+            # The total only depends on the filters, so it is shared by every page
+            count, _ = get_or_compute(
+                list_entry_key('count', filters or {}), queryset.count,
+                RecipeService.CACHE_TIMEOUT, version, LIST_INVALIDATED_KEY
+            )
+            
+            paginator = KeysetPaginator(page_size=page_size)
+            recipes, next_cursor, previous_cursor = paginator.paginate(queryset, cursor)
+        
+        with timed('serialize'):
+            if fast:
+                data = serialize_recipe_list(recipes)
+            else:
+                data = RecipeListSerializer(recipes, many=True).data
+        result = {
+            'status': 'success',
+            'data': data,
+            'count': count,
+            'next': next_cursor,
+            'previous': previous_cursor,
+        }
+        if filters and filters.get('search'):
+            result['count_approximate'] = approximate
+        return result
+    
+    @staticmethod
+    def _list_queryset(filters: Optional[Dict[str, Any]]):
+        """
+        Active recipes with the non-search filters applied, loading only
+        what the list serializer needs
+        """
+        queryset = RecipeModel.objects.filter(is_active=True)
+        
+        # Apply filters
+        if filters:
+            if 'recipe_type' in filters:
+                queryset = queryset.filter(recipe_type=filters['recipe_type'])
+            names = parse_ingredient_filter(filters.get('ingredients', ''))
+            if names:
+                queryset = queryset.filter(recipe_id__in=recipes_with_ingredients(
+                    names, filters.get('ingredients_match', 'all')
+                ))
+        
+        # Rows carry their serialized ingredients (ingredients_data), so nothing is prefetched
+        return queryset.only(
+            'recipe_id', 'recipe_name', 'recipe_image', 'recipe_image_variants',
+            'recipe_slug', 'recipe_type', 'created_at', 'ingredients_data'
+        )
     
     @staticmethod
-    def get_all_recipes(filters: Dict[str, Any] = None, page_size: int = 20) -> Dict[str, Any]:
+    def _search_page(queryset, term: str, page_size: int, cursor: Optional[str]):
+        """
+        Resolve one page of search results, ordered by relevance.
+
+        The remaining filters are joined into the search query itself, so
+        the ranked ids are all listable. Past MAX_RESULTS matches the list
+        is cut off and the count is only a lower bound (``count_approximate``).
         """
-        Get all recipes with optional filtering
+        ranked_ids = get_search_backend().search(term, limit=MAX_RESULTS + 1, within=queryset)
+        approximate = len(ranked_ids) > MAX_RESULTS
+        ranked_ids = ranked_ids[:MAX_RESULTS]
+        
+        page_ids, next_cursor, previous_cursor = RankedPaginator(page_size=page_size).paginate(
+            ranked_ids, cursor
+        )
+        recipes = {recipe.recipe_id: recipe for recipe in queryset.filter(recipe_id__in=page_ids)}
+        return (
+            [recipes[recipe_id] for recipe_id in page_ids if recipe_id in recipes],
+            len(ranked_ids), approximate, next_cursor, previous_cursor
+        )
+    
+    @staticmethod
+    def get_facets(filters: Dict[str, Any] = None, top: int = 10) -> Dict[str, Any]:
+        """
+        Recipe counts per recipe type and for the ``top`` ingredients,
+        over the recipes the same filters would list.
+
+        Without filters they are read from the facet counter table, so
+        no request scans the recipes table.
         """
         try:
-            cache_key = f"recipes_list_{hash(str(filters))}"
-            cached_data = cache.get(cache_key)
-            
-            if cached_data:
-                logger.info("Returning cached recipe list")
-                return cached_data
-            
-            queryset = RecipeModel.objects.filter(is_active=True)
-            
-            # Apply filters
-            if filters:
-                if 'recipe_type' in filters:
-                    queryset = queryset.filter(recipe_type=filters['recipe_type'])
-                if 'search' in filters:
-                    queryset = queryset.filter(
-                        recipe_name__icontains=filters['search']
-                    )
-            
-            # Optimize query
-            queryset = queryset.select_related().only(
-                'recipe_id', 'recipe_name', 'recipe_image',
-                'recipe_slug', 'recipe_type', 'created_at'
+            if filters and not filters.get('ingredients'):
+                # Only qualifies ?ingredients=; on its own it filters nothing
+                filters = {name: value for name, value in filters.items() if name != 'ingredients_match'}
+            version = get_list_generation()
+            result, _ = get_or_compute(
+                list_entry_key('facets', filters or {}, top),
+                lambda: RecipeService._build_facets(filters, top),
+                RecipeService.CACHE_TIMEOUT, version, LIST_INVALIDATED_KEY
             )
+            return result
             
-            serializer = RecipeListSerializer(queryset, many=True)
-            result = {
+        except InvalidIngredientFilter as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+        except Exception as e:
+            logger.error(f"Error fetching recipe facets: {str(e)}")
+            return {
+                'status': 'error',
+                'message': 'Failed to fetch recipe facets',
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def _build_facets(filters: Optional[Dict[str, Any]], top: int) -> Dict[str, Any]:
+        """Compute the facets for get_facets"""
+        if any(filters.values() if filters else ()):
+            queryset = RecipeService._list_queryset(filters)
+            if filters.get('search'):
+                queryset = queryset.filter(recipe_id__in=get_search_backend().search(
+                    filters['search'], limit=None, within=queryset
+                ))
+            data = queried_facets(queryset, top)
+        else:
+            data = counted_facets(top)
+        return {
+            'status': 'success',
+            'data': data,
+            'count': sum(facet['count'] for facet in data['recipe_type'])
+        }
+    
+    @staticmethod
+    def get_changes(since: Optional[str] = None, cursor: Optional[str] = None,
+                    page_size: int = 100) -> Dict[str, Any]:
+        """
+        Recipes created, updated or soft deleted after a watermark, oldest
+        change first.
+
+        Each change carries the list payload of the recipe, or none once
+        it is deleted. Read from the primary, as a lagging replica would
+        show a write only after later ones were handed out. Writes from
+        the last RECIPE_CHANGES_LAG_SECONDS are held back too: a
+        transaction that stamped updated_at but has not yet committed
+        would otherwise land behind a cursor already issued, so the lag
+        must exceed the longest write transaction.
+        """
+        try:
+            paginator = WatermarkPaginator(page_size=page_size)
+            watermark = paginator.watermark(since, cursor)
+            lag = getattr(settings, 'RECIPE_CHANGES_LAG_SECONDS', 2)
+            queryset = RecipeModel.objects.filter(
+                updated_at__lte=timezone.now() - timedelta(seconds=lag)
+            ).values_list(*CHANGE_FIELDS, named=True)
+            with primary_reads():
+                rows, next_cursor, has_more = paginator.paginate(queryset, watermark)
+            
+            to_datetime = datetime_converter()
+            active = dict(zip(
+                [row.recipe_id for row in rows if row.is_active],
+                serialize_recipe_list([row for row in rows if row.is_active])
+            ))
+            changes = []
+            for row in rows:
+                if not row.is_active:
+                    change = 'deleted'
+                elif watermark and row.created_at <= watermark[0]:
+                    change = 'updated'
+                else:
+                    change = 'created'
+                changes.append({
+                    'recipe_id': str(row.recipe_id),
+                    'change': change,
+                    'updated_at': to_datetime(row.updated_at),
+                    'recipe': active.get(row.recipe_id),
+                })
+            return {
                 'status': 'success',
-                'data': serializer.data,
-                'count': queryset.count()
+                'data': changes,
+                'next': next_cursor,
+                'has_more': has_more,
             }
             
-            cache.set(cache_key, result, RecipeService.CACHE_TIMEOUT)
+        except InvalidCursor as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+        except Exception as e:
+            logger.error(f"Error fetching recipe changes: {str(e)}")
+            return {
+                'status': 'error',
+                'message': 'Failed to fetch recipe changes',
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def get_similar_recipes(recipe_id: str, limit: int = 10, metric: str = 'jaccard') -> Dict[str, Any]:
+        """
+        Recipes sharing the most ingredients with this one, best first.
+
+        The recipe's own ingredients are read from the database, so they
+        are always current; candidates come from the similarity index,
+        which trails writes by up to one refresh. Candidates deleted
+        since then are skipped, which is why twice ``limit`` are scored.
+        """
+        try:
+            if metric not in METRICS:
+                return {
+                    'status': 'error',
+                    'message': f"metric must be one of: {', '.join(METRICS)}"
+                }
+            recipe_type = RecipeModel.objects.filter(
+                recipe_id=recipe_id, is_active=True
+            ).values_list('recipe_type', flat=True).first()
+            if recipe_type is None:
+                return {
+                    'status': 'error',
+                    'message': 'Recipe not found'
+                }
+            ingredient_ids = RecipeIngredientIndexModel.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('ingredient_id', flat=True)
+            
+            index = get_index()
+            if index is None:
+                return {
+                    'status': 'error',
+                    'message': SIMILARITY_UNAVAILABLE
+                }
+            with timed('similarity'):
+                [ranked] = index.top_k(
+                    [list(ingredient_ids)], [recipe_type], limit * 2, metric,
+                    exclude=[index.row_of(uuid.UUID(str(recipe_id)))]
+                )
+            scores = {index.recipe_id(row): score for row, score in ranked}
+            
+            rows = list(recipe_list_rows(RecipeModel.objects.filter(recipe_id__in=scores, is_active=True)))
+            with timed('serialize'):
+                payloads = {row.recipe_id: data for row, data in zip(rows, serialize_recipe_list(rows))}
+            data = [
+                {'score': round(score, 4), 'recipe': payloads[similar_id]}
+                for similar_id, score in scores.items() if similar_id in payloads
+            ][:limit]
+            return {
+                'status': 'success',
+                'data': data,
+                'metric': metric,
+            }
+            
+        except Exception as e:
+            logger.error(f"Error fetching recipes similar to {recipe_id}: {str(e)}")
+            return {
+                'status': 'error',
+                'message': 'Failed to fetch similar recipes',
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def get_recipe_by_id(recipe_id: str, updated_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Get single recipe by ID.
+
+        ``updated_at``, from the recipe's validators, is the version the
+        caller expects: a process-local copy older than it (a write made
+        by another process, not yet revalidated) is dropped and read again.
+        """
+        try:
+            # Hot recipes are served from this process's L1 cache; writes
+            # delete the shared entry and change its stamp, so the L1 copy
+            # lives at most RECIPE_L1_REVALIDATE_SECONDS past a write
+            key = f"recipe_{recipe_id}"
+            build = lambda: RecipeService._build_recipe(recipe_id)  # noqa: E731
+            result = get_or_compute_local(key, build, RecipeService.CACHE_TIMEOUT)
+            if updated_at is not None and not RecipeService.is_current(result, updated_at):
+                local_cache.delete_many([key])
+                result = get_or_compute_local(key, build, RecipeService.CACHE_TIMEOUT)
             return result
             
+        except RecipeModel.DoesNotExist:
+            return {
+                'status': 'error',
+                'message': 'Recipe not found'
+            }
         except Exception as e:
-            logger.error(f"Error fetching recipes: {str(e)}")
+            logger.error(f"Error fetching recipe {recipe_id}: {str(e)}")
             return {
                 'status': 'error',
-                'message': 'Failed to fetch recipes',
+                'message': 'Failed to fetch recipe',
                 'error': str(e)
             }
     
     @staticmethod
-    def get_recipe_by_id(recipe_id: str) -> Dict[str, Any]:
+    def is_current(result: Dict[str, Any], updated_at: datetime) -> bool:
+        """Whether a detail result is the version of the recipe stamped ``updated_at``"""
+        return result.get('status') == 'success' and result['data']['updated_at'] == datetime_converter()(updated_at)
+    
+    @staticmethod
+    def _build_recipe(recipe_id: str) -> Dict[str, Any]:
+        """Query and serialize one recipe for get_recipe_by_id"""
+        recipes = RecipeModel.objects.filter(recipe_id=recipe_id, is_active=True)
+        if fast_serialization_enabled():
+            row = recipe_detail_rows(recipes).first()
+            if row is None:
+                raise RecipeModel.DoesNotExist
+            with timed('serialize'):
+                data = serialize_recipe_detail(row)
+        else:
+            recipe = recipes.get()
+            with timed('serialize'):
+                data = RecipeDetailSerializer(recipe).data
+        return {
+            'status': 'success',
+            'data': data
+        }
+    
+    @staticmethod
+    def get_recipes_by_ids(identifiers: List[str]) -> Dict[str, Any]:
         """
-        Get single recipe by ID
+        Get up to BATCH_LIMIT recipes by id or slug, in the order asked.
+
+        Ids are looked up in the detail cache with one get_many; slugs and
+        cache misses are loaded with a single query and written back with
+        one set_many. Identifiers matching no active recipe are listed
+        under ``not_found``.
         """
         try:
-            cache_key = f"recipe_{recipe_id}"
-            cached_data = cache.get(cache_key)
+            identifiers = list(dict.fromkeys(identifiers))
+            if not identifiers:
+                return {
+                    'status': 'error',
+                    'message': 'No recipe ids given'
+                }
+            if len(identifiers) > RecipeService.BATCH_LIMIT:
+                return {
+                    'status': 'error',
+                    'message': f"At most {RecipeService.BATCH_LIMIT} recipes can be fetched at once"
+                }
             
-            if cached_data:
-                return cached_data
+            ids, slugs = {}, []
+            for identifier in identifiers:
+                try:
+                    ids[identifier] = str(uuid.UUID(identifier))
+                except ValueError:
+                    slugs.append(identifier)
+            
+            cached = get_many_values(f"recipe_{recipe_id}" for recipe_id in ids.values())
+            found = {key[len('recipe_'):]: result['data'] for key, result in cached.items()}
+            
+            missing = [recipe_id for recipe_id in ids.values() if recipe_id not in found]
+            if missing or slugs:
+                started = time.perf_counter()
+                recipes = RecipeModel.objects.filter(
+                    Q(recipe_id__in=missing) | Q(recipe_slug__in=slugs), is_active=True
+                )
+                # Written back to the detail cache: recently written recipes
+                # are read from the primary (see caching.fill_reads)
+                pinned = bool(recently_invalidated(f"recipe_{recipe_id}" for recipe_id in missing))
+                with primary_reads() if pinned else nullcontext(), timed('serialize'):
+                    if fast_serialization_enabled():
+                        loaded = [serialize_recipe_detail(row) for row in recipe_detail_rows(recipes)]
+                    else:
+                        loaded = RecipeDetailSerializer(recipes, many=True).data
+                entries = {f"recipe_{data['recipe_id']}": {'status': 'success', 'data': data} for data in loaded}
+                if not pinned:
+                    # Recipes found by slug were not checked before the read
+                    for key in recently_invalidated(entries):
+                        del entries[key]
+                set_many_values(entries, RecipeService.CACHE_TIMEOUT, delta=time.perf_counter() - started)
+                for data in loaded:
+                    found[data['recipe_id']] = data
+                    found[data['recipe_slug']] = data
+            
+            data, not_found = [], []
+            for identifier in identifiers:
+                recipe = found.get(ids.get(identifier, identifier))
+                if recipe is None:
+                    not_found.append(identifier)
+                else:
+                    data.append(recipe)
+            return {
+                'status': 'success',
+                'data': data,
+                'not_found': not_found
+            }
             
-            recipe = RecipeModel.objects.get(
-                recipe_id=recipe_id, 
-                is_active=True
+        except Exception as e:
+            logger.error(f"Error fetching recipes {identifiers}: {str(e)}")
+            return {
+                'status': 'error',
+                'message': 'Failed to fetch recipes',
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def get_recipe_validators(recipe_id: str) -> Optional[Tuple[uuid.UUID, datetime]]:
+        """
+        (recipe_id, updated_at) of an active recipe for conditional GETs,
+        using one primary key lookup and no serialization
+        """
+        try:
+            return RecipeModel.objects.filter(
+                recipe_id=recipe_id, is_active=True
+            ).values_list('recipe_id', 'updated_at').first()
+        except ValidationError:
+            return None
+    
+    @staticmethod
+    def get_recipe_validators_by_slug(slug: str) -> Optional[Tuple[uuid.UUID, datetime]]:
+        """
+        get_recipe_validators for a slug. The slug index resolves it
+        without a query once seen; the validator lookup checks the slug
+        as well, so an entry left stale by another process is dropped
+        and resolved again.
+        """
+        for attempt in range(2):
+            recipe_id = recipe_slug_index.resolve(slug)
+            if recipe_id is None:
+                return None
+            validators = RecipeModel.objects.filter(
+                recipe_id=recipe_id, recipe_slug=slug, is_active=True
+            ).values_list('recipe_id', 'updated_at').first()
+            if validators:
+                return validators
+            recipe_slug_index.discard(slug)
+        return None
+    
+    @staticmethod
+    async def aget_recipe_validators(recipe_id: str) -> Optional[Tuple[uuid.UUID, datetime]]:
+        """
+        Async variant of get_recipe_validators
+        """
+        try:
+            return await RecipeModel.objects.filter(
+                recipe_id=recipe_id, is_active=True
+            ).values_list('recipe_id', 'updated_at').afirst()
+        except ValidationError:
+            return None
+    
+    @staticmethod
+    async def aget_all_recipes(filters: Dict[str, Any] = None, page_size: int = 20,
+                               cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async variant of get_all_recipes for ASGI views.
+
+        Uses the async cache API and async queryset evaluation, and
+        shares cache entries with the sync path.
+        """
+        try:
+            version = await aget_list_generation()
+            result, fresh = await aget_or_compute(
+                list_entry_key('page', filters or {}, page_size, cursor),
+                lambda: RecipeService._abuild_list_page(filters, page_size, cursor, version),
+                RecipeService.CACHE_TIMEOUT, version, LIST_INVALIDATED_KEY
             )
+            return result if fresh else StaleResult(result)
             
-            serializer = RecipeDetailSerializer(recipe)
-            result = {
-                'status': 'success',
-                'data': serializer.data
+        except (InvalidCursor, InvalidIngredientFilter) as e:
+            return {
+                'status': 'error',
+                'message': str(e)
             }
+        except Exception as e:
+            logger.error(f"Error fetching recipes: {str(e)}")
+            return {
+                'status': 'error',
+                'message': 'Failed to fetch recipes',
+                'error': str(e)
+            }
+    
+    @staticmethod
+    async def _abuild_list_page(filters: Optional[Dict[str, Any]], page_size: int,
+                                cursor: Optional[str], version: int) -> Dict[str, Any]:
+        """Async variant of _build_list_page"""
+        fast = fast_serialization_enabled()
+        queryset = RecipeService._list_queryset(filters)
+        if fast:
+            queryset = recipe_list_rows(queryset)
+        
+        if filters and filters.get('search'):
+            # The search backends issue raw SQL, which has no async API
+            recipes, count, approximate, next_cursor, previous_cursor = await sync_to_async(
+                RecipeService._search_page
+            )(queryset, filters['search'], page_size, cursor)
+        else:
+            count, _ = await aget_or_compute(
+                list_entry_key('count', filters or {}), queryset.acount,
+                RecipeService.CACHE_TIMEOUT, version, LIST_INVALIDATED_KEY
+            )
             
-            cache.set(cache_key, result, RecipeService.CACHE_TIMEOUT)
+            paginator = KeysetPaginator(page_size=page_size)
+            recipes, next_cursor, previous_cursor = await paginator.apaginate(queryset, cursor)
+        
+        with timed('serialize'):
+            # Ingredients are denormalized on the rows, so serializing does no I/O
+            if fast:
+                data = serialize_recipe_list(recipes)
+            else:
+                data = RecipeListSerializer(recipes, many=True).data
+        result = {
+            'status': 'success',
+            'data': data,
+            'count': count,
+            'next': next_cursor,
+            'previous': previous_cursor,
+        }
+        if filters and filters.get('search'):
+            result['count_approximate'] = approximate
+        return result
+    
+    @staticmethod
+    async def aget_recipe_by_id(recipe_id: str, updated_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Async variant of get_recipe_by_id for ASGI views
+        """
+        try:
+            key = f"recipe_{recipe_id}"
+            build = lambda: RecipeService._abuild_recipe(recipe_id)  # noqa: E731
+            result = await aget_or_compute_local(key, build, RecipeService.CACHE_TIMEOUT)
+            if updated_at is not None and not RecipeService.is_current(result, updated_at):
+                local_cache.delete_many([key])
+                result = await aget_or_compute_local(key, build, RecipeService.CACHE_TIMEOUT)
             return result
             
         except RecipeModel.DoesNotExist:
@@ -123,6 +640,25 @@ class RecipeService:
                 'error': str(e)
             }
     
+    @staticmethod
+    async def _abuild_recipe(recipe_id: str) -> Dict[str, Any]:
+        """Async variant of _build_recipe"""
+        recipes = RecipeModel.objects.filter(recipe_id=recipe_id, is_active=True)
+        if fast_serialization_enabled():
+            row = await recipe_detail_rows(recipes).afirst()
+            if row is None:
+                raise RecipeModel.DoesNotExist
+            with timed('serialize'):
+                data = serialize_recipe_detail(row)
+        else:
+            recipe = await recipes.aget()
+            with timed('serialize'):
+                data = RecipeDetailSerializer(recipe).data
+        return {
+            'status': 'success',
+            'data': data
+        }
+    
     @staticmethod
     @transaction.atomic
     def create_recipe(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -140,22 +676,14 @@ class RecipeService:
                     'errors': serializer.errors
                 }
             
-            # Additional business logic
-            recipe_name = serializer.validated_data['recipe_name']
-            slug = slugify(recipe_name)
-            
-            # Ensure unique slug
-            counter = 1
-            original_slug = slug
-            while RecipeModel.objects.filter(recipe_slug=slug).exists():
-                slug = f"{original_slug}-{counter}"
-                counter += 1
-            
-            serializer.validated_data['recipe_slug'] = slug
+            # RecipeModel.save() allocates the unique slug; caches are
+            # invalidated after commit (see signals)
             recipe = serializer.save()
             
-            # Clear cache
-            cache.delete_pattern("recipes_list_*")
+            # Expensive side effects run on the task worker after commit
+            if recipe.recipe_image:
+                enqueue('recipes.process_image', recipe_id=str(recipe.recipe_id))
+            enqueue('recipes.warm_list_cache', dedupe=True)
             
             logger.info(f"Recipe created successfully: {recipe.recipe_id}")
             
@@ -194,24 +722,20 @@ class RecipeService:
                     'errors': serializer.errors
                 }
             
-            # Handle slug update if name changed
-            if 'recipe_name' in data:
-                new_slug = slugify(data['recipe_name'])
-                if new_slug != recipe.recipe_slug:
-                    counter = 1
-                    original_slug = new_slug
-                    while RecipeModel.objects.filter(
-                        recipe_slug=new_slug
-                    ).exclude(recipe_id=recipe_id).exists():
-                        new_slug = f"{original_slug}-{counter}"
-                        counter += 1
-                    serializer.validated_data['recipe_slug'] = new_slug
+            # Handle slug update if name changed: a blank slug makes
+            # RecipeModel.save() allocate a fresh unique one
+            if 'recipe_name' in serializer.validated_data:
+                new_name = serializer.validated_data['recipe_name']
+                if recipe_slugs.base(new_name) != recipe_slugs.base(recipe.recipe_name):
+                    serializer.validated_data['recipe_slug'] = ''
             
+            # Caches are invalidated after commit (see signals)
             updated_recipe = serializer.save()
             
-            # Clear cache
-            cache.delete(f"recipe_{recipe_id}")
-            cache.delete_pattern("recipes_list_*")
+            # Expensive side effects run on the task worker after commit
+            if 'recipe_image' in serializer.validated_data:
+                enqueue('recipes.process_image', recipe_id=str(recipe_id))
+            enqueue('recipes.warm_list_cache', dedupe=True)
             
             logger.info(f"Recipe updated successfully: {recipe_id}")
             
@@ -246,12 +770,11 @@ class RecipeService:
                 is_active=True
             )
             
+            # Caches are invalidated after commit (see signals)
             recipe.is_active = False
             recipe.save()
             
-            # Clear cache
-            cache.delete(f"recipe_{recipe_id}")
-            cache.delete_pattern("recipes_list_*")
+            enqueue('recipes.warm_list_cache', dedupe=True)
             
             logger.info(f"Recipe deleted successfully: {recipe_id}")
             
@@ -271,4 +794,24 @@ class RecipeService:
                 'status': 'error',
                 'message': 'Failed to delete recipe',
                 'error': str(e)
-            }
\ No newline at end of file
+            }
+    
+    @staticmethod
+    def bulk_import(lines: Iterable[str], fmt: str, chunk_size: int = 500) -> Dict[str, Any]:
+        """
+        Import recipes from JSONL or CSV lines in batched transactions
+        """
+        try:
+            return RecipeImporter(chunk_size=chunk_size).run(lines, fmt)
+        except ImportFormatError as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+        except Exception as e:
+            logger.error(f"Error importing recipes: {str(e)}")
+            return {
+                'status': 'error',
+                'message': 'Failed to import recipes',
+                'error': str(e)
+            }
@@ -0,0 +1,88 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.home import facets, similarity
+from apps.home.caching import invalidate_recipes
+from apps.home.ingredients import refresh_recipe_ingredients
+from apps.home.models import RecipeModel, IngredientsModel, recipe_slug_index
+from apps.home.search import get_search_backend
+
+
+@receiver(post_save, sender=RecipeModel)
+def index_recipe_on_save(sender, instance, raw=False, **kwargs):
+    """Keep the search index in step with recipe edits and soft deletes"""
+    if raw:
+        return
+    backend = get_search_backend()
+    if instance.is_active:
+        backend.index_recipes([instance.recipe_id])
+    else:
+        backend.remove_recipes([instance.recipe_id])
+
+
+@receiver(post_delete, sender=RecipeModel)
+def remove_recipe_from_index(sender, instance, **kwargs):
+    get_search_backend().remove_recipes([instance.recipe_id])
+
+
+@receiver(post_save, sender=RecipeModel)
+@receiver(post_delete, sender=RecipeModel)
+def forget_recipe_slug(sender, instance, **kwargs):
+    """A rename or soft delete must not leave the old slug resolving"""
+    recipe_slug_index.discard_pk(instance.pk)
+
+
+def affects_facets(update_fields) -> bool:
+    return update_fields is None or bool({'recipe_type', 'is_active'} & set(update_fields))
+
+
+@receiver(pre_save, sender=RecipeModel)
+def remember_facet_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not affects_facets(update_fields):
+        return
+    instance._facet_before = facets.stored_facet_state(instance)
+
+
+@receiver(post_save, sender=RecipeModel)
+def update_facet_counts(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Counter rows move in the same transaction as the recipe write"""
+    if raw or not affects_facets(update_fields):
+        return
+    facets.recipe_saved(instance, instance.__dict__.pop('_facet_before', None))
+
+
+@receiver(pre_delete, sender=RecipeModel)
+def uncount_deleted_recipe(sender, instance, **kwargs):
+    # Before the cascade removes the ingredient links the counts are derived from
+    facets.recipe_deleted(instance)
+
+
+@receiver(post_save, sender=RecipeModel)
+@receiver(post_delete, sender=RecipeModel)
+def invalidate_recipe_caches(sender, instance, using=None, raw=False, **kwargs):
+    """Every write path (service, admin, task worker) invalidates after commit"""
+    if raw:
+        return
+    invalidate_recipes([instance.pk], using=using)
+
+
+@receiver(post_save, sender=IngredientsModel)
+@receiver(post_delete, sender=IngredientsModel)
+def reindex_recipe_ingredients(sender, instance, using=None, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index_recipes([instance.recipe_id])
+    # List pages render the denormalized copy, so it and the cached pages must follow
+    refresh_recipe_ingredients([instance.recipe_id])
+    invalidate_recipes([instance.recipe_id], using=using)
+
+
+@receiver(post_save, sender=RecipeModel)
+@receiver(post_delete, sender=RecipeModel)
+@receiver(post_save, sender=IngredientsModel)
+@receiver(post_delete, sender=IngredientsModel)
+def refresh_similarity_index(sender, instance, using=None, raw=False, **kwargs):
+    """Committed writes reach the similarity index with its next refresh"""
+    if raw:
+        return
+    similarity.schedule_refresh(using)
@@ -0,0 +1,366 @@
+"""
+Ingredient similarity between recipes.
+
+Active recipes are the rows of a sparse binary recipe x ingredient matrix
+(CSR). Columns are catalog ingredient ids, taken from the normalized
+links in RecipeIngredientIndexModel, so "Tomato" and " tomato " are the
+same column. One sparse product scores a batch of query recipes against
+every row at once, instead of joining the link table with itself.
+
+The matrix is saved as plain .npy files that every worker opens with
+mmap_mode='r': loading is instant, and the pages are shared between
+processes by the OS. A refresh only re-reads the recipes whose
+updated_at moved since the last one and writes a new version next to
+the current one; workers notice the new version and switch to it.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from apps.home.models import RecipeIngredientIndexModel, RecipeModel
+from apps.home.tasks import enqueue
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+METRICS = ('jaccard', 'cosine')
+# Added to the score of a candidate of the same recipe_type as the query
+TYPE_BONUS = 0.1
+# Query recipes scored per sparse product; the dense result is rows x batch floats
+QUERY_BATCH = 32
+ARRAYS = ('indptr', 'indices', 'data', 'recipe_ids', 'types')
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'build.lock'
+
+
+class SimilarityIndex:
+    """
+    The recipe x ingredient matrix with rows sorted by recipe id bytes,
+    so a recipe's row is found by binary search without an in-memory map
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, recipe_ids: np.ndarray,
+                 types: np.ndarray, type_names: List[str], width: int, watermark: Optional[datetime],
+                 version: Optional[str] = None):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.recipe_ids = recipe_ids
+        self.types = types
+        self.type_names = type_names
+        self.width = width
+        self.watermark = watermark
+        self.version = version
+        self.matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(recipe_ids), width), copy=False)
+        self.sizes = np.diff(indptr).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.recipe_ids)
+
+    @classmethod
+    def from_links(cls, recipes: Iterable[Tuple[Any, str]], links: Iterable[Tuple[Any, int]],
+                   watermark: Optional[datetime], type_names: Optional[List[str]] = None) -> 'SimilarityIndex':
+        """Build from (recipe_id, recipe_type) rows and (recipe_id, ingredient_id) links"""
+        type_names = list(type_names or [])
+        codes = {name: code for code, name in enumerate(type_names)}
+        ids, types = [], []
+        for recipe_id, recipe_type in recipes:
+            if recipe_type not in codes:
+                codes[recipe_type] = len(type_names)
+                type_names.append(recipe_type)
+            ids.append(recipe_id.bytes)
+            types.append(codes[recipe_type])
+        recipe_ids = np.array(ids, dtype='S16')
+        order = np.argsort(recipe_ids, kind='stable')
+        recipe_ids, types = recipe_ids[order], np.array(types, dtype=np.int16)[order]
+
+        rows_of = {recipe_id: row for row, recipe_id in enumerate(recipe_ids.tolist())}
+        rows, columns = [], []
+        for recipe_id, ingredient_id in links:
+            row = rows_of.get(recipe_id.bytes.rstrip(b'\0'))
+            if row is not None:
+                rows.append(row)
+                columns.append(ingredient_id)
+        width = max(columns, default=-1) + 1
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(recipe_ids), width)
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return cls(matrix.indptr, matrix.indices, matrix.data, recipe_ids, types, type_names, width, watermark)
+
+    def row_of(self, recipe_id: uuid.UUID) -> Optional[int]:
+        key = np.array([recipe_id.bytes], dtype='S16')
+        row = int(np.searchsorted(self.recipe_ids, key)[0])
+        if row < len(self.recipe_ids) and self.recipe_ids[row] == key[0]:
+            return row
+        return None
+
+    def type_code(self, recipe_type: str) -> int:
+        try:
+            return self.type_names.index(recipe_type)
+        except ValueError:
+            return -1
+
+    def query_matrix(self, ingredient_sets: List[Iterable[int]]) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        """Query rows for sets of ingredient ids, and the full size of each set"""
+        rows, columns, sizes = [], [], []
+        for row, ingredient_ids in enumerate(ingredient_sets):
+            ingredient_ids = set(ingredient_ids)
+            sizes.append(len(ingredient_ids))
+            # Ingredients newer than the matrix match nothing, but still count towards the size
+            known = [ingredient_id for ingredient_id in ingredient_ids if ingredient_id < self.width]
+            rows.extend([row] * len(known))
+            columns.extend(known)
+        queries = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(ingredient_sets), self.width)
+        )
+        return queries, np.array(sizes, dtype=np.float32)
+
+    def top_k(self, ingredient_sets: List[Iterable[int]], recipe_types: List[str], k: int,
+              metric: str = 'jaccard', exclude: Optional[List[Optional[int]]] = None) -> List[List[Tuple[int, float]]]:
+        """
+        The ``k`` best (row, score) pairs for each query, best first.
+
+        Scores are Jaccard (shared / union) or cosine (shared / sqrt of
+        the product of sizes) over ingredients, plus TYPE_BONUS for a
+        matching recipe_type. Only rows sharing an ingredient qualify;
+        ``exclude`` gives a row per query to leave out, such as itself.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+        queries, query_sizes = self.query_matrix(ingredient_sets)
+        query_types = np.array([self.type_code(recipe_type) for recipe_type in recipe_types], dtype=np.int16)
+        exclude = exclude or [None] * len(ingredient_sets)
+        results = []
+        for start in range(0, len(ingredient_sets), QUERY_BATCH):
+            end = start + QUERY_BATCH
+            shared = (self.matrix @ queries[start:end].T).toarray()
+            sizes = query_sizes[start:end][np.newaxis, :]
+            if metric == 'jaccard':
+                denominator = self.sizes[:, np.newaxis] + sizes - shared
+            else:
+                denominator = np.sqrt(self.sizes[:, np.newaxis] * sizes)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(shared > 0, shared / denominator, -np.inf)
+            scores += TYPE_BONUS * (self.types[:, np.newaxis] == query_types[np.newaxis, start:end])
+            for column in range(scores.shape[1]):
+                column_scores = scores[:, column]
+                skip = exclude[start + column]
+                if skip is not None:
+                    column_scores[skip] = -np.inf
+                candidates = np.flatnonzero(column_scores > -np.inf)
+                if len(candidates) > k:
+                    candidates = candidates[np.argpartition(-column_scores[candidates], k - 1)[:k]]
+                # Best first; equal scores in recipe id order, so results are stable
+                candidates = candidates[np.lexsort((candidates, -column_scores[candidates]))]
+                results.append([(int(row), float(column_scores[row])) for row in candidates])
+        return results
+
+    def recipe_id(self, row: int) -> uuid.UUID:
+        return uuid.UUID(bytes=bytes(self.recipe_ids[row]).ljust(16, b'\0'))
+
+    def updated(self, recipes: Iterable[Tuple[Any, str, bool]], links: Iterable[Tuple[Any, int]],
+                watermark: datetime) -> 'SimilarityIndex':
+        """
+        A new index with the rows of the given (recipe_id, recipe_type,
+        is_active) recipes replaced by their current ``links``, inactive
+        ones dropped; every other row is copied over as it is
+        """
+        recipes = list(recipes)
+        changed = np.array([recipe_id.bytes for recipe_id, _, _ in recipes], dtype='S16')
+        keep = ~np.isin(self.recipe_ids, changed)
+        fresh = SimilarityIndex.from_links(
+            [(recipe_id, recipe_type) for recipe_id, recipe_type, is_active in recipes if is_active],
+            links, watermark, self.type_names
+        )
+        width = max(self.width, fresh.width)
+        kept = self.matrix[keep]
+        matrix = sparse.vstack([
+            sparse.csr_matrix((kept.data, kept.indices, kept.indptr), shape=(kept.shape[0], width)),
+            sparse.csr_matrix((fresh.data, fresh.indices, fresh.indptr), shape=(len(fresh), width)),
+        ], format='csr')
+        recipe_ids = np.concatenate([self.recipe_ids[keep], fresh.recipe_ids])
+        types = np.concatenate([self.types[keep], fresh.types])
+        order = np.argsort(recipe_ids, kind='stable')
+        matrix = matrix[order]
+        return SimilarityIndex(matrix.indptr, matrix.indices, matrix.data, recipe_ids[order], types[order],
+                               fresh.type_names, width, watermark)
+
+    def save(self, directory: Path) -> str:
+        """
+        Write a new version under ``directory`` and make it current; keeps
+        the previous version for workers still reading it
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        previous = read_current_version(directory)
+        # Later than the version it replaces even within the same millisecond
+        millis = int(time.time() * 1000)
+        if previous is not None:
+            millis = max(millis, version_order(previous)[0] + 1)
+        version = f"{millis}-{uuid.uuid4().hex[:8]}"
+        path = directory / version
+        path.mkdir()
+        for name in ARRAYS:
+            np.save(path / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        (path / 'meta.json').write_text(json.dumps({
+            'type_names': self.type_names,
+            'width': self.width,
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+        }))
+        pointer = directory / f"{CURRENT_FILE}.{version}"
+        pointer.write_text(version)
+        os.replace(pointer, directory / CURRENT_FILE)
+        if previous is not None:
+            # Only versions older than the previous one: nothing maps them any more
+            for old in directory.iterdir():
+                if old.is_dir() and version_order(old.name) < version_order(previous):
+                    shutil.rmtree(old, ignore_errors=True)
+        self.version = version
+        return version
+
+    @classmethod
+    def load(cls, directory: Path, version: str) -> 'SimilarityIndex':
+        path = directory / version
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode='r') for name in ARRAYS}
+        meta = json.loads((path / 'meta.json').read_text())
+        watermark = datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None
+        return cls(**arrays, type_names=meta['type_names'], width=meta['width'], watermark=watermark,
+                   version=version)
+
+
+def index_directory() -> Path:
+    return Path(getattr(settings, 'RECIPE_SIMILARITY_DIR', settings.BASE_DIR / 'similarity'))
+
+
+def version_order(version: str) -> Tuple[int, str]:
+    """Versions are named <epoch milliseconds>-<random>; anything else sorts last"""
+    millis, _, _ = version.partition('-')
+    return (int(millis), version) if millis.isdigit() else (1 << 62, version)
+
+
+@contextmanager
+def build_lock(directory: Path):
+    """
+    Exclusive lock held by one index builder at a time, across processes
+    on this host: the task worker, build_similarity_index, or both
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / LOCK_FILE, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_current_version(directory: Path) -> Optional[str]:
+    try:
+        return (directory / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_watermark() -> datetime:
+    """
+    Changes up to this point are in a build started now. Held back by
+    RECIPE_CHANGES_LAG_SECONDS like the change feed, so a write still in
+    flight is picked up by the next refresh rather than missed.
+    """
+    return timezone.now() - timedelta(seconds=getattr(settings, 'RECIPE_CHANGES_LAG_SECONDS', 2))
+
+
+def build_index() -> SimilarityIndex:
+    """Full build from every active recipe"""
+    watermark = snapshot_watermark()
+    recipes = RecipeModel.objects.filter(is_active=True).values_list('recipe_id', 'recipe_type')
+    links = RecipeIngredientIndexModel.objects.filter(recipe__is_active=True).values_list('recipe_id', 'ingredient_id')
+    return SimilarityIndex.from_links(recipes.iterator(), links.iterator(), watermark)
+
+
+def refresh_index(full: bool = False) -> SimilarityIndex:
+    """
+    Bring the saved index up to date and make it current: a full build
+    when there is none yet (or ``full``), otherwise only the recipes
+    updated since its watermark are read again. Builders take turns
+    (build_lock), so each one starts from the version the last one saved.
+    """
+    directory = index_directory()
+    with build_lock(directory):
+        version = read_current_version(directory)
+        if full or version is None:
+            index = build_index()
+        else:
+            current = SimilarityIndex.load(directory, version)
+            watermark = snapshot_watermark()
+            # >= as rows stamped at the watermark itself may not have been visible yet
+            recipes = list(RecipeModel.objects.filter(
+                updated_at__gte=current.watermark
+            ).values_list('recipe_id', 'recipe_type', 'is_active'))
+            active = [recipe_id for recipe_id, _, is_active in recipes if is_active]
+            links = RecipeIngredientIndexModel.objects.filter(
+                recipe_id__in=active
+            ).values_list('recipe_id', 'ingredient_id')
+            index = current.updated(recipes, links.iterator(), watermark)
+        index.save(directory)
+    _loaded.update(index=index, checked=time.monotonic())
+    return index
+
+
+def schedule_refresh(using: Optional[str] = None) -> None:
+    """Queue one deferred refresh once the current transaction commits"""
+    delay = getattr(settings, 'RECIPE_SIMILARITY_REFRESH_DELAY', 30)
+    transaction.on_commit(lambda: enqueue('recipes.refresh_similarity', dedupe=True, delay=delay), using=using)
+
+
+_loaded: Dict[str, Any] = {'index': None, 'checked': 0.0}
+_load_lock = threading.Lock()
+
+
+def get_index() -> Optional[SimilarityIndex]:
+    """
+    This process's view of the current index. The CURRENT pointer is
+    read again at most every RECIPE_SIMILARITY_RELOAD_SECONDS; when it
+    names a new version, that version is memory-mapped in its place.
+    Never builds: with no index saved yet this queues a build for the
+    task worker and returns None.
+    """
+    index = _loaded['index']
+    interval = getattr(settings, 'RECIPE_SIMILARITY_RELOAD_SECONDS', 5)
+    if index is not None and time.monotonic() - _loaded['checked'] < interval:
+        return index
+    with _load_lock:
+        directory = index_directory()
+        version = read_current_version(directory)
+        index = _loaded['index']
+        if version is None:
+            enqueue('recipes.refresh_similarity', dedupe=True)
+            return None
+        if index is None or index.version != version:
+            index = SimilarityIndex.load(directory, version)
+        _loaded.update(index=index, checked=time.monotonic())
+        return index
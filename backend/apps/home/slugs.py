@@ -0,0 +1,152 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+class SlugAllocator:
+    """
+    Allocates unique ``<base>`` / ``<base>-N`` slugs for a model field.
+
+    The taken variants of a base are loaded with one prefix query rather
+    than probing candidates one by one, so the cost does not grow with
+    the number of recipes sharing a popular name. Because the check and
+    the insert are not atomic, ``save`` relies on the unique index and
+    retries with a fresh slug when a concurrent writer won the race.
+    """
+
+    def __init__(self, model, field: str = 'recipe_slug', max_attempts: int = 5):
+        self.model = model
+        self.field = field
+        self.max_attempts = max_attempts
+
+    def _taken(self, bases, exclude_pk=None) -> set:
+        """Slugs in use for the given bases and their numbered variants"""
+        bases = sorted(set(bases))
+        taken = set()
+        # Batched so the OR chain stays well inside SQLite's expression depth limit
+        for start in range(0, len(bases), 100):
+            condition = Q()
+            for base in bases[start:start + 100]:
+                condition |= Q(**{self.field: base}) | Q(**{f"{self.field}__startswith": f"{base}-"})
+            queryset = self.model._default_manager.filter(condition).order_by()
+            if exclude_pk is not None:
+                queryset = queryset.exclude(pk=exclude_pk)
+            taken.update(queryset.values_list(self.field, flat=True))
+        return taken
+
+    @staticmethod
+    def _first_free(base: str, taken: set) -> str:
+        if base not in taken:
+            return base
+        pattern = re.compile(rf"^{re.escape(base)}-(\d+)$")
+        used = {int(match.group(1)) for match in map(pattern.match, taken) if match}
+        counter = 1
+        while counter in used:
+            counter += 1
+        return f"{base}-{counter}"
+
+    @staticmethod
+    def base(name: str) -> str:
+        return slugify(name) or 'recipe'
+
+    def next_free(self, name: str, exclude_pk: Any = None) -> str:
+        base = self.base(name)
+        return self._first_free(base, self._taken([base], exclude_pk))
+
+    def allocate_many(self, names: List[str]) -> List[str]:
+        """Slugs for a batch of names, also unique within the batch"""
+        bases = [self.base(name) for name in names]
+        taken = self._taken(bases)
+        slugs = []
+        for base in bases:
+            slug = self._first_free(base, taken)
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def save(self, instance, source: str, save: Callable, *args, **kwargs) -> None:
+        """
+        Save ``instance`` under a unique slug derived from ``source``,
+        allocating again if the unique index rejects it
+        """
+        exclude_pk: Optional[Any] = None if instance._state.adding else instance.pk
+        for attempt in range(1, self.max_attempts + 1):
+            slug = self.next_free(source, exclude_pk)
+            setattr(instance, self.field, slug)
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    save(*args, **kwargs)
+                return
+            except IntegrityError:
+                collided = self.model._default_manager.filter(
+                    **{self.field: slug}
+                ).exclude(pk=instance.pk).exists()
+                if attempt == self.max_attempts or not collided:
+                    raise
+
+
+class SlugIndex:
+    """
+    Bounded, per-process LRU map of slug to primary key, so a slug URL
+    resolves without a query once it has been seen.
+
+    Saves and deletes discard the instance's entry in the process that
+    made them (see signals). An entry made stale by another process is
+    caught by the caller: it must look the row up by both pk and slug,
+    and ``discard`` the slug when that finds nothing.
+    """
+
+    def __init__(self, model, field: str = 'recipe_slug', max_size: int = 10000, **filters):
+        self.model = model
+        self.field = field
+        self.max_size = max_size
+        self.filters = filters
+        self._pks: 'OrderedDict[str, Any]' = OrderedDict()
+        self._slugs: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pks)
+
+    def resolve(self, slug: str) -> Optional[Any]:
+        """Primary key of the row with this slug, or None"""
+        with self._lock:
+            pk = self._pks.get(slug)
+            if pk is not None:
+                self._pks.move_to_end(slug)
+                return pk
+
+        pk = self.model._default_manager.filter(
+            **{self.field: slug}, **self.filters
+        ).values_list('pk', flat=True).first()
+        if pk is not None:
+            with self._lock:
+                self._pks[slug] = pk
+                self._slugs[pk] = slug
+                while len(self._pks) > self.max_size:
+                    old_slug, old_pk = self._pks.popitem(last=False)
+                    if self._slugs.get(old_pk) == old_slug:
+                        del self._slugs[old_pk]
+        return pk
+
+    def discard(self, slug: str) -> None:
+        with self._lock:
+            pk = self._pks.pop(slug, None)
+            if pk is not None and self._slugs.get(pk) == slug:
+                del self._slugs[pk]
+
+    def discard_pk(self, pk: Any) -> None:
+        with self._lock:
+            slug = self._slugs.pop(pk, None)
+            if slug is not None:
+                self._pks.pop(slug, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pks.clear()
+            self._slugs.clear()
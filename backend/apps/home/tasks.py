@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.home.models import TaskModel
+from apps.home.routers import primary_reads
+
+logger = logging.getLogger(__name__)
+
+# Handlers by task name, filled in by @register_task
+TASKS: Dict[str, Callable[..., Any]] = {}
+
+# Seconds between two purges of finished tasks by one worker
+PURGE_INTERVAL = 3600
+
+
+def register_task(name: str):
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name: str, dedupe: bool = False, delay: float = 0, max_attempts: int = 3, **payload) -> Optional[TaskModel]:
+    """
+    Queue a task for the background worker.
+
+    The task row is written in the caller's transaction, so a rolled back
+    write never leaves a task behind and a committed one always has its
+    task. With ``dedupe``, nothing is queued while an identical task is
+    still pending. Setting RECIPE_TASKS_ALWAYS_EAGER runs the handler
+    inline instead, which tests and single-process setups can use; like
+    a worker, it only sees the caller's write once that has committed.
+    """
+    if getattr(settings, 'RECIPE_TASKS_ALWAYS_EAGER', False):
+        transaction.on_commit(lambda: run_handler(name, payload))
+        return None
+    if dedupe and TaskModel.objects.filter(name=name, payload=payload, status='PENDING').exists():
+        return None
+    return TaskModel.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def run_handler(name: str, payload: Dict[str, Any]) -> Any:
+    try:
+        handler = TASKS[name]
+    except KeyError:
+        raise LookupError(f"No handler registered for task {name}")
+    # Handlers run right after the write that queued them, and mostly refill caches
+    with primary_reads():
+        return handler(**payload)
+
+
+def claim_tasks(limit: int, visibility_timeout: float) -> List[TaskModel]:
+    """
+    Claim up to ``limit`` due tasks for this worker.
+
+    A claim is a conditional UPDATE on the row's current state, so two
+    workers racing for the same task cannot both win, without relying on
+    SELECT ... FOR UPDATE (which SQLite lacks). A claimed task stays
+    invisible until ``visibility_timeout`` seconds have passed; if the
+    worker dies before finishing, it becomes claimable again.
+    """
+    now = timezone.now()
+    due = TaskModel.objects.filter(
+        Q(status='PENDING', run_after__lte=now) | Q(status='RUNNING', locked_until__lt=now)
+    ).order_by('run_after').values_list('task_id', 'status', 'locked_until')[:limit]
+
+    claimed = []
+    for task_id, status, locked_until in due:
+        won = TaskModel.objects.filter(
+            task_id=task_id, status=status, locked_until=locked_until
+        ).update(
+            status='RUNNING',
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if won:
+            claimed.append(TaskModel.objects.get(task_id=task_id))
+    return claimed
+
+
+def execute(task: TaskModel) -> bool:
+    """
+    Run a claimed task and record the outcome; retries back off
+    exponentially. The outcome is only recorded while the claim still
+    holds: once its visibility timeout has passed, another worker may
+    have claimed the task again, and its outcome is the one that counts.
+    """
+    try:
+        run_handler(task.name, task.payload)
+    except Exception as e:
+        logger.error(f"Task {task.name} {task.task_id} failed (attempt {task.attempts}): {str(e)}")
+        if task.attempts >= task.max_attempts:
+            outcome = {'status': 'FAILED'}
+        else:
+            outcome = {'status': 'PENDING', 'run_after': timezone.now() + timedelta(seconds=2 ** task.attempts)}
+        _finish(task, last_error=traceback.format_exc(), **outcome)
+        return False
+
+    return _finish(task, status='DONE', last_error='')
+
+
+def _finish(task: TaskModel, **fields) -> bool:
+    recorded = TaskModel.objects.filter(
+        task_id=task.task_id, status='RUNNING', locked_until=task.locked_until
+    ).update(locked_until=None, updated_at=timezone.now(), **fields)
+    if not recorded:
+        logger.warning(f"Task {task.name} {task.task_id} was claimed again before it finished; outcome dropped")
+    return bool(recorded)
+
+
+def purge_finished_tasks(days: Optional[float] = None) -> int:
+    """
+    Delete tasks done more than RECIPE_TASKS_RETENTION_DAYS ago; failed
+    ones are kept for inspection. Returns how many were deleted.
+    """
+    if days is None:
+        days = getattr(settings, 'RECIPE_TASKS_RETENTION_DAYS', 7)
+    # run_after is never later than completion, and is indexed with status
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = TaskModel.objects.filter(status='DONE', run_after__lt=cutoff).delete()
+    return deleted
+
+
+class TaskWorker:
+    """
+    Polls the task table and runs tasks on a local thread pool.
+
+    Needs nothing beyond the project database, so any number of workers
+    can run side by side on one machine.
+    """
+
+    def __init__(self, concurrency: int = 4, poll_interval: float = 1.0, visibility_timeout: float = 300):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._stop = threading.Event()
+        self._purged_at: Optional[float] = None
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def purge_if_due(self) -> None:
+        """Purge finished tasks at most every PURGE_INTERVAL seconds"""
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < PURGE_INTERVAL:
+            return
+        self._purged_at = now
+        try:
+            deleted = purge_finished_tasks()
+        except Exception as e:
+            logger.error(f"Purging finished tasks failed: {str(e)}")
+            return
+        if deleted:
+            logger.info(f"Purged {deleted} finished tasks")
+
+    def _run_in_thread(self, task: TaskModel) -> bool:
+        try:
+            return execute(task)
+        finally:
+            close_old_connections()
+
+    def run_once(self) -> int:
+        """
+        Claim one batch of due tasks and run it in the calling thread;
+        returns how many ran. Useful from cron or tests.
+        """
+        self.purge_if_due()
+        tasks = claim_tasks(self.concurrency, self.visibility_timeout)
+        for task in tasks:
+            execute(task)
+        return len(tasks)
+
+    def run(self, once: bool = False) -> None:
+        """
+        Keep the thread pool busy until stopped, or with ``once`` until
+        the queue is drained
+        """
+        logger.info(f"Task worker started with {self.concurrency} threads")
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while not self._stop.is_set():
+                self.purge_if_due()
+                in_flight = {future for future in in_flight if not future.done()}
+                free = self.concurrency - len(in_flight)
+                tasks = claim_tasks(free, self.visibility_timeout) if free else []
+                close_old_connections()
+                for task in tasks:
+                    in_flight.add(pool.submit(self._run_in_thread, task))
+
+                if tasks:
+                    continue
+                if once and not in_flight:
+                    break
+                if in_flight:
+                    wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self._stop.wait(self.poll_interval)
@@ -1,3 +1,1548 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import gzip
+import os
+import io
+import json
+from datetime import timedelta
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from apps.home.benchmarks import compare_results, measure, synthetic_recipes
+from apps.home.caching import (
+    INVALIDATION_PENDING_KEY, STAMP_SUFFIX, LocalCache, StaleResult, aget_or_compute, bump_list_generation,
+    get_list_generation, get_or_compute, jittered, list_cache_key, list_entry_key, local_cache, mark_invalidated,
+    stable_digest
+)
+from apps.home import fast_serializers
+from apps.home.conditional import recipe_etag
+from apps.home.ingredients import refresh_recipe_ingredients
+from apps.home.instrumentation import registry
+from apps.home.facets import recount_facets
+from apps.home.models import (
+    RecipeModel, IngredientsModel, IngredientCatalogModel, RecipeFacetCountModel, TaskModel, recipe_slug_index
+)
+from apps.home.response_cache import detail_response_key
+from apps.home.routers import PIN_COOKIE, PrimaryReplicaRouter, ReplicaPinningMiddleware, pin_to_primary
+from apps.home.search import get_search_backend
+from apps.home.serializers import IngredientsSerializer
+from apps.home.services import RecipeService
+from apps.home import similarity
+from apps.home.similarity import get_index, refresh_index
+from apps.home.slugs import SlugAllocator, SlugIndex
+from apps.home.tasks import TaskWorker, claim_tasks, enqueue, execute, register_task, run_handler
+
+
+def setUpModule():
+    # Eager on_commit callbacks refresh the similarity index; keep it out of the source tree
+    directory = tempfile.mkdtemp()
+    override = override_settings(RECIPE_SIMILARITY_DIR=directory)
+    override.enable()
+    unittest.addModuleCleanup(shutil.rmtree, directory, ignore_errors=True)
+    unittest.addModuleCleanup(override.disable)
+
+
+def make_recipe(name, **kwargs):
+    return RecipeModel.objects.create(
+        recipe_name=name,
+        recipe_description=kwargs.pop('recipe_description', f"How to cook {name}"),
+        recipe_type=kwargs.pop('recipe_type', 'VEG'),
+        **kwargs
+    )
+
+
+class RecipeKeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(7):
+            make_recipe(f"Recipe {i}")
+        self.url = reverse('recipe-list-create')
+
+    def expected_ids(self):
+        return [
+            str(pk) for pk in RecipeModel.objects.filter(is_active=True)
+            .order_by('-created_at', '-recipe_id').values_list('recipe_id', flat=True)
+        ]
+
+    def test_walks_every_recipe_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 3}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get(self.url, params).json()
+            self.assertEqual(body['status'], 'success')
+            self.assertEqual(body['count'], 7)
+            seen.extend(row['recipe_id'] for row in body['data'])
+            cursor = body['next']
+            if not cursor:
+                break
+        self.assertEqual(seen, self.expected_ids())
+
+    def test_previous_cursor_returns_preceding_page(self):
+        first = self.client.get(self.url, {'page_size': 3}).json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(self.url, {'page_size': 3, 'cursor': first['next']}).json()
+        back = self.client.get(self.url, {'page_size': 3, 'cursor': second['previous']}).json()
+        self.assertEqual(back['data'], first['data'])
+        self.assertEqual(back['next'], first['next'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Invalid pagination cursor')
+
+
+class RecipeListQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(40):
+            recipe = make_recipe(f"Recipe {i}")
+            IngredientsModel.objects.bulk_create([
+                IngredientsModel(recipe=recipe, ingredient_name=f"Ingredient {n}")
+                for n in range(3)
+            ])
+            refresh_recipe_ingredients([recipe.recipe_id])
+
+    def test_query_count_is_flat_in_page_size(self):
+        for page_size in (5, 40):
+            cache.clear()
+            # count + page; ingredients are denormalized on the recipe rows
+            with self.assertNumQueries(2):
+                result = RecipeService.get_all_recipes({}, page_size=page_size)
+            self.assertEqual(len(result['data']), page_size)
+            self.assertTrue(all(len(row['ingredients']) == 3 for row in result['data']))
+
+
+class RecipeListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_recipe("Paneer Butter Masala")
+
+    def test_cache_key_is_canonical(self):
+        self.assertEqual(
+            list_cache_key('page', {'search': 'a', 'recipe_type': 'VEG'}, 20, None),
+            list_cache_key('page', {'recipe_type': 'VEG', 'search': 'a'}, 20, None),
+        )
+        # Independent of PYTHONHASHSEED, so identical across worker processes
+        self.assertEqual(stable_digest({}), '4e9950a1f2305f56d358cad23f28203fb3aacbef')
+
+    def test_list_is_served_from_cache_until_a_write(self):
+        RecipeService.get_all_recipes({})
+        with self.assertNumQueries(0):
+            self.assertEqual(RecipeService.get_all_recipes({})['count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = RecipeService.create_recipe({
+                'recipe_name': 'Dal Makhani',
+                'recipe_description': 'Slow cooked black lentils',
+                'recipe_type': 'VEG',
+            })
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(RecipeService.get_all_recipes({})['count'], 2)
+
+
+class CacheStampedeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_recipe("Paneer Butter Masala")
+        self.page_lock = list_entry_key('page', {}, 20, None) + ':lock'
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'page'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute('stampede', compute, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [('page', True)] * 8)
+
+    def test_stale_page_is_served_while_another_worker_refreshes(self):
+        RecipeService.get_all_recipes({})
+        make_recipe("Dal Makhani")
+        bump_list_generation()
+
+        cache.add(self.page_lock, 1)
+        with self.assertNumQueries(0):
+            stale = RecipeService.get_all_recipes({})
+        self.assertIsInstance(stale, StaleResult)
+        self.assertEqual(stale['count'], 1)
+
+        response = self.client.get(reverse('recipe-list-create'))
+        self.assertEqual(response.json()['count'], 1)
+        self.assertNotIn('ETag', response)
+
+        cache.delete(self.page_lock)
+        fresh = RecipeService.get_all_recipes({})
+        self.assertNotIsInstance(fresh, StaleResult)
+        self.assertEqual(fresh['count'], 2)
+
+    def test_cold_miss_waits_for_the_lock_holder(self):
+        cache.add('cold:lock', 1)
+        compute = mock.Mock(return_value='built here')
+
+        def lock_holder_finishes(seconds):
+            cache.set('cold', {'value': 'built', 'version': None, 'delta': 0, 'expires': time.time() + 60})
+
+        with mock.patch('apps.home.caching.time.sleep', side_effect=lock_holder_finishes):
+            self.assertEqual(get_or_compute('cold', compute, 60), ('built', True))
+        compute.assert_not_called()
+
+    def test_caller_that_gave_up_waiting_keeps_the_holders_lock(self):
+        cache.add('cold:lock', 'holder')
+        with mock.patch('apps.home.caching.time.sleep'), mock.patch('apps.home.caching.WAIT_TIMEOUT', 0):
+            self.assertEqual(get_or_compute('cold', lambda: 'built here', 60), ('built here', True))
+        self.assertEqual(cache.get('cold:lock'), 'holder')
+
+    async def test_async_caller_that_gave_up_waiting_keeps_the_holders_lock(self):
+        await cache.aadd('acold:lock', 'holder')
+
+        async def compute():
+            return 'built here'
+
+        with mock.patch('apps.home.caching.WAIT_TIMEOUT', 0):
+            self.assertEqual(await aget_or_compute('acold', compute, 60), ('built here', True))
+        self.assertEqual(await cache.aget('acold:lock'), 'holder')
+
+    def test_ttls_are_jittered(self):
+        ttls = {jittered(300) for _ in range(50)}
+        self.assertGreater(len(ttls), 1)
+        self.assertTrue(all(270 <= ttl <= 330 for ttl in ttls))
+
+
+class RecipeBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.first = make_recipe("Paneer Butter Masala")
+        self.second = make_recipe("Dal Makhani")
+        self.url = reverse('recipe-batch')
+
+    def test_returns_recipes_in_request_order_with_misses(self):
+        missing = str(uuid.uuid4())
+        response = self.client.get(self.url, {
+            'ids': f"{self.second.recipe_id},{self.first.recipe_slug},{missing},no-such-recipe"
+        })
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(
+            [row['recipe_id'] for row in body['data']],
+            [str(self.second.recipe_id), str(self.first.recipe_id)]
+        )
+        self.assertEqual(body['not_found'], [missing, 'no-such-recipe'])
+        self.assertEqual(body['data'][0], RecipeService.get_recipe_by_id(str(self.second.recipe_id))['data'])
+
+    def test_misses_load_in_one_query_and_fill_the_detail_cache(self):
+        ids = [str(self.first.recipe_id), str(self.second.recipe_id)]
+        with self.assertNumQueries(1):
+            RecipeService.get_recipes_by_ids(ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(RecipeService.get_recipes_by_ids(ids)['data']), 2)
+            RecipeService.get_recipe_by_id(ids[0])
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        ids = ','.join(str(uuid.uuid4()) for _ in range(RecipeService.BATCH_LIMIT + 1))
+        self.assertEqual(self.client.get(self.url, {'ids': ids}).status_code, 400)
+
+
+class CacheInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recipe = make_recipe("Paneer Butter Masala")
+        self.generation = get_list_generation()
+
+    def test_rolled_back_write_invalidates_nothing(self):
+        RecipeService.get_recipe_by_id(str(self.recipe.recipe_id))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.recipe.recipe_description = "Never committed"
+                self.recipe.save()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_list_generation(), self.generation)
+        self.assertIsNotNone(cache.get(f"recipe_{self.recipe.recipe_id}"))
+
+    def test_burst_of_writes_is_coalesced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(20):
+                self.recipe.recipe_description = f"Edit number {i}"
+                self.recipe.save()
+        self.assertEqual(get_list_generation(), self.generation + 1)
+        flush = TaskModel.objects.filter(name='recipes.flush_list_invalidation')
+        self.assertEqual(flush.count(), 1)
+
+        # Once the window has passed, the worker applies the deferred invalidation
+        flush.update(run_after=timezone.now())
+        self.assertEqual(TaskWorker().run_once(), 1)
+        self.assertEqual(get_list_generation(), self.generation + 2)
+
+    def test_deferred_invalidation_does_not_need_the_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                self.recipe.recipe_description = f"Edit number {i}"
+                self.recipe.save()
+        self.assertEqual(get_list_generation(), self.generation + 1)
+
+        # The window is over; the next read applies the bump the worker would have
+        cache.set(INVALIDATION_PENDING_KEY, time.time() - 1, None)
+        self.assertEqual(get_list_generation(), self.generation + 2)
+        self.assertEqual(get_list_generation(), self.generation + 2)
+        # and the worker, arriving late, does not bump again
+        TaskModel.objects.filter(name='recipes.flush_list_invalidation').update(run_after=timezone.now())
+        self.assertEqual(TaskWorker().run_once(), 1)
+        self.assertEqual(get_list_generation(), self.generation + 2)
+
+    @override_settings(RECIPE_INVALIDATION_WINDOW=0)
+    def test_zero_window_invalidates_every_write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                self.recipe.save()
+        self.assertEqual(get_list_generation(), self.generation + 3)
+
+    def test_admin_delete_invalidates(self):
+        RecipeService.get_recipe_by_id(str(self.recipe.recipe_id))
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        url = reverse('admin:home_recipemodel_delete', args=[self.recipe.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(cache.get(f"recipe_{self.recipe.recipe_id}"))
+        self.assertEqual(get_list_generation(), self.generation + 1)
+
+
+class LocalCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        registry.reset()
+        self.recipe = make_recipe("Rajma Chawal")
+        self.key = f"recipe_{self.recipe.recipe_id}"
+
+    def read(self):
+        return RecipeService.get_recipe_by_id(str(self.recipe.recipe_id))['data']['recipe_description']
+
+    def test_bounded_by_bytes_in_lru_order(self):
+        lru = LocalCache(max_bytes=400, ttl=60, revalidate_after=1)
+        for key in 'abc':
+            lru.set(key, 'x' * 100, 'stamp')
+        self.assertIsNotNone(lru.lookup('a'))
+        lru.set('d', 'x' * 100, 'stamp')
+        self.assertIsNone(lru.lookup('b'))
+        self.assertIsNotNone(lru.lookup('a'))
+        self.assertLessEqual(lru.size, 400)
+
+        lru.set('huge', 'x' * 1000, 'stamp')
+        self.assertIsNone(lru.lookup('huge'))
+        self.assertIsNone(LocalCache(max_bytes=300, ttl=0, revalidate_after=1).lookup('a'))
+
+    def test_hot_reads_skip_the_shared_cache(self):
+        self.read()
+        with mock.patch.object(cache, 'get', side_effect=AssertionError("L2 read")):
+            with self.assertNumQueries(0):
+                self.assertEqual(self.read(), self.recipe.recipe_description)
+        self.assertEqual(registry.cache_tiers[('l1', 'miss')], 1)
+        self.assertEqual(registry.cache_tiers[('l1', 'hit')], 1)
+        self.assertEqual(registry.cache_tiers[('l2', 'miss')], 1)
+
+    def test_hot_detail_responses_skip_the_shared_cache(self):
+        url = reverse('recipe-detail', args=[self.recipe.recipe_id])
+        first = self.client.get(url)
+        registry.reset()
+        with mock.patch.object(cache, 'get', side_effect=AssertionError("L2 read")):
+            for _ in range(4):
+                response = self.client.get(url)
+                self.assertEqual(response.content, first.content)
+                self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(registry.cache_tiers[('l1', 'hit')], 4)
+        self.assertEqual(registry.cache_tiers[('l1', 'miss')], 0)
+
+        # The entry is keyed by the ETag, so an edit is never served from it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.recipe_description = "Edited here"
+            self.recipe.save()
+        self.assertEqual(self.client.get(url).json()['data']['recipe_description'], "Edited here")
+
+    async def test_hot_async_detail_responses_skip_the_shared_cache(self):
+        url = reverse('async-recipe-detail', args=[self.recipe.recipe_id])
+        first = await self.async_client.get(url)
+        with mock.patch.object(cache, 'aget', side_effect=AssertionError("L2 read")):
+            response = await self.async_client.get(url)
+        self.assertEqual(response.content, first.content)
+
+    def test_write_in_another_process_is_seen_after_revalidation(self):
+        self.read()
+        # What a commit in another worker leaves in the shared cache
+        RecipeModel.objects.filter(pk=self.recipe.pk).update(recipe_description="Edited elsewhere")
+        cache.set(f"{self.key}{STAMP_SUFFIX}", uuid.uuid4().hex, None)
+        cache.delete(self.key)
+        self.assertEqual(self.read(), self.recipe.recipe_description)
+
+        with mock.patch.object(local_cache, 'revalidate_after', 0):
+            self.assertEqual(self.read(), "Edited elsewhere")
+            self.assertEqual(self.read(), "Edited elsewhere")
+        self.assertEqual(registry.cache_tiers[('l1', 'revalidated')], 1)
+
+    def test_write_in_another_process_is_not_cached_under_the_new_etag(self):
+        url = reverse('recipe-detail', args=[self.recipe.recipe_id])
+        old_etag = self.client.get(url)['ETag']
+        RecipeModel.objects.filter(pk=self.recipe.pk).update(
+            recipe_description="Edited elsewhere", updated_at=timezone.now()
+        )
+        cache.set(f"{self.key}{STAMP_SUFFIX}", uuid.uuid4().hex, None)
+        cache.delete(self.key)
+
+        # Inside the revalidation window, but the validators show the L1 copy is older
+        response = self.client.get(url)
+        self.assertEqual(response.json()['data']['recipe_description'], "Edited elsewhere")
+        self.assertNotEqual(response['ETag'], old_etag)
+        local_cache.clear()
+        cached = self.client.get(url, headers={'if-none-match': old_etag})
+        self.assertEqual(cached.json()['data']['recipe_description'], "Edited elsewhere")
+
+    def test_body_of_another_version_is_not_cached(self):
+        url = reverse('recipe-detail', args=[self.recipe.recipe_id])
+        lagging = (self.recipe.recipe_id, self.recipe.updated_at - timedelta(seconds=5))
+        with mock.patch.object(RecipeService, 'get_recipe_validators', return_value=lagging):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIsNone(cache.get(detail_response_key(recipe_etag(*lagging))))
+
+    def test_local_write_evicts_at_once(self):
+        self.read()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.recipe_description = "Edited here"
+            self.recipe.save()
+        self.assertEqual(self.read(), "Edited here")
+
+    def test_tiers_are_exported(self):
+        self.read()
+        self.read()
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('recipe_cache_tier_lookups_total{tier="l1",result="hit"} 1', body)
+        self.assertIn('recipe_cache_tier_lookups_total{tier="l2",result="miss"} 1', body)
+        self.assertIn('recipe_l1_cache_entries 1', body)
+
+
+class RecipeSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.paneer = make_recipe("Paneer Butter Masala", recipe_description="Rich tomato gravy")
+        self.dal = make_recipe("Dal Makhani", recipe_description="Black lentils finished with paneer")
+        self.chicken = make_recipe("Butter Chicken", recipe_type='NON_VEG')
+        IngredientsModel.objects.create(recipe=self.chicken, ingredient_name="Kasuri methi")
+
+    def search(self, term, **filters):
+        result = RecipeService.get_all_recipes({'search': term, **filters})
+        self.assertEqual(result['status'], 'success')
+        return [row['recipe_name'] for row in result['data']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search("paneer"), ["Paneer Butter Masala", "Dal Makhani"])
+
+    def test_matches_ingredients_and_prefixes(self):
+        self.assertEqual(self.search("methi"), ["Butter Chicken"])
+        self.assertEqual(self.search("makh"), ["Dal Makhani"])
+
+    def test_combines_with_filters(self):
+        self.assertEqual(self.search("butter", recipe_type='NON_VEG'), ["Butter Chicken"])
+
+    def test_filters_apply_before_the_result_cap(self):
+        for i in range(4):
+            make_recipe(f"Butter Naan {i}", recipe_type='VEGAN', recipe_description="Brushed with butter")
+        self.assertNotIn(self.chicken.recipe_id, get_search_backend().search("butter", limit=3))
+        with mock.patch('apps.home.services.MAX_RESULTS', 3):
+            # The non-veg match ranks below the cap, but the filter runs inside the search
+            self.assertEqual(self.search("butter", recipe_type='NON_VEG'), ["Butter Chicken"])
+            result = RecipeService.get_all_recipes({'search': 'butter'})
+        self.assertEqual(result['count'], 3)
+        self.assertTrue(result['count_approximate'])
+
+    def test_index_follows_updates_and_soft_deletes(self):
+        self.paneer.recipe_name = "Shahi Paneer"
+        self.paneer.save()
+        self.assertEqual(get_search_backend().search("shahi"), [self.paneer.recipe_id])
+        RecipeService.delete_recipe(str(self.dal.recipe_id))
+        self.assertEqual(self.search("lentils"), [])
+
+
+class RecipeBulkImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_recipe("Paneer Butter Masala")
+
+    def test_jsonl_upload_reports_row_errors(self):
+        rows = [
+            {'recipe_name': 'paneer butter masala', 'recipe_description': 'Second take on a classic',
+             'recipe_type': 'VEG', 'ingredients': ['Paneer', 'Butter']},
+            {'recipe_name': 'Paneer Butter Masala', 'recipe_description': 'Third take on a classic',
+             'recipe_type': 'VEG'},
+            {'recipe_name': 'X', 'recipe_description': 'Too short a name', 'recipe_type': 'VEG'},
+        ]
+        body = '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n'
+        upload = SimpleUploadedFile('feed.jsonl', body.encode())
+        response = self.client.post(reverse('recipe-import'), {'file': upload})
+
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (2, 2))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4])
+        self.assertEqual(
+            sorted(RecipeModel.objects.values_list('recipe_slug', flat=True)),
+            ['paneer-butter-masala', 'paneer-butter-masala-1', 'paneer-butter-masala-2'],
+        )
+        imported = RecipeModel.objects.get(recipe_slug='paneer-butter-masala-1')
+        self.assertEqual(imported.recipe_ingredients.count(), 2)
+        self.assertEqual(get_search_backend().search("butter paneer")[0], imported.recipe_id)
+
+    def test_csv_import_in_chunks(self):
+        lines = ['recipe_name,recipe_description,recipe_type,ingredients\n'] + [
+            f'Curry {i},A weeknight curry,VEGAN,Rice|Lentils\n' for i in range(5)
+        ]
+        result = RecipeService.bulk_import(lines, 'csv', chunk_size=2)
+        self.assertEqual((result['created'], result['failed']), (5, 0))
+        self.assertEqual(IngredientsModel.objects.filter(ingredient_name='Rice').count(), 5)
+        self.assertEqual(RecipeService.get_all_recipes({})['count'], 6)
+
+
+class RecipeSlugAllocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_popular_name_costs_one_lookup_query(self):
+        for _ in range(5):
+            make_recipe("Paneer Butter Masala")
+        with CaptureQueriesContext(connection) as queries:
+            recipe = make_recipe("Paneer Butter Masala")
+        self.assertEqual(recipe.recipe_slug, 'paneer-butter-masala-5')
+        slug_lookups = [q for q in queries if q['sql'].startswith('SELECT "recipes_master"."recipe_slug"')]
+        self.assertEqual(len(slug_lookups), 1)
+
+    def test_fills_the_first_free_suffix(self):
+        make_recipe("Dal Makhani")
+        make_recipe("Dal Makhani", recipe_slug='dal-makhani-2')
+        self.assertEqual(make_recipe("Dal Makhani").recipe_slug, 'dal-makhani-1')
+
+    def test_retries_when_a_concurrent_writer_takes_the_slug(self):
+        make_recipe("Dal Makhani")
+        real_next_free = SlugAllocator.next_free
+        calls = []
+
+        def stale_next_free(allocator, name, exclude_pk=None):
+            # The first candidate was taken between the lookup and the insert
+            calls.append(name)
+            return 'dal-makhani' if len(calls) == 1 else real_next_free(allocator, name, exclude_pk)
+
+        with mock.patch.object(SlugAllocator, 'next_free', stale_next_free):
+            recipe = make_recipe("Dal Makhani")
+        self.assertEqual(recipe.recipe_slug, 'dal-makhani-1')
+        self.assertEqual(len(calls), 2)
+
+    def test_service_suffixes_duplicates_and_renames(self):
+        make_recipe("Dal Makhani")
+        created = RecipeService.create_recipe({
+            'recipe_name': 'dal makhani',
+            'recipe_description': 'Slow cooked black lentils',
+            'recipe_type': 'VEG',
+        })
+        self.assertEqual(created['data']['recipe_slug'], 'dal-makhani-1')
+        updated = RecipeService.update_recipe(created['data']['recipe_id'], {'recipe_name': 'Dal Tadka'})
+        self.assertEqual(updated['data']['recipe_slug'], 'dal-tadka')
+
+
+class RecipeSlugLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        recipe_slug_index.clear()
+        self.recipe = make_recipe("Paneer Butter Masala")
+
+    def slug_url(self, slug):
+        return reverse('recipe-by-slug', args=[slug])
+
+    def test_slug_route_matches_id_route(self):
+        by_id = self.client.get(reverse('recipe-detail', args=[self.recipe.recipe_id]))
+        by_slug = self.client.get(self.slug_url('paneer-butter-masala'))
+        self.assertEqual(by_slug.status_code, 200)
+        self.assertEqual(by_slug.content, by_id.content)
+        self.assertEqual(by_slug['ETag'], by_id['ETag'])
+        # Resolved from the index; only the validator lookup hits the database
+        with self.assertNumQueries(1):
+            self.client.get(self.slug_url('paneer-butter-masala'))
+
+    def test_rename_and_soft_delete_stop_old_slug_resolving(self):
+        self.client.get(self.slug_url('paneer-butter-masala'))
+        RecipeService.update_recipe(str(self.recipe.recipe_id), {'recipe_name': 'Shahi Paneer'})
+        self.assertEqual(self.client.get(self.slug_url('paneer-butter-masala')).status_code, 404)
+        self.assertEqual(self.client.get(self.slug_url('shahi-paneer')).status_code, 200)
+
+        RecipeService.delete_recipe(str(self.recipe.recipe_id))
+        self.assertEqual(self.client.get(self.slug_url('shahi-paneer')).status_code, 404)
+
+    def test_entry_made_stale_elsewhere_is_dropped(self):
+        self.client.get(self.slug_url('paneer-butter-masala'))
+        # Renamed by another process: no signal reaches this process's index
+        RecipeModel.objects.filter(pk=self.recipe.pk).update(recipe_slug='moved')
+        self.assertEqual(self.client.get(self.slug_url('paneer-butter-masala')).status_code, 404)
+        self.assertEqual(len(recipe_slug_index), 0)
+
+    def test_index_is_bounded(self):
+        index = SlugIndex(RecipeModel, max_size=2, is_active=True)
+        for name in ("Dal Makhani", "Chole Bhature"):
+            make_recipe(name)
+        for slug in ('paneer-butter-masala', 'dal-makhani', 'chole-bhature'):
+            self.assertIsNotNone(index.resolve(slug))
+        self.assertEqual(len(index), 2)
+        with self.assertNumQueries(0):
+            index.resolve('chole-bhature')
+
+    def test_malformed_ids_are_rejected_without_a_query(self):
+        url = reverse('recipe-detail', args=['not-a-uuid'])
+        with self.assertNumQueries(0):
+            responses = [
+                self.client.get(url),
+                self.client.patch(url, {'recipe_name': 'Anything'}, content_type='application/json'),
+                self.client.delete(url),
+                self.client.get(reverse('async-recipe-detail', args=['not-a-uuid'])),
+            ]
+        for response in responses:
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['message'], 'Invalid recipe id')
+
+
+class RecipeImagePipelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, RECIPE_TASKS_ALWAYS_EAGER=True)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    @staticmethod
+    def upload():
+        buffer = io.BytesIO()
+        Image.new('RGB', (2000, 1500), (200, 80, 40)).save(buffer, format='JPEG')
+        return SimpleUploadedFile('curry.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def create(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = RecipeService.create_recipe({
+                'recipe_name': name,
+                'recipe_description': 'A recipe with a photo',
+                'recipe_type': 'VEG',
+                'recipe_image': self.upload(),
+            })
+        self.assertEqual(result['status'], 'success')
+        return RecipeModel.objects.get(recipe_id=result['data']['recipe_id'])
+
+    def test_derivatives_are_exposed_per_shape(self):
+        recipe = self.create("Paneer Tikka")
+        detail = RecipeService.get_recipe_by_id(str(recipe.recipe_id))['data']
+        self.assertEqual(set(detail['recipe_image_variants']), {'small', 'medium', 'large'})
+        self.assertNotIn('recipe_image_hash', detail)
+
+        row = RecipeService.get_all_recipes({})['data'][0]
+        self.assertTrue(row['recipe_thumbnail'].endswith('/thumb.webp'))
+        with recipe.recipe_image.storage.open(recipe.recipe_image_variants['thumb']['webp']) as thumb:
+            self.assertEqual(Image.open(thumb).size, (160, 120))
+            self.assertLess(thumb.size, recipe.recipe_image.size / 10)
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create("Paneer Tikka")
+        second = self.create("Malai Tikka")
+        self.assertEqual(second.recipe_image.name, first.recipe_image.name)
+        self.assertEqual(second.recipe_image_variants, first.recipe_image_variants)
+        _, originals = first.recipe_image.storage.listdir(first.recipe_image.name.rsplit('/', 1)[0])
+        self.assertEqual(len(originals), 1)
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        register_task('tests.record')(lambda **payload: self.calls.append(payload))
+
+        def flaky(**payload):
+            raise RuntimeError("boom")
+        register_task('tests.flaky')(flaky)
+
+    def test_writes_defer_side_effects_to_the_queue(self):
+        RecipeService.create_recipe({
+            'recipe_name': 'Dal Makhani',
+            'recipe_description': 'Slow cooked black lentils',
+            'recipe_type': 'VEG',
+        })
+        RecipeService.create_recipe({
+            'recipe_name': 'Dal Tadka',
+            'recipe_description': 'Tempered yellow lentils',
+            'recipe_type': 'VEG',
+        })
+        # Deduplicated while the first warm-up is still pending
+        self.assertEqual(TaskModel.objects.filter(name='recipes.warm_list_cache').count(), 1)
+        self.assertEqual(TaskWorker().run_once(), 1)
+        self.assertEqual(TaskModel.objects.get().status, 'DONE')
+
+    def test_worker_runs_due_tasks(self):
+        enqueue('tests.record', value=1)
+        enqueue('tests.record', delay=60, value=2)
+        self.assertEqual(TaskWorker().run_once(), 1)
+        self.assertEqual(self.calls, [{'value': 1}])
+
+    @override_settings(RECIPE_TASKS_ALWAYS_EAGER=True)
+    def test_eager_tasks_wait_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                enqueue('tests.record', value=1)
+                raise RuntimeError
+            with transaction.atomic():
+                enqueue('tests.record', value=2)
+                self.assertEqual(self.calls, [])
+        self.assertEqual(self.calls, [{'value': 2}])
+        self.assertFalse(TaskModel.objects.exists())
+
+    def test_failures_are_retried_then_marked_failed(self):
+        task = enqueue('tests.flaky', max_attempts=2)
+        with self.assertLogs('apps.home.tasks', level='ERROR'):
+            TaskWorker().run_once()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('PENDING', 1))
+        self.assertIn('RuntimeError', task.last_error)
+
+        TaskModel.objects.filter(pk=task.pk).update(run_after=timezone.now())
+        with self.assertLogs('apps.home.tasks', level='ERROR'):
+            TaskWorker().run_once()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('FAILED', 2))
+
+    def test_claimed_tasks_reappear_after_visibility_timeout(self):
+        task = enqueue('tests.record', value=1)
+        self.assertEqual(len(claim_tasks(10, visibility_timeout=300)), 1)
+        self.assertEqual(claim_tasks(10, visibility_timeout=300), [])
+
+        TaskModel.objects.filter(pk=task.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(TaskWorker().run_once(), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('DONE', 2))
+
+    def test_outcome_of_a_reclaimed_task_is_left_to_its_new_claim(self):
+        task = enqueue('tests.record', value=1)
+        [first] = claim_tasks(10, visibility_timeout=300)
+        TaskModel.objects.filter(pk=task.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        [second] = claim_tasks(10, visibility_timeout=300)
+
+        with self.assertLogs('apps.home.tasks', level='WARNING'):
+            self.assertFalse(execute(first))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.locked_until), ('RUNNING', second.locked_until))
+        self.assertTrue(execute(second))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.locked_until), ('DONE', None))
+
+    @override_settings(RECIPE_TASKS_RETENTION_DAYS=7)
+    def test_worker_purges_old_finished_tasks(self):
+        long_ago = timezone.now() - timedelta(days=8)
+        old_done = enqueue('tests.record', value=1)
+        old_failed = enqueue('tests.record', value=2)
+        recent_done = enqueue('tests.record', value=3)
+        TaskModel.objects.filter(pk=old_done.pk).update(status='DONE', run_after=long_ago)
+        TaskModel.objects.filter(pk=old_failed.pk).update(status='FAILED', run_after=long_ago)
+        TaskModel.objects.filter(pk=recent_done.pk).update(status='DONE')
+
+        worker = TaskWorker()
+        self.assertEqual(worker.run_once(), 0)
+        self.assertEqual(set(TaskModel.objects.values_list('pk', flat=True)), {old_failed.pk, recent_done.pk})
+        # At most once per PURGE_INTERVAL
+        with self.assertNumQueries(1):
+            worker.run_once()
+
+
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recipe = make_recipe("Paneer Butter Masala")
+        IngredientsModel.objects.create(recipe=self.recipe, ingredient_name="Paneer")
+        make_recipe("Dal Makhani")
+
+    async def test_async_list_matches_sync_list(self):
+        sync_body = (await sync_to_async(self.client.get)(reverse('recipe-list-create'), {'page_size': 1})).content
+        await cache.aclear()
+        response = await self.async_client.get(reverse('async-recipe-list'), {'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, sync_body)
+        self.assertIsNotNone(response.json()['next'])
+
+    async def test_async_list_never_blocks_on_the_cache(self):
+        url = reverse('async-recipe-list')
+
+        def outside_the_loop(name, method):
+            # The backend's own async methods run the sync ones in a thread
+            def call(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    return method(*args, **kwargs)
+                raise AssertionError(f"cache.{name} called in the event loop")
+            return call
+
+        for name in ('get', 'get_many', 'set', 'set_many', 'add', 'incr', 'delete'):
+            patch = mock.patch.object(cache, name, outside_the_loop(name, getattr(cache, name)))
+            patch.start()
+            self.addCleanup(patch.stop)
+        cold = await self.async_client.get(url)
+        self.assertEqual(cold.status_code, 200)
+        self.assertEqual((await self.async_client.get(url, headers={'if-none-match': cold['ETag']})).status_code, 304)
+
+        # A deferred invalidation that has fallen due is applied on this path too
+        await cache.aset(INVALIDATION_PENDING_KEY, time.time() - 1, None)
+        fresh = await self.async_client.get(url)
+        self.assertNotEqual(fresh['ETag'], cold['ETag'])
+        self.assertEqual(await cache.aget(INVALIDATION_PENDING_KEY), 0)
+
+    async def test_async_detail(self):
+        response = await self.async_client.get(reverse('async-recipe-detail', args=[self.recipe.recipe_id]))
+        self.assertEqual(response.json()['data']['recipe_slug'], 'paneer-butter-masala')
+        missing = await self.async_client.get(reverse('async-recipe-detail', args=[uuid.uuid4()]))
+        self.assertEqual(missing.status_code, 404)
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recipe = make_recipe("Paneer Butter Masala")
+        self.detail_url = reverse('recipe-detail', args=[self.recipe.recipe_id])
+        self.list_url = reverse('recipe-list-create')
+
+    def test_detail_revalidation_costs_one_lookup(self):
+        response = self.client.get(self.detail_url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            revalidated = self.client.get(self.detail_url, headers={'if-none-match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], etag)
+
+        since = self.client.get(self.detail_url, headers={'if-modified-since': response['Last-Modified']})
+        self.assertEqual(since.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeService.update_recipe(str(self.recipe.recipe_id), {'recipe_description': 'Now with cream'})
+        changed = self.client.get(self.detail_url, headers={'if-none-match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_list_revalidation_skips_the_database(self):
+        etag = self.client.get(self.list_url, {'recipe_type': 'VEG'})['ETag']
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(self.list_url, {'recipe_type': 'VEG'}, headers={'if-none-match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+
+        other_filters = self.client.get(self.list_url, {'recipe_type': 'VEGAN'}, headers={'if-none-match': etag})
+        self.assertEqual(other_filters.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_recipe("Dal Makhani")
+            RecipeService.delete_recipe(str(self.recipe.recipe_id))
+        changed = self.client.get(self.list_url, {'recipe_type': 'VEG'}, headers={'if-none-match': etag})
+        self.assertEqual(changed.status_code, 200)
+
+    async def test_async_detail_honours_if_none_match(self):
+        url = reverse('async-recipe-detail', args=[self.recipe.recipe_id])
+        etag = (await self.async_client.get(url))['ETag']
+        revalidated = await self.async_client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+
+
+class RenderedResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recipe = make_recipe("Masala Dosa")
+        self.detail_url = reverse('recipe-detail', args=[self.recipe.recipe_id])
+        self.list_url = reverse('recipe-list-create')
+
+    def test_list_hit_serves_stored_bytes(self):
+        first = self.client.get(self.list_url, {'page_size': 5})
+        with mock.patch('apps.home.services.RecipeService.get_all_recipes') as service, \
+                self.assertNumQueries(0):
+            second = self.client.get(self.list_url, {'page_size': 5})
+        service.assert_not_called()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['Content-Type'], 'application/json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeService.delete_recipe(str(self.recipe.recipe_id))
+        self.assertEqual(self.client.get(self.list_url, {'page_size': 5}).json()['count'], 0)
+
+    def test_detail_hit_skips_serialization_until_the_recipe_changes(self):
+        first = self.client.get(self.detail_url)
+        with mock.patch('apps.home.services.RecipeService.get_recipe_by_id') as service, \
+                self.assertNumQueries(1):
+            second = self.client.get(self.detail_url)
+        service.assert_not_called()
+        self.assertEqual(second.content, first.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeService.update_recipe(str(self.recipe.recipe_id), {'recipe_description': 'Crisp and golden'})
+        changed = self.client.get(self.detail_url)
+        self.assertEqual(changed.json()['data']['recipe_description'], 'Crisp and golden')
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    async def test_async_views_share_the_cache(self):
+        url = reverse('async-recipe-list')
+        sync_body = (await sync_to_async(self.client.get)(self.list_url)).content
+        async_body = (await self.async_client.get(url)).content
+        self.assertEqual(async_body, sync_body)
+
+
+class FastSerializationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plain = make_recipe("Lemon Rice")
+        self.pictured = make_recipe(
+            "Crème Brûlée \u2028 \"Torched\"",
+            recipe_type='VEGAN',
+            recipe_image='recipes/2026/10/brulee.jpg',
+            recipe_image_variants={
+                'thumb': {'webp': 'recipes/variants/ab/abc/thumb.webp'},
+                'small': {'webp': 'recipes/variants/ab/abc/small.webp', 'avif': 'recipes/variants/ab/abc/small.avif'},
+            },
+        )
+        make_recipe("Only Original", recipe_image='recipes/2026/10/plain.jpg')
+        IngredientsModel.objects.create(recipe=self.pictured, ingredient_name="Sugar")
+        IngredientsModel.objects.create(recipe=self.pictured, ingredient_name="Crème fraîche")
+
+    def both_paths(self, call):
+        with override_settings(RECIPE_FAST_SERIALIZATION=False):
+            cache.clear()
+            local_cache.clear()
+            slow = call()
+        with override_settings(RECIPE_FAST_SERIALIZATION=True):
+            cache.clear()
+            local_cache.clear()
+            fast = call()
+        return slow, fast
+
+    def assertSameBytes(self, slow, fast):
+        self.assertEqual(slow['status'], 'success')
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(slow))
+        self.assertEqual(fast_serializers.render(fast), JSONRenderer().render(slow))
+
+    def test_list_output_is_byte_identical(self):
+        for filters in ({}, {'recipe_type': 'VEGAN'}, {'search': 'brulee'}):
+            slow, fast = self.both_paths(lambda: RecipeService.get_all_recipes(filters, page_size=2))
+            self.assertSameBytes(slow, fast)
+            self.assertTrue(slow['data'])
+            if slow['next']:
+                cursor = slow['next']
+                slow, fast = self.both_paths(lambda: RecipeService.get_all_recipes(filters, page_size=2, cursor=cursor))
+                self.assertSameBytes(slow, fast)
+
+    def test_detail_output_is_byte_identical(self):
+        for recipe in RecipeModel.objects.all():
+            slow, fast = self.both_paths(lambda: RecipeService.get_recipe_by_id(str(recipe.recipe_id)))
+            self.assertSameBytes(slow, fast)
+
+        with override_settings(RECIPE_FAST_SERIALIZATION=True):
+            self.assertEqual(RecipeService.get_recipe_by_id(str(uuid.uuid4()))['message'], 'Recipe not found')
+
+    async def test_async_paths_match(self):
+        slow, fast = await sync_to_async(self.both_paths)(lambda: RecipeService.get_all_recipes({}))
+        with override_settings(RECIPE_FAST_SERIALIZATION=True):
+            await cache.aclear()
+            async_fast = await RecipeService.aget_all_recipes({})
+            async_detail = await RecipeService.aget_recipe_by_id(str(self.pictured.recipe_id))
+        self.assertEqual(JSONRenderer().render(async_fast), JSONRenderer().render(slow))
+        self.assertEqual(async_detail['data']['recipe_name'], self.pictured.recipe_name)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_synthetic_catalogue_is_reproducible_and_importable(self):
+        rows = list(synthetic_recipes(20, 3, seed=7))
+        self.assertEqual(rows, list(synthetic_recipes(20, 3, seed=7)))
+        self.assertNotEqual(rows, list(synthetic_recipes(20, 3, seed=8)))
+
+        report = RecipeService.bulk_import(rows, 'jsonl')
+        self.assertEqual(report['created'], 20)
+        self.assertEqual(IngredientsModel.objects.count(), 60)
+
+    def test_measure_counts_queries_per_request(self):
+        make_recipe("Jeera Rice")
+        url = reverse('recipe-list-create')
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            result = measure(lambda i: self.client.get(url), 3)
+            bump_list_generation()
+        self.assertEqual(result['requests'], 3)
+        self.assertEqual(result['status_codes'], {200: 3})
+        self.assertEqual(result['queries_max'], 2)
+
+    def test_compare_flags_slower_or_chattier_scenarios(self):
+        baseline = {'results': {
+            'list': {'p50_ms': 10.0, 'queries_max': 3},
+            'detail': {'p50_ms': 2.0, 'queries_max': 1},
+        }}
+        current = {'results': {
+            'list': {'p50_ms': 11.0, 'queries_max': 3},
+            'detail': {'p50_ms': 5.0, 'queries_max': 2},
+            'export': {'p50_ms': 50.0, 'queries_max': 9},
+        }}
+        regressions = compare_results(baseline, current, threshold=0.2)
+        self.assertEqual(
+            [(r['scenario'], r['metric']) for r in regressions],
+            [('detail', 'p50_ms'), ('detail', 'queries_max')]
+        )
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.recipe = make_recipe("Malai Kofta")
+        self.list_url = reverse('recipe-list-create')
+
+    @staticmethod
+    def timings(response):
+        return {entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')}
+
+    def test_server_timing_reports_sql_cache_and_serialization(self):
+        miss = self.timings(self.client.get(self.list_url))
+        self.assertIn('desc="2 queries"', miss['db'])
+        self.assertIn('serialize', miss)
+        self.assertIn('render', miss)
+        self.assertIn('total', miss)
+
+        hit = self.timings(self.client.get(self.list_url))
+        self.assertIn('desc="0 queries"', hit['db'])
+        # list generation and pending invalidation twice (ETag and key), then the rendered response
+        self.assertIn('desc="5 hits 0 misses 0 sets"', hit['cache'])
+        self.assertNotIn('serialize', hit)
+
+    async def test_async_views_are_measured(self):
+        url = reverse('async-recipe-detail', args=[self.recipe.recipe_id])
+        response = await self.async_client.get(url)
+        self.assertIn('desc="2 queries"', self.timings(response)['db'])
+
+    def test_metrics_endpoint_exposes_prometheus_text(self):
+        self.client.get(self.list_url)
+        self.client.get(self.list_url)
+        self.client.get(reverse('recipe-detail', args=[uuid.uuid4()]))
+
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        labels = 'view="recipe-list-create",method="GET",status="200"'
+        self.assertIn(f'recipe_request_duration_seconds_count{{{labels}}} 2', body)
+        self.assertIn(f'recipe_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body)
+        self.assertIn('recipe_sql_queries_total{view="recipe-list-create"} 2', body)
+        self.assertIn('status="404"', body)
+        self.assertNotIn('view="metrics"', body)
+
+    @override_settings(RECIPE_METRICS_ALLOWED_IPS=[])
+    def test_metrics_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_user('cook', password='password'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_user('ops', password='password', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter(replicas=['replica_1', 'replica_2'])
+        self.factory = RequestFactory()
+
+    def route_read(self, model, pinned=False):
+        def read():
+            if pinned:
+                pin_to_primary()
+            return self.router.db_for_read(model)
+        return contextvars.Context().run(read)
+
+    def test_catalogue_reads_go_to_replicas_until_pinned(self):
+        self.assertIn(self.route_read(RecipeModel), {'replica_1', 'replica_2'})
+        self.assertIn(self.route_read(IngredientsModel), {'replica_1', 'replica_2'})
+        self.assertEqual(self.route_read(TaskModel), 'default')
+        self.assertEqual(self.route_read(RecipeModel, pinned=True), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'home'))
+        self.assertTrue(self.router.allow_migrate('default', 'home'))
+
+    def test_fills_after_an_invalidation_and_tasks_read_the_primary(self):
+        router = PrimaryReplicaRouter(replicas=['replica_1'])
+        read = lambda: router.db_for_read(RecipeModel)  # noqa: E731
+        register_task('tests.route')(lambda: read())
+
+        key, marker = f"tests_route_{uuid.uuid4()}", f"tests_route_{uuid.uuid4()}"
+        fill = lambda: get_or_compute(f"{key}_{uuid.uuid4()}", read, 60, marker=marker)  # noqa: E731
+        self.assertEqual(contextvars.Context().run(fill), ('replica_1', True))
+        mark_invalidated([marker])
+        self.assertEqual(contextvars.Context().run(fill), ('default', True))
+        with override_settings(RECIPE_REPLICA_PIN_SECONDS=0):
+            self.assertEqual(contextvars.Context().run(fill), ('replica_1', True))
+        self.assertEqual(contextvars.Context().run(run_handler, 'tests.route', {}), 'default')
+        self.assertEqual(contextvars.Context().run(read), 'replica_1')
+
+    def test_a_write_pins_the_client_to_the_primary(self):
+        def view(request):
+            if request.method == 'POST':
+                self.router.db_for_write(RecipeModel)
+            return HttpResponse(self.router.db_for_read(RecipeModel))
+
+        middleware = ReplicaPinningMiddleware(view)
+        run = lambda request: contextvars.Context().run(middleware, request)  # noqa: E731
+
+        written = run(self.factory.post('/home/recipes/'))
+        self.assertEqual(written.content, b'default')
+        self.assertEqual(written.cookies[PIN_COOKIE]['max-age'], 5)
+
+        self.assertIn(run(self.factory.get('/home/recipes/')).content, {b'replica_1', b'replica_2'})
+        pinned_request = self.factory.get('/home/recipes/')
+        pinned_request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(run(pinned_request).content, b'default')
+
+
+class RecordingRouter(PrimaryReplicaRouter):
+    """Routes as with one replica, which is the test database itself; records each read"""
+    reads = []
+
+    def __init__(self):
+        super().__init__(replicas=['replica_1'])
+
+    def db_for_read(self, model, **hints):
+        alias = super().db_for_read(model, **hints)
+        self.reads.append(alias)
+        return 'default'
+
+
+@override_settings(DATABASE_ROUTERS=['apps.home.tests.RecordingRouter'])
+class ReplicaCacheFillTests(TransactionTestCase):
+    # Outside a test transaction, as reads inside one stay on the primary
+
+    def setUp(self):
+        make_recipe("Dal Tadka")
+        make_recipe("Chicken Curry", recipe_type='NON_VEG')
+        # Long after these writes
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def reads_of(self, *args, **kwargs):
+        RecordingRouter.reads.clear()
+        self.assertEqual(self.client.get(*args, **kwargs).status_code, 200)
+        return set(RecordingRouter.reads)
+
+    def test_cold_fills_read_a_replica(self):
+        list_url = reverse('recipe-list-create')
+        self.assertEqual(self.reads_of(list_url), {'replica_1'})
+        self.assertEqual(self.reads_of(list_url, {'recipe_type': 'VEG'}), {'replica_1'})
+        self.assertEqual(self.reads_of(list_url, {'search': 'curry'}), {'replica_1'})
+
+        # Until replicas have caught up with a write, fills read the primary
+        recipe = make_recipe("Dal Fry")
+        self.assertEqual(self.reads_of(list_url, {'recipe_type': 'NON_VEG'}), {'default'})
+        detail = reverse('recipe-detail', args=[recipe.recipe_id])
+        self.assertIn('default', self.reads_of(detail))
+        with override_settings(RECIPE_REPLICA_PIN_SECONDS=0):
+            self.assertEqual(self.reads_of(list_url, {'search': 'tadka'}), {'replica_1'})
+
+    @override_settings(RECIPE_CHANGES_LAG_SECONDS=0)
+    def test_change_feed_reads_the_primary(self):
+        self.assertEqual(self.reads_of(reverse('recipe-changes')), {'default'})
+
+
+class IngredientLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('recipe-list-create')
+        self.paneer = make_recipe("Paneer Butter Masala")
+        self.dal = make_recipe("Dal Makhani")
+        self.toast = make_recipe("Garlic Toast")
+        for recipe, names in (
+            (self.paneer, ["Paneer", "Butter", "Tomato"]),
+            (self.dal, ["Black Lentils", " butter ", "Cream"]),
+            (self.toast, ["Bread", "Garlic", "BUTTER"]),
+        ):
+            for name in names:
+                IngredientsModel.objects.create(recipe=recipe, ingredient_name=name)
+
+    def names(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return {row['recipe_name'] for row in response.json()['data']}
+
+    def test_filter_matches_all_or_any_normalized_names(self):
+        self.assertEqual(self.names({'ingredients': 'paneer,butter'}), {"Paneer Butter Masala"})
+        self.assertEqual(self.names({'ingredients': 'Butter'}), {"Paneer Butter Masala", "Dal Makhani", "Garlic Toast"})
+        self.assertEqual(
+            self.names({'ingredients': 'paneer, garlic', 'ingredients_match': 'any'}),
+            {"Paneer Butter Masala", "Garlic Toast"}
+        )
+        self.assertEqual(self.names({'ingredients': 'paneer,cream'}), set())
+
+        invalid = self.client.get(self.url, {'ingredients': 'paneer', 'ingredients_match': 'most'})
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_denormalized_list_tracks_ingredient_edits(self):
+        IngredientsModel.objects.filter(recipe=self.toast, ingredient_name="Bread").delete()
+        extra = IngredientsModel.objects.create(recipe=self.toast, ingredient_name="Chilli Flakes")
+
+        self.toast.refresh_from_db()
+        expected = IngredientsSerializer(
+            IngredientsModel.objects.filter(recipe=self.toast).order_by('created_at', 'ingredient_id'), many=True
+        ).data
+        self.assertEqual(JSONRenderer().render(self.toast.ingredients_data), JSONRenderer().render(expected))
+        self.assertEqual(self.names({'ingredients': 'chilli flakes'}), {"Garlic Toast"})
+        self.assertEqual(self.names({'ingredients': 'bread'}), set())
+
+        # List rendering reads the recipe rows only
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            RecipeService.get_all_recipes({})
+        self.assertFalse([q for q in captured if 'ingredients' in q['sql'].split('FROM')[1]])
+        extra.delete()
+
+    def test_import_fills_catalog_and_denormalized_lists(self):
+        lines = [json.dumps({
+            'recipe_name': "Butter Naan", 'recipe_description': "Soft naan brushed with butter",
+            'recipe_type': 'VEG', 'ingredients': ["Flour", "Butter"],
+        })]
+        RecipeService.bulk_import(lines, 'jsonl')
+        naan = RecipeModel.objects.get(recipe_name="Butter Naan")
+        self.assertEqual([row['ingredient_name'] for row in naan.ingredients_data], ["Flour", "Butter"])
+        self.assertEqual(self.names({'ingredients': 'flour,butter'}), {"Butter Naan"})
+        self.assertEqual(IngredientCatalogModel.objects.filter(name='butter').count(), 1)
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.paneer = make_recipe("Paneer Butter Masala")
+        self.chicken = make_recipe("Butter Chicken", recipe_type='NON_VEG')
+        for recipe, names in ((self.paneer, ['Paneer', 'Butter']), (self.chicken, ['Chicken', 'Butter'])):
+            for name in names:
+                IngredientsModel.objects.create(recipe=recipe, ingredient_name=name)
+        self.url = reverse('recipe-facets')
+
+    def assertCountersMatchRecount(self):
+        stored = {
+            (row.facet, row.value): row.count
+            for row in RecipeFacetCountModel.objects.exclude(count=0)
+        }
+        self.assertEqual(stored, dict(recount_facets()))
+
+    def test_counters_follow_every_write_path(self):
+        self.assertCountersMatchRecount()
+        RecipeService.update_recipe(str(self.chicken.recipe_id), {'recipe_type': 'VEG'})
+        self.assertCountersMatchRecount()
+        IngredientsModel.objects.filter(recipe=self.paneer, ingredient_name='Butter').get().delete()
+        self.assertCountersMatchRecount()
+        RecipeService.delete_recipe(str(self.paneer.recipe_id))
+        self.assertCountersMatchRecount()
+        RecipeModel.objects.get(pk=self.chicken.pk).delete()
+        self.assertCountersMatchRecount()
+        RecipeService.bulk_import([
+            'recipe_name,recipe_description,recipe_type,ingredients\n',
+            'Chana Masala,Spiced chickpea curry,VEGAN,Chickpeas|Onion\n',
+        ], 'csv')
+        self.assertCountersMatchRecount()
+
+    def test_unfiltered_facets_never_read_recipes(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertFalse([q for q in queries if 'recipes_master' in q['sql']])
+        body = response.json()
+        self.assertEqual(body['count'], 2)
+        self.assertEqual(
+            [(facet['value'], facet['count']) for facet in body['data']['recipe_type']],
+            [('VEG', 1), ('NON_VEG', 1), ('VEGAN', 0)]
+        )
+        self.assertEqual(body['data']['ingredients'][0], {'name': 'butter', 'count': 2})
+
+    def test_match_mode_without_ingredients_is_unfiltered(self):
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get(self.url, {'ingredients_match': 'any'}).json()
+        self.assertFalse([q for q in queries if 'recipes_master' in q['sql']])
+        self.assertEqual(body['count'], 2)
+
+    def test_command_repairs_drifted_counters(self):
+        # What two concurrent edits applying the same delta leave behind
+        RecipeFacetCountModel.objects.filter(facet='recipe_type', value='VEG').update(count=2)
+        RecipeFacetCountModel.objects.filter(facet='ingredient', value='butter').delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_facet_counts', '--check', stdout=io.StringIO())
+
+        call_command('rebuild_facet_counts', stderr=io.StringIO())
+        self.assertCountersMatchRecount()
+        call_command('rebuild_facet_counts', '--check', stderr=io.StringIO())
+
+    def test_filtered_facets(self):
+        body = self.client.get(self.url, {'ingredients': 'chicken'}).json()
+        self.assertEqual(body['count'], 1)
+        self.assertEqual(
+            sorted((facet['name'], facet['count']) for facet in body['data']['ingredients']),
+            [('butter', 1), ('chicken', 1)]
+        )
+        body = self.client.get(self.url, {'recipe_type': 'VEG', 'top': 1}).json()
+        self.assertEqual(body['count'], 1)
+        self.assertEqual(len(body['data']['ingredients']), 1)
+
+
+class RecipeExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.paneer = make_recipe("Paneer Butter Masala")
+        self.chicken = make_recipe("Butter Chicken", recipe_type='NON_VEG')
+        for recipe, names in ((self.paneer, ['Paneer', 'Butter']), (self.chicken, ['Chicken'])):
+            for name in names:
+                IngredientsModel.objects.create(recipe=recipe, ingredient_name=name)
+        self.retired = make_recipe("Retired Recipe", is_active=False)
+        self.url = reverse('recipe-export')
+
+    def test_streams_active_recipes_as_jsonl(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [(row['recipe_name'], row['ingredients']) for row in rows],
+            [('Paneer Butter Masala', ['Paneer', 'Butter']), ('Butter Chicken', ['Chicken'])]
+        )
+
+    def test_gzipped_csv_round_trips_through_the_importer(self):
+        response = self.client.get(self.url, {'format': 'csv', 'gzip': '1'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="recipes.csv.gz"')
+        text = gzip.decompress(b''.join(response.streaming_content)).decode()
+        result = RecipeService.bulk_import(io.StringIO(text, newline=''), 'csv')
+        self.assertEqual((result['created'], result['failed']), (2, 0))
+        copy = RecipeModel.objects.get(recipe_slug='paneer-butter-masala-1')
+        self.assertEqual(
+            list(copy.recipe_ingredients.order_by('created_at').values_list('ingredient_name', flat=True)),
+            ['Paneer', 'Butter']
+        )
+
+    def test_since_exports_changes_including_soft_deletes(self):
+        since = timezone.now()
+        RecipeService.delete_recipe(str(self.chicken.recipe_id))
+        response = self.client.get(self.url, {'since': since.isoformat()})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['recipe_id'], row['is_active']) for row in rows], [(str(self.chicken.recipe_id), False)])
+
+    def test_rejects_bad_options(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
+
+    def test_command_writes_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/recipes.jsonl.gz"
+            call_command('export_recipes', path, gzip=True, stderr=io.StringIO())
+            with gzip.open(path, 'rt') as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+
+@override_settings(RECIPE_CHANGES_LAG_SECONDS=0)
+class RecipeChangeFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recipes = [make_recipe(name) for name in ("Dal Makhani", "Chole Bhature", "Aloo Gobi")]
+        self.url = reverse('recipe-changes')
+
+    def feed(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_through_changes_and_resumes_from_the_cursor(self):
+        first = self.feed(page_size=2)
+        self.assertTrue(first['has_more'])
+        second = self.feed(page_size=2, cursor=first['next'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            [change['recipe_id'] for change in first['data'] + second['data']],
+            [str(recipe.recipe_id) for recipe in self.recipes]
+        )
+        self.assertEqual({change['change'] for change in first['data']}, {'created'})
+
+        caught_up = self.feed(cursor=second['next'])
+        self.assertEqual((caught_up['data'], caught_up['next']), ([], second['next']))
+
+        RecipeService.update_recipe(str(self.recipes[0].recipe_id), {'recipe_description': 'Now even creamier'})
+        RecipeService.delete_recipe(str(self.recipes[1].recipe_id))
+        changes = self.feed(cursor=second['next'])['data']
+        self.assertEqual(
+            [(change['recipe_id'], change['change']) for change in changes],
+            [(str(self.recipes[0].recipe_id), 'updated'), (str(self.recipes[1].recipe_id), 'deleted')]
+        )
+        self.assertEqual(changes[0]['recipe']['recipe_name'], 'Dal Makhani')
+        self.assertIsNone(changes[1]['recipe'])
+
+    def test_since_starts_at_a_timestamp(self):
+        since = timezone.now()
+        recipe = make_recipe("Rajma Chawal")
+        changes = self.feed(since=since.isoformat())['data']
+        self.assertEqual([(c['recipe_id'], c['change']) for c in changes], [(str(recipe.recipe_id), 'created')])
+
+    @override_settings(RECIPE_CHANGES_LAG_SECONDS=60)
+    def test_holds_back_writes_that_may_still_be_in_flight(self):
+        self.assertEqual(self.feed()['data'], [])
+
+    def test_reads_the_updated_at_index(self):
+        plan = RecipeModel.objects.filter(updated_at__gt=timezone.now()).order_by('updated_at', 'recipe_id').explain()
+        self.assertIn('recipe_updated_idx', plan)
+
+    def test_warns_of_imports_holding_a_transaction_past_the_lag(self):
+        with self.assertLogs('apps.home.importers', 'WARNING') as logs:
+            result = RecipeService.bulk_import(
+                ['recipe_name,recipe_description,recipe_type,ingredients\n', 'Upma,Savoury semolina,VEG,Semolina\n'], 'csv'
+            )
+        self.assertEqual(result['created'], 1)
+        self.assertIn("RECIPE_CHANGES_LAG_SECONDS", logs.output[0])
+
+    def test_rejects_bad_watermarks(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': 'last week'}).status_code, 400)
+
+
+class SimilarRecipeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = override_settings(RECIPE_SIMILARITY_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        similarity._loaded.update(index=None, checked=0.0)
+        self.addCleanup(similarity._loaded.update, index=None, checked=0.0)
+
+        self.tadka = self.recipe("Dal Tadka", ['Lentils', 'Onion', 'Garlic', 'Cumin'])
+        self.fry = self.recipe("Dal Fry", ['lentils', 'onion ', 'Garlic', 'Tomato'])
+        self.curry = self.recipe("Chicken Curry", ['Onion', 'Garlic', 'Chicken', 'Tomato'], recipe_type='NON_VEG')
+        self.salad = self.recipe("Fruit Salad", ['Apple', 'Banana'])
+        refresh_index(full=True)
+
+    @staticmethod
+    def recipe(name, ingredients, **kwargs):
+        recipe = make_recipe(name, **kwargs)
+        for ingredient in ingredients:
+            IngredientsModel.objects.create(recipe=recipe, ingredient_name=ingredient)
+        return recipe
+
+    def similar(self, recipe, **params):
+        return self.client.get(reverse('recipe-similar', args=[recipe.recipe_id]), params)
+
+    def ranking(self, recipe, **params):
+        return [(item['recipe']['recipe_name'], item['score']) for item in self.similar(recipe, **params).json()['data']]
+
+    def test_ranks_by_shared_ingredients_and_type(self):
+        # Jaccard 3/5 plus the type bonus, then 2/6 of another type; no overlap is no match
+        self.assertEqual(self.ranking(self.tadka), [("Dal Fry", 0.7), ("Chicken Curry", 0.3333)])
+        self.assertEqual(self.ranking(self.tadka, metric='cosine', limit=1), [("Dal Fry", 0.85)])
+        self.assertEqual(self.ranking(self.salad), [])
+
+        self.assertEqual(self.similar(self.tadka, metric='euclid').status_code, 400)
+        self.assertEqual(self.client.get(reverse('recipe-similar', args=['nope'])).status_code, 400)
+        self.assertEqual(self.client.get(reverse('recipe-similar', args=[uuid.uuid4()])).status_code, 404)
+
+    def test_refresh_reads_only_changed_recipes(self):
+        first = get_index()
+        self.assertEqual(len(first), 4)
+        twin = self.recipe("Dal Tadka Again", ['Lentils', 'Onion', 'Garlic', 'Cumin'])
+        self.fry.is_active = False
+        self.fry.save()
+        # Candidates come from the index, the query recipe from the database
+        self.assertEqual(self.ranking(twin)[0], ("Dal Tadka", 1.1))
+        self.assertNotIn("Dal Tadka Again", dict(self.ranking(self.tadka)))
+
+        with self.assertNumQueries(2):
+            refresh_index()
+        self.assertEqual(self.ranking(self.tadka), [("Dal Tadka Again", 1.1), ("Chicken Curry", 0.3333)])
+        self.assertEqual(len(get_index()), 4)
+
+        refresh_index()
+        versions = [entry for entry in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, entry))]
+        self.assertEqual(len(versions), 2)
+        self.assertNotIn(first.version, versions)
+
+    def test_workers_map_the_saved_index(self):
+        built = get_index()
+        similarity._loaded.update(index=None, checked=0.0)
+        with mock.patch.object(similarity, 'build_index', side_effect=AssertionError("rebuilt")):
+            loaded = get_index()
+        self.assertEqual(loaded.version, built.version)
+        self.assertIsInstance(loaded.indices, np.memmap)
+        self.assertEqual(loaded.row_of(self.curry.recipe_id), built.row_of(self.curry.recipe_id))
+        self.assertIsNone(loaded.row_of(uuid.uuid4()))
+
+    def test_missing_index_is_built_by_the_worker(self):
+        shutil.rmtree(self.directory)
+        similarity._loaded.update(index=None, checked=0.0)
+        with mock.patch.object(similarity, 'build_index', side_effect=AssertionError("built in the request")):
+            response = self.similar(self.tadka)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.similar(self.tadka)
+        self.assertEqual(TaskModel.objects.filter(name='recipes.refresh_similarity').count(), 1)
+
+        self.assertEqual(TaskWorker().run_once(), 1)
+        self.assertEqual(self.ranking(self.tadka)[0], ("Dal Fry", 0.7))
+
+    def test_save_keeps_versions_saved_since_the_previous_one(self):
+        first = get_index().version
+        second = refresh_index().version
+        # Saved by a concurrent builder after this one read CURRENT
+        concurrent = os.path.join(self.directory, f"{int(time.time() * 1000) + 60000}-concurrent")
+        os.mkdir(concurrent)
+        third = refresh_index().version
+        versions = {entry.name for entry in os.scandir(self.directory) if entry.is_dir()}
+        self.assertEqual(versions, {second, third, os.path.basename(concurrent)})
+        self.assertNotIn(first, versions)
+        self.assertGreater(similarity.version_order(third), similarity.version_order(second))
+
+    def test_deploy_builds_a_missing_index_once(self):
+        shutil.rmtree(self.directory)
+        call_command('build_similarity_index', '--if-missing', stderr=io.StringIO())
+        version = similarity.read_current_version(similarity.index_directory())
+        self.assertIsNotNone(version)
+        call_command('build_similarity_index', '--if-missing', stderr=io.StringIO())
+        self.assertEqual(similarity.read_current_version(similarity.index_directory()), version)
+
+    def test_batched_queries_match_single_ones(self):
+        index = get_index()
+        sets = [[1, 2], [2, 3, 4], [], [5]] * 20
+        types = ['VEG', 'NON_VEG', 'VEG', 'VEGAN'] * 20
+        batched = index.top_k(sets, types, 3)
+        self.assertEqual(batched, [index.top_k([ids], [t], 3)[0] for ids, t in zip(sets, types)])
+
+    def test_writes_queue_one_deferred_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe("Aloo Gobi", ['Potato', 'Cauliflower'])
+        refresh = TaskModel.objects.filter(name='recipes.refresh_similarity')
+        self.assertEqual(refresh.count(), 1)
+        self.assertGreater(refresh.get().run_after, timezone.now())
@@ -1,6 +1,17 @@
 from django.urls import path
 from apps.home.views import *
+from apps.home.instrumentation import metrics_view
 urlpatterns = [
    path('recipes/', RecipeListCreateApiView.as_view(), name='recipe-list-create'),
+    path('recipes/import/', RecipeImportApiView.as_view(), name='recipe-import'),
+    path('recipes/batch/', RecipeBatchApiView.as_view(), name='recipe-batch'),
+    path('recipes/facets/', RecipeFacetsApiView.as_view(), name='recipe-facets'),
+    path('recipes/export/', RecipeExportView.as_view(), name='recipe-export'),
+    path('recipes/changes/', RecipeChangesApiView.as_view(), name='recipe-changes'),
+    path('recipes/by-slug/<slug:recipe_slug>/', RecipeBySlugApiView.as_view(), name='recipe-by-slug'),
+    path('recipes/<str:recipe_id>/similar/', RecipeSimilarApiView.as_view(), name='recipe-similar'),
     path('recipes/<str:recipe_id>/', RecipeRetrieveUpdateDestroyApiView.as_view(), name='recipe-detail'),
+    path('async/recipes/', AsyncRecipeListApiView.as_view(), name='async-recipe-list'),
+    path('async/recipes/<str:recipe_id>/', AsyncRecipeRetrieveApiView.as_view(), name='async-recipe-detail'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
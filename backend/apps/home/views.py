@@ -38,12 +38,27 @@
 
 
 
+import io
 import logging
+import uuid
+from django.http import StreamingHttpResponse
+from django.views import View
 from rest_framework import generics, status, filters
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
-from apps.home.services import RecipeService
+from apps.home.caching import StaleResult
+from apps.home.conditional import (
+    alist_etag, is_not_modified, list_etag, not_modified, recipe_etag, validator_headers
+)
+from apps.home.exports import CONTENT_TYPES, ExportError, export_filename, iter_export, parse_since
+from apps.home.importers import detect_format
+from apps.home.response_cache import (
+    aget_cached_response, alist_response_key, astore_response, detail_response_key, get_cached_response,
+    list_response_key, render_json, store_response
+)
+from apps.home.services import SIMILARITY_UNAVAILABLE, RecipeService
 from apps.home.models import RecipeModel
 from apps.home.serializers import RecipeListSerializer, RecipeDetailSerializer
 
@@ -56,6 +71,42 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+def get_page_size(params):
+    """Page size from the query string, clamped like StandardResultsSetPagination"""
+    paginator = StandardResultsSetPagination
+    try:
+        page_size = int(params.get(paginator.page_size_query_param, paginator.page_size))
+    except (TypeError, ValueError):
+        page_size = paginator.page_size
+    return max(1, min(page_size, paginator.max_page_size))
+
+
+def is_valid_recipe_id(recipe_id):
+    """Recipe ids are UUIDs; anything else is rejected before it reaches the database"""
+    try:
+        uuid.UUID(recipe_id)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+INVALID_RECIPE_ID = {
+    'status': 'error',
+    'message': 'Invalid recipe id'
+}
+
+
+def get_list_filters(params):
+    filters = {
+        'recipe_type': params.get('recipe_type'),
+        'search': params.get('search'),
+        'ingredients': params.get('ingredients'),
+        'ingredients_match': params.get('ingredients_match'),
+    }
+    # Remove None values
+    return {k: v for k, v in filters.items() if v is not None}
+
+
 class RecipeListCreateApiView(generics.ListCreateAPIView):
     """
     List all recipes or create a new recipe
@@ -70,9 +121,9 @@ class RecipeListCreateApiView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         """Optimized queryset for list view"""
-        return RecipeModel.objects.filter(is_active=True).select_related().only(
-            'recipe_id', 'recipe_name', 'recipe_image',
-            'recipe_slug', 'recipe_type', 'created_at'
+        return RecipeModel.objects.filter(is_active=True).only(
+            'recipe_id', 'recipe_name', 'recipe_image', 'recipe_image_variants',
+            'recipe_slug', 'recipe_type', 'created_at', 'ingredients_data'
         )
     
     def get_serializer_class(self):
@@ -84,17 +135,26 @@ class RecipeListCreateApiView(generics.ListCreateAPIView):
     def list(self, request, *args, **kwargs):
         """Custom list method with service layer"""
         try:
-            filters = {
-                'recipe_type': request.query_params.get('recipe_type'),
-                'search': request.query_params.get('search'),
-            }
-            # Remove None values
-            filters = {k: v for k, v in filters.items() if v is not None}
+            filters = get_list_filters(request.query_params)
+            page_size = get_page_size(request.query_params)
+            cursor = request.query_params.get('cursor')
             
-            result = RecipeService.get_all_recipes(filters)
+            etag = list_etag(filters, page_size, cursor)
+            if is_not_modified(request, etag):
+                return not_modified(etag)
             
-            if result['status'] == 'success':
+            cache_key = list_response_key(filters, page_size, cursor)
+            cached = get_cached_response(cache_key)
+            if cached is not None:
+                return cached
+            
+            result = RecipeService.get_all_recipes(filters, page_size=page_size, cursor=cursor)
+            
+            if isinstance(result, StaleResult):
+                # Predates the current ETag, so it is neither tagged nor cached
                 return Response(result, status=status.HTTP_200_OK)
+            elif result['status'] == 'success':
+                return store_response(cache_key, result, validator_headers(etag))
             else:
                 return Response(result, status=status.HTTP_400_BAD_REQUEST)
                 
@@ -123,6 +183,35 @@ class RecipeListCreateApiView(generics.ListCreateAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def recipe_detail_response(request, recipe_id, validators):
+    """
+    Detail read shared by the id and slug routes: answers conditional
+    requests from ``validators`` and serves the cached rendered response,
+    from this process's L1 cache when it is hot
+    """
+    etag, last_modified = None, None
+    if validators:
+        etag, last_modified = recipe_etag(*validators), validators[1]
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        
+        cached = get_cached_response(detail_response_key(etag), local=True)
+        if cached is not None:
+            return cached
+    
+    result = RecipeService.get_recipe_by_id(recipe_id, last_modified)
+    
+    # A body of another version (the validators came from a lagging
+    # replica) must not be cached or tagged under this ETag
+    if result['status'] == 'success' and etag and RecipeService.is_current(result, last_modified):
+        return store_response(detail_response_key(etag), result,
+                              validator_headers(etag, last_modified), local=True)
+    elif result['status'] == 'success':
+        return Response(result, status=status.HTTP_200_OK)
+    else:
+        return Response(result, status=status.HTTP_404_NOT_FOUND)
+
+
 class RecipeRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a recipe instance
@@ -137,12 +226,11 @@ class RecipeRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView):
         """Retrieve recipe using service layer"""
         try:
             recipe_id = kwargs.get('recipe_id')
-            result = RecipeService.get_recipe_by_id(recipe_id)
+            if not is_valid_recipe_id(recipe_id):
+                return Response(INVALID_RECIPE_ID, status=status.HTTP_400_BAD_REQUEST)
             
-            if result['status'] == 'success':
-                return Response(result, status=status.HTTP_200_OK)
-            else:
-                return Response(result, status=status.HTTP_404_NOT_FOUND)
+            validators = RecipeService.get_recipe_validators(recipe_id)
+            return recipe_detail_response(request, recipe_id, validators)
                 
         except Exception as e:
             logger.error(f"Error retrieving recipe: {str(e)}")
@@ -155,6 +243,8 @@ class RecipeRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView):
         """Update recipe using service layer"""
         try:
             recipe_id = kwargs.get('recipe_id')
+            if not is_valid_recipe_id(recipe_id):
+                return Response(INVALID_RECIPE_ID, status=status.HTTP_400_BAD_REQUEST)
             result = RecipeService.update_recipe(recipe_id, request.data)
             
             if result['status'] == 'success':
@@ -175,6 +265,8 @@ class RecipeRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView):
         """Soft delete recipe using service layer"""
         try:
             recipe_id = kwargs.get('recipe_id')
+            if not is_valid_recipe_id(recipe_id):
+                return Response(INVALID_RECIPE_ID, status=status.HTTP_400_BAD_REQUEST)
             result = RecipeService.delete_recipe(recipe_id)
             
             if result['status'] == 'success':
@@ -187,4 +279,287 @@ class RecipeRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView):
             return Response({
                 'status': 'error',
                 'message': 'Internal server error'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeFacetsApiView(generics.GenericAPIView):
+    """
+    Recipe counts per recipe type and top ingredients, for the same
+    filters as the recipe list; ?top= sets how many ingredients
+    """
+    max_top = 50
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            try:
+                top = max(1, min(int(request.query_params.get('top', 10)), self.max_top))
+            except ValueError:
+                top = 10
+            result = RecipeService.get_facets(get_list_filters(request.query_params), top=top)
+            
+            if result['status'] == 'success':
+                return Response(result, status=status.HTTP_200_OK)
+            else:
+                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+                
+        except Exception as e:
+            logger.error(f"Error in recipe facets view: {str(e)}")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeSimilarApiView(generics.GenericAPIView):
+    """
+    Recipes sharing the most ingredients with this one; ?limit= sets how
+    many, ?metric= is jaccard (default) or cosine
+    """
+    max_limit = 50
+    
+    def get(self, request, recipe_id, *args, **kwargs):
+        try:
+            if not is_valid_recipe_id(recipe_id):
+                return Response(INVALID_RECIPE_ID, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                limit = max(1, min(int(request.query_params.get('limit', 10)), self.max_limit))
+            except ValueError:
+                limit = 10
+            result = RecipeService.get_similar_recipes(
+                recipe_id, limit=limit, metric=request.query_params.get('metric', 'jaccard')
+            )
+            
+            if result['status'] == 'success':
+                return Response(result, status=status.HTTP_200_OK)
+            elif result['message'] == 'Recipe not found':
+                return Response(result, status=status.HTTP_404_NOT_FOUND)
+            elif result['message'] == SIMILARITY_UNAVAILABLE:
+                # The index is being built by the task worker
+                return Response(result, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '30'})
+            else:
+                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+                
+        except Exception as e:
+            logger.error(f"Error in similar recipes view: {str(e)}")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeChangesApiView(generics.GenericAPIView):
+    """
+    Change feed for incremental sync: ?since=<ISO 8601 timestamp> starts
+    one, ?cursor= (the ``next`` of the previous response) continues it
+    """
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            try:
+                page_size = int(request.query_params.get('page_size', 100))
+            except ValueError:
+                page_size = 100
+            result = RecipeService.get_changes(
+                since=request.query_params.get('since'),
+                cursor=request.query_params.get('cursor'),
+                page_size=page_size
+            )
+            
+            if result['status'] == 'success':
+                return Response(result, status=status.HTTP_200_OK)
+            else:
+                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+                
+        except Exception as e:
+            logger.error(f"Error in recipe changes view: {str(e)}")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeExportView(View):
+    """
+    Stream the recipe catalogue: ?format=jsonl|csv, ?since=<ISO 8601
+    timestamp> for only the recipes changed after it, ?gzip=1 to compress
+    """
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            fmt = request.GET.get('format', 'jsonl')
+            gzip = request.GET.get('gzip') in ('1', 'true')
+            chunks = iter_export(fmt, parse_since(request.GET.get('since')), gzip=gzip)
+        except ExportError as e:
+            return render_json({
+                'status': 'error',
+                'message': str(e)
+            }, status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error in recipe export view: {str(e)}")
+            return render_json({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        response = StreamingHttpResponse(chunks, content_type='application/gzip' if gzip else CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(fmt, gzip)}"'
+        return response
+
+
+class RecipeBySlugApiView(generics.GenericAPIView):
+    """
+    Retrieve a recipe by its slug
+    """
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            validators = RecipeService.get_recipe_validators_by_slug(kwargs.get('recipe_slug'))
+            if validators is None:
+                return Response({
+                    'status': 'error',
+                    'message': 'Recipe not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            return recipe_detail_response(request, str(validators[0]), validators)
+                
+        except Exception as e:
+            logger.error(f"Error retrieving recipe by slug: {str(e)}")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeImportApiView(generics.GenericAPIView):
+    """
+    Bulk import recipes from an uploaded JSONL or CSV file
+    """
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request, *args, **kwargs):
+        try:
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({
+                    'status': 'error',
+                    'message': 'No file uploaded'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            fmt = request.query_params.get('format') or detect_format(upload.name)
+            lines = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+            result = RecipeService.bulk_import(lines, fmt)
+            
+            if result['status'] == 'success':
+                return Response(result, status=status.HTTP_200_OK)
+            else:
+                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+                
+        except Exception as e:
+            logger.error(f"Error in recipe import: {str(e)}")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeBatchApiView(generics.GenericAPIView):
+    """
+    Retrieve several recipes at once: ?ids= takes a comma separated
+    list of recipe ids and/or slugs
+    """
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            identifiers = [
+                identifier.strip() for identifier in request.query_params.get('ids', '').split(',')
+                if identifier.strip()
+            ]
+            result = RecipeService.get_recipes_by_ids(identifiers)
+            
+            if result['status'] == 'success':
+                return Response(result, status=status.HTTP_200_OK)
+            else:
+                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+                
+        except Exception as e:
+            logger.error(f"Error in recipe batch view: {str(e)}")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncRecipeListApiView(View):
+    """
+    Async, ASGI-native read path for the recipe list
+    """
+    
+    async def get(self, request, *args, **kwargs):
+        try:
+            filters = get_list_filters(request.GET)
+            page_size = get_page_size(request.GET)
+            cursor = request.GET.get('cursor')
+            
+            etag = await alist_etag(filters, page_size, cursor)
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+            
+            cache_key = await alist_response_key(filters, page_size, cursor)
+            cached = await aget_cached_response(cache_key)
+            if cached is not None:
+                return cached
+            
+            result = await RecipeService.aget_all_recipes(filters, page_size=page_size, cursor=cursor)
+            
+            if isinstance(result, StaleResult):
+                return render_json(result, status.HTTP_200_OK)
+            elif result['status'] == 'success':
+                return await astore_response(cache_key, result, validator_headers(etag))
+            else:
+                return render_json(result, status.HTTP_400_BAD_REQUEST)
+                
+        except Exception as e:
+            logger.error(f"Error in async recipe list view: {str(e)}")
+            return render_json({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncRecipeRetrieveApiView(View):
+    """
+    Async, ASGI-native read path for a single recipe
+    """
+    
+    async def get(self, request, *args, **kwargs):
+        try:
+            recipe_id = kwargs.get('recipe_id')
+            if not is_valid_recipe_id(recipe_id):
+                return render_json(INVALID_RECIPE_ID, status.HTTP_400_BAD_REQUEST)
+            
+            etag, last_modified = None, None
+            validators = await RecipeService.aget_recipe_validators(recipe_id)
+            if validators:
+                etag, last_modified = recipe_etag(*validators), validators[1]
+                if is_not_modified(request, etag, last_modified):
+                    return not_modified(etag, last_modified)
+                cached = await aget_cached_response(detail_response_key(etag), local=True)
+                if cached is not None:
+                    return cached
+            
+            result = await RecipeService.aget_recipe_by_id(recipe_id, last_modified)
+            
+            if result['status'] == 'success' and etag and RecipeService.is_current(result, last_modified):
+                return await astore_response(detail_response_key(etag), result,
+                                             validator_headers(etag, last_modified), local=True)
+            elif result['status'] == 'success':
+                return render_json(result, status.HTTP_200_OK)
+            else:
+                return render_json(result, status.HTTP_404_NOT_FOUND)
+                
+        except Exception as e:
+            logger.error(f"Error in async recipe retrieve view: {str(e)}")
+            return render_json({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apps.home.instrumentation.PerformanceMiddleware",
+    "apps.home.routers.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -77,12 +80,64 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
+# Connections are kept open between requests and health checked before reuse.
+# Setting POSTGRES_DB switches to PostgreSQL, with a psycopg connection pool
+# when POSTGRES_POOL is set (pooling replaces persistent connections).
+# RECIPE_DB_REPLICAS is a comma separated list of read replicas: SQLite file
+# paths, or PostgreSQL hosts; see apps.home.routers.
+
+if os.environ.get("POSTGRES_DB"):
+    PRIMARY_DATABASE = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["POSTGRES_DB"],
+        "USER": os.environ.get("POSTGRES_USER", ""),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("POSTGRES_HOST", ""),
+        "PORT": os.environ.get("POSTGRES_PORT", ""),
+        "OPTIONS": {"pool": True} if os.environ.get("POSTGRES_POOL") else {},
+        "CONN_MAX_AGE": 0 if os.environ.get("POSTGRES_POOL") else int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+    }
+    REPLICA_SETTING = "HOST"
+else:
+    PRIMARY_DATABASE = {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # WAL lets readers run alongside the single writer; IMMEDIATE
+            # takes the write lock up front instead of failing to upgrade
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA cache_size=-20000;"
+                "PRAGMA mmap_size=134217728;"
+                "PRAGMA temp_store=MEMORY"
+            ),
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 5,
+        },
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
     }
-}
+    REPLICA_SETTING = "NAME"
+
+DATABASES = {"default": PRIMARY_DATABASE}
+
+RECIPE_READ_REPLICAS = []
+for number, location in enumerate(filter(None, os.environ.get("RECIPE_DB_REPLICAS", "").split(",")), start=1):
+    alias = f"replica_{number}"
+    DATABASES[alias] = {
+        **PRIMARY_DATABASE,
+        REPLICA_SETTING: location.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    RECIPE_READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["apps.home.routers.PrimaryReplicaRouter"]
+
+# Seconds a client keeps reading from the primary after it wrote, and cache
+# fills of the values a write invalidated read it too
+RECIPE_REPLICA_PIN_SECONDS = 5
 
 
 # Password validation
@@ -110,6 +165,82 @@ REST_FRAMEWORK = {
 }
 
 
+# Background tasks
+# Run by `python manage.py run_task_worker`; set RECIPE_TASKS_ALWAYS_EAGER
+# to run them inline in the request instead (no worker needed). Workers
+# delete tasks done more than RECIPE_TASKS_RETENTION_DAYS ago.
+
+RECIPE_TASKS_ALWAYS_EAGER = False
+RECIPE_TASKS_RETENTION_DAYS = 7
+
+
+# Serialization
+# Build recipe list and detail payloads from values() rows instead of the
+# DRF serializers; the JSON is byte-identical. Uses orjson when installed.
+
+RECIPE_FAST_SERIALIZATION = False
+
+
+# Cache invalidation
+# Recipe writes invalidate cached lists at most once per window of this many
+# seconds; writes inside it are folded into one deferred invalidation, applied
+# by the first list read or write once the window is over (or by the task
+# worker, if it gets there first). 0 invalidates on every write.
+
+RECIPE_INVALIDATION_WINDOW = 2
+
+
+# Change feed
+# /home/recipes/changes/ reads the primary and holds back writes newer than
+# this many seconds, so a transaction still in flight cannot commit behind a
+# cursor already issued. It must exceed the longest write transaction; the
+# importer logs a warning for any chunk that holds one longer.
+
+RECIPE_CHANGES_LAG_SECONDS = 2
+
+
+# Per-process recipe cache
+# Recipe details are kept in each process (up to this many bytes, for at most
+# RECIPE_L1_CACHE_TTL seconds) in front of the shared cache. An entry is
+# checked against the shared cache's version stamp once it is older than
+# RECIPE_L1_REVALIDATE_SECONDS, which bounds how long a write goes unseen.
+# 0 bytes turns it off.
+
+RECIPE_L1_CACHE_BYTES = 8 * 1024 * 1024
+RECIPE_L1_CACHE_TTL = 60
+RECIPE_L1_REVALIDATE_SECONDS = 1
+
+
+# Slug lookups
+# Slugs resolved by /home/recipes/by-slug/<slug>/ kept per process.
+
+RECIPE_SLUG_INDEX_SIZE = 10000
+
+
+# Similar recipes
+# The recipe x ingredient matrix behind /home/recipes/<id>/similar/ is saved
+# here and memory-mapped by every worker, which looks for a newer version at
+# most every RECIPE_SIMILARITY_RELOAD_SECONDS. Writes queue one refresh, run
+# RECIPE_SIMILARITY_REFRESH_DELAY seconds later by the task worker. Requests
+# never build it: until one is saved the endpoint answers 503 and queues a
+# build, so deploys run `python manage.py build_similarity_index --if-missing`
+# after migrating.
+
+RECIPE_SIMILARITY_DIR = BASE_DIR / "similarity"
+RECIPE_SIMILARITY_RELOAD_SECONDS = 5
+RECIPE_SIMILARITY_REFRESH_DELAY = 30
+
+
+# Instrumentation
+# PerformanceMiddleware times SQL, cache and serialization per request and
+# aggregates them for /home/metrics/; this adds the Server-Timing header.
+# /home/metrics/ answers staff users and these client addresses only; behind
+# a proxy, REMOTE_ADDR is the proxy's.
+
+RECIPE_SERVER_TIMING = True
+RECIPE_METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 